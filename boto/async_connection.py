@@ -0,0 +1,737 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+Runs requests for an existing :class:`boto.connection.AWSAuthConnection`
+on an event loop, so that many requests can be in flight at once from
+a single thread.
+
+Requests are built and signed by the wrapped connection exactly as they
+are for blocking calls, and are retried with the same backoff, redirect
+and credential renewal rules as ``AWSAuthConnection._mexe``.  Only the
+network I/O differs: it is done on non-blocking sockets driven by an
+:class:`EventLoop`.  For example::
+
+    >>> sqs = boto.connect_sqs()
+    >>> async_sqs = AsyncConnection(sqs)
+    >>> requests = [async_sqs.make_query_request('SendMessage',
+    ...                                      {'MessageBody': str(i)},
+    ...                                      queue.id, 'POST')
+    ...             for i in range(1000)]
+    >>> async_sqs.loop.run()
+    >>> responses = [request.result() for request in requests]
+
+Host names are still resolved with a blocking lookup, and requests
+made through a proxy or with a custom ``sender`` are not supported.
+"""
+
+import errno
+import heapq
+import httplib
+import select
+import socket
+import time
+import urlparse
+import StringIO
+from collections import deque
+
+import boto
+from boto import config
+from boto.exception import BotoClientError, BotoServerError
+from boto.retry import RetryPolicy
+
+HAVE_HTTPS_CONNECTION = False
+try:
+    import ssl
+    from boto import https_connection
+    if hasattr(ssl, 'SSLError'):
+        HAVE_HTTPS_CONNECTION = True
+except ImportError:
+    pass
+
+_READ_SIZE = 64 * 1024
+_CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+class EventLoop(object):
+    """
+    A small poll (or select, where poll is unavailable) loop.  All
+    callbacks are run on the thread that calls :meth:`run`.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._timers = []
+        self._timer_count = 0
+        self._active_timers = 0
+        if hasattr(select, 'poll'):
+            self._poll = select.poll()
+        else:
+            self._poll = None
+
+    def watch(self, fd, on_readable=None, on_writable=None):
+        """
+        Calls ``on_readable`` or ``on_writable`` when ``fd`` is ready.
+        Replaces any callbacks already set for ``fd``; passing neither
+        stops watching it.
+        """
+        if on_readable is None and on_writable is None:
+            if fd in self._handlers:
+                del self._handlers[fd]
+                if self._poll is not None:
+                    self._poll.unregister(fd)
+            return
+        self._handlers[fd] = (on_readable, on_writable)
+        if self._poll is not None:
+            mask = 0
+            if on_readable is not None:
+                mask |= select.POLLIN
+            if on_writable is not None:
+                mask |= select.POLLOUT
+            self._poll.register(fd, mask)
+
+    def call_later(self, delay, callback):
+        """
+        Calls ``callback`` after ``delay`` seconds.  Returns a handle
+        that can be passed to :meth:`cancel`.
+        """
+        self._timer_count += 1
+        self._active_timers += 1
+        timer = [time.time() + delay, self._timer_count, callback]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def cancel(self, timer):
+        """Stops a callback scheduled with :meth:`call_later`."""
+        if timer[2] is not None:
+            timer[2] = None
+            self._active_timers -= 1
+
+    def run(self, until=None):
+        """
+        Runs the loop until there is nothing left to wait for or, if
+        given, until ``until()`` returns True.
+        """
+        while self._handlers or self._active_timers:
+            if until is not None and until():
+                return
+            self.run_once()
+
+    def run_once(self):
+        while self._timers and self._timers[0][2] is None:
+            heapq.heappop(self._timers)
+        timeout = None
+        if self._timers:
+            timeout = max(0, self._timers[0][0] - time.time())
+        for fd, readable, writable in self._wait(timeout):
+            # An earlier callback may have stopped watching this fd.
+            handlers = self._handlers.get(fd)
+            if handlers is None:
+                continue
+            on_readable, on_writable = handlers
+            if readable and on_readable is not None:
+                on_readable()
+            elif writable and on_writable is not None:
+                on_writable()
+        now = time.time()
+        while self._timers and self._timers[0][0] <= now:
+            callback = heapq.heappop(self._timers)[2]
+            if callback is not None:
+                self._active_timers -= 1
+                callback()
+
+    def _wait(self, timeout):
+        if not self._handlers:
+            if timeout:
+                time.sleep(timeout)
+            return []
+        if self._poll is not None:
+            if timeout is not None:
+                timeout *= 1000
+            readable = select.POLLIN | select.POLLHUP | select.POLLERR
+            writable = select.POLLOUT | select.POLLHUP | select.POLLERR
+            return [(fd, mask & readable, mask & writable)
+                    for fd, mask in self._poll.poll(timeout)]
+        readers = [fd for fd, h in self._handlers.items() if h[0]]
+        writers = [fd for fd, h in self._handlers.items() if h[1]]
+        r, w, x = select.select(readers, writers, readers + writers, timeout)
+        r, w, x = set(r), set(w), set(x)
+        return [(fd, fd in r or fd in x, fd in w or fd in x)
+                for fd in r | w | x]
+
+
+class AsyncHTTPResponse(object):
+    """
+    A fully read HTTP response, with the parts of the
+    :class:`boto.connection.HTTPResponse` interface that boto's
+    response handling uses.  As there, ``read()`` with no arguments
+    always returns the whole body.
+    """
+
+    def __init__(self, version, status, reason, header_block, body):
+        self.version = version
+        self.status = status
+        self.reason = reason
+        self.msg = httplib.HTTPMessage(StringIO.StringIO(header_block))
+        self._body = body
+        self._fp = StringIO.StringIO(body)
+
+    def getheader(self, name, default=None):
+        return self.msg.getheader(name, default)
+
+    def getheaders(self):
+        return self.msg.items()
+
+    def read(self, amt=None):
+        if amt is None:
+            return self._body
+        return self._fp.read(amt)
+
+    def close(self):
+        pass
+
+
+class _ResponseParser(object):
+    """Incrementally parses an HTTP/1.x response fed to it in pieces."""
+
+    def __init__(self, method):
+        self._method = method
+        self._data = ''
+        self._body = []
+        self._headers_done = False
+        self._chunked = False
+        self._remaining = None
+        self.response = None
+        self.will_close = False
+
+    def feed(self, data):
+        """Returns True once the whole response has been read."""
+        self._data += data
+        if not self._headers_done:
+            end = self._data.find('\r\n\r\n')
+            if end == -1:
+                return False
+            self._parse_headers(self._data[:end + 2])
+            self._data = self._data[end + 4:]
+            self._headers_done = True
+            if self._remaining == 0:
+                return self._finish()
+        if self._chunked:
+            return self._feed_chunked()
+        if self._remaining is None:
+            self._body.append(self._data)
+            self._data = ''
+            return False
+        body, self._data = (self._data[:self._remaining],
+                            self._data[self._remaining:])
+        self._body.append(body)
+        self._remaining -= len(body)
+        if self._remaining == 0:
+            return self._finish()
+        return False
+
+    def feed_eof(self):
+        """Returns True if the response is complete at end of stream."""
+        if self._headers_done and self._remaining is None \
+                and not self._chunked:
+            return self._finish()
+        return False
+
+    def _parse_headers(self, block):
+        status_line, header_block = block.split('\r\n', 1)
+        try:
+            version, status, reason = (status_line.split(None, 2) + [''])[:3]
+            self._status = int(status)
+        except ValueError:
+            raise httplib.BadStatusLine(status_line)
+        if not version.startswith('HTTP/'):
+            raise httplib.BadStatusLine(status_line)
+        self._version = version == 'HTTP/1.0' and 10 or 11
+        self._reason = reason.strip()
+        self._header_block = header_block
+        msg = httplib.HTTPMessage(StringIO.StringIO(header_block))
+        connection = (msg.getheader('connection') or '').lower()
+        if self._version == 10:
+            self.will_close = connection != 'keep-alive'
+        else:
+            self.will_close = connection == 'close'
+        if self._method == 'HEAD' or self._status in (204, 304) or \
+                100 <= self._status < 200:
+            self._remaining = 0
+        elif (msg.getheader('transfer-encoding') or '').lower() == 'chunked':
+            self._chunked = True
+        elif msg.getheader('content-length') is not None:
+            self._remaining = int(msg.getheader('content-length'))
+        else:
+            self.will_close = True
+
+    def _feed_chunked(self):
+        while True:
+            if self._remaining is None:
+                end = self._data.find('\r\n')
+                if end == -1:
+                    return False
+                size = self._data[:end].split(';', 1)[0].strip()
+                try:
+                    self._remaining = int(size, 16)
+                except ValueError:
+                    raise httplib.IncompleteRead(''.join(self._body))
+                self._data = self._data[end + 2:]
+            if self._remaining == 0:
+                # Skip any trailers up to the blank line ending them.
+                if self._data.startswith('\r\n'):
+                    return self._finish()
+                end = self._data.find('\r\n\r\n')
+                if end == -1:
+                    return False
+                return self._finish()
+            if len(self._data) < self._remaining + 2:
+                return False
+            self._body.append(self._data[:self._remaining])
+            self._data = self._data[self._remaining + 2:]
+            self._remaining = None
+
+    def _finish(self):
+        self.response = AsyncHTTPResponse(self._version, self._status,
+                                          self._reason, self._header_block,
+                                          ''.join(self._body))
+        return True
+
+
+class _Exchange(object):
+    """
+    Sends one request over a non-blocking socket and reads back its
+    response, calling ``callback(response, error)`` when done.
+    """
+
+    def __init__(self, transport, pool_key, method, path, body, headers,
+                 callback):
+        self._transport = transport
+        self._loop = transport.loop
+        self._pool_key = pool_key
+        self._callback = callback
+        self._parser = _ResponseParser(method)
+        self._outgoing = self._format_request(pool_key[0], method, path,
+                                              body, headers)
+        self._sent = 0
+        self._sock = None
+        self._fd = None
+        self._done = False
+        self._reused = False
+        self._deadline_timer = None
+
+    def _format_request(self, host, method, path, body, headers):
+        lines = ['%s %s HTTP/1.1' % (method, path)]
+        names = set(name.lower() for name in headers)
+        if 'host' not in names:
+            lines.append('Host: %s' % host)
+        if 'accept-encoding' not in names:
+            lines.append('Accept-Encoding: identity')
+        for name, value in headers.items():
+            lines.append('%s: %s' % (name, value))
+        if body and 'content-length' not in names:
+            lines.append('Content-Length: %d' % len(body))
+        return '\r\n'.join(lines) + '\r\n\r\n' + (body or '')
+
+    def start(self, sock=None):
+        timeout = self._transport.timeout
+        if timeout:
+            self._deadline_timer = self._loop.call_later(timeout,
+                                                         self._on_timeout)
+        if sock is not None:
+            self._reused = True
+            self._set_socket(sock)
+            self._loop.watch(self._fd, on_writable=self._on_send)
+            return
+        try:
+            host, port, is_secure = self._transport._address(self._pool_key)
+            family, socktype, proto, name, address = socket.getaddrinfo(
+                host, port, 0, socket.SOCK_STREAM)[0]
+            sock = socket.socket(family, socktype, proto)
+            sock.setblocking(0)
+            self._set_socket(sock)
+            err = sock.connect_ex(address)
+            if err and err not in _CONNECT_IN_PROGRESS:
+                raise socket.error(err, errno.errorcode.get(err, str(err)))
+        except Exception, e:
+            return self._fail(e)
+        self._loop.watch(self._fd, on_writable=self._on_connected)
+
+    def _set_socket(self, sock):
+        self._sock = sock
+        self._fd = sock.fileno()
+
+    def _on_connected(self):
+        try:
+            err = self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                raise socket.error(err, errno.errorcode.get(err, str(err)))
+            if self._pool_key[1]:
+                self._sock = self._transport._wrap_ssl(self._sock)
+                return self._on_handshake()
+        except Exception, e:
+            return self._fail(e)
+        self._on_send()
+
+    def _on_handshake(self):
+        try:
+            self._sock.do_handshake()
+        except ssl.SSLError, e:
+            if e.args[0] == ssl.SSL_ERROR_WANT_READ:
+                return self._loop.watch(self._fd,
+                                        on_readable=self._on_handshake)
+            elif e.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+                return self._loop.watch(self._fd,
+                                        on_writable=self._on_handshake)
+            return self._fail(e)
+        try:
+            self._transport._check_certificate(self._sock,
+                                               self._pool_key[0])
+        except Exception, e:
+            return self._fail(e)
+        self._on_send()
+
+    def _on_send(self):
+        try:
+            self._sent += self._sock.send(
+                buffer(self._outgoing, self._sent, _READ_SIZE))
+        except socket.error, e:
+            if self._would_block(e):
+                return self._loop.watch(self._fd, on_writable=self._on_send)
+            return self._fail(e)
+        if self._sent < len(self._outgoing):
+            self._loop.watch(self._fd, on_writable=self._on_send)
+        else:
+            self._loop.watch(self._fd, on_readable=self._on_receive)
+
+    def _on_receive(self):
+        while True:
+            try:
+                data = self._sock.recv(_READ_SIZE)
+            except socket.error, e:
+                if self._would_block(e):
+                    return
+                return self._fail(e)
+            except Exception, e:
+                return self._fail(e)
+            try:
+                if not data:
+                    if self._parser.feed_eof():
+                        return self._succeed(reusable=False)
+                    raise httplib.IncompleteRead('')
+                if self._parser.feed(data):
+                    return self._succeed(reusable=not self._parser.will_close)
+            except Exception, e:
+                return self._fail(e)
+
+    def _would_block(self, e):
+        if HAVE_HTTPS_CONNECTION and isinstance(e, ssl.SSLError):
+            return e.args[0] in (ssl.SSL_ERROR_WANT_READ,
+                                 ssl.SSL_ERROR_WANT_WRITE)
+        return e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK)
+
+    def _on_timeout(self):
+        if not self._done:
+            self._fail(socket.timeout('timed out'))
+
+    def _stop_timer(self):
+        if self._deadline_timer is not None:
+            self._loop.cancel(self._deadline_timer)
+
+    def _succeed(self, reusable):
+        self._done = True
+        self._stop_timer()
+        self._loop.watch(self._fd)
+        if reusable:
+            self._transport._put_socket(self._pool_key, self._sock)
+        else:
+            self._sock.close()
+        self._callback(self._parser.response, None)
+
+    def _fail(self, e):
+        if self._done:
+            return
+        self._done = True
+        self._stop_timer()
+        if self._sock is not None:
+            self._loop.watch(self._fd)
+            self._sock.close()
+        self._callback(None, e)
+
+
+class AsyncRequest(object):
+    """
+    A request in flight on an :class:`AsyncConnection`.  Callbacks
+    added with :meth:`add_callback` are called with the request once
+    it has a response or has failed for good.
+    """
+
+    def __init__(self, transport, http_request, num_retries):
+        self.http_request = http_request
+        self.num_retries = num_retries
+        self.response = None
+        self.error = None
+        self.done = False
+        self._transport = transport
+        self._callbacks = []
+        self._attempt = 0
+        self._next_sleep = 0
+        self._last_response = None
+        self._last_body = None
+        # The original headers/params are stored so that we can restore
+        # them if credentials are refreshed.
+        self._original_headers = http_request.headers.copy()
+        self._original_params = http_request.params.copy()
+        self._is_secure = transport.connection.is_secure
+
+    def add_callback(self, callback):
+        if self.done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def result(self):
+        """
+        Returns the response, running the event loop until it arrives
+        if need be, or raises the error the request failed with.
+        """
+        if not self.done:
+            self._transport.loop.run(until=lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def _send(self):
+        connection = self._transport.connection
+        request = self.http_request
+        if self._attempt > self.num_retries:
+            if self._last_response is not None:
+                return self._give_up()
+            return self._finish(error=self.error or BotoClientError(
+                'Please report this exception as a Boto Issue!'))
+        # Use jittered backoff to desynchronize client requests
+        self._next_sleep = connection.retry_policy.delay(self._next_sleep)
+        try:
+            connection.retry_policy.check_endpoint(request.host)
+            # we now re-sign each request before it is retried
+            request.authorize(connection=connection)
+        except Exception, e:
+            return self._finish(error=e)
+        self._transport._start_exchange(request.host, self._is_secure,
+                                        request.method, request.path,
+                                        request.body, request.headers,
+                                        self._on_response)
+
+    def _retry(self):
+        self._attempt += 1
+        self._transport.loop.call_later(self._next_sleep, self._send)
+
+    def _give_up(self):
+        return self._finish(error=BotoServerError(
+            self._last_response.status, self._last_response.reason,
+            self._last_body))
+
+    def _on_response(self, response, error):
+        connection = self._transport.connection
+        policy = connection.retry_policy
+        request = self.http_request
+        if error is not None:
+            if not isinstance(error, connection.http_exceptions):
+                return self._finish(error=error)
+            for unretryable in connection.http_unretryable_exceptions:
+                if isinstance(error, unretryable):
+                    boto.log.debug(
+                        'encountered unretryable %s exception, re-raising' %
+                        error.__class__.__name__)
+                    return self._finish(error=error)
+            policy.record_failure(request.host)
+            if not policy.acquire_retry(RetryPolicy.CONNECTION_ERROR):
+                boto.log.debug('Retry budget exhausted, re-raising %s' %
+                               error.__class__.__name__)
+                return self._finish(error=error)
+            boto.log.debug('encountered %s exception, reconnecting' %
+                           error.__class__.__name__)
+            self.error = error
+            return self._retry()
+        location = response.getheader('location')
+        failure = policy.classify(response)
+        if failure is not None:
+            self._last_response = response
+            self._last_body = response.read()
+            policy.record_failure(request.host)
+            if not policy.acquire_retry(failure):
+                boto.log.debug('Retry budget exhausted, not retrying '
+                               '%d response' % response.status)
+                return self._give_up()
+            boto.log.debug('Received %d response.  Retrying in %3.1f seconds'
+                           % (response.status, self._next_sleep))
+        elif connection._credentials_expired(response):
+            request.params = self._original_params.copy()
+            request.headers = self._original_headers.copy()
+            connection._renew_credentials()
+        elif response.status < 300 or response.status >= 400 or \
+                not location:
+            policy.record_success(request.host)
+            return self._finish(response=response)
+        else:
+            scheme, request.host, request.path, \
+                params, query, fragment = urlparse.urlparse(location)
+            if query:
+                request.path += '?' + query
+            boto.log.debug('Redirecting: %s://%s%s' % (scheme, request.host,
+                                                        request.path))
+            self._is_secure = scheme == 'https'
+            return self._send()
+        self._retry()
+
+    def _finish(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self.done = True
+        self._transport._request_done()
+        for callback in self._callbacks:
+            callback(self)
+
+
+class AsyncConnection(object):
+    """
+    Runs requests for ``connection`` on ``loop``.
+
+    :type connection: :class:`boto.connection.AWSAuthConnection`
+    :param connection: The connection whose credentials, endpoint and
+        retry settings are used.
+
+    :type loop: :class:`EventLoop`
+    :param loop: The loop to run requests on.  A new one is created if
+        this is not given.
+
+    :type max_concurrency: int
+    :param max_concurrency: The most requests to have in flight at
+        once.  Further requests wait for one of these to finish.
+    """
+
+    def __init__(self, connection, loop=None, max_concurrency=100):
+        if connection.use_proxy:
+            raise BotoClientError('AsyncConnection does not support proxies')
+        self.connection = connection
+        self.loop = loop or EventLoop()
+        self.max_concurrency = max_concurrency
+        self.timeout = connection.http_connection_kwargs.get('timeout')
+        self._in_flight = 0
+        self._waiting = deque()
+        self._idle_sockets = {}
+
+    def mexe(self, http_request, override_num_retries=None):
+        """
+        Starts ``http_request``, which should come from the wrapped
+        connection's ``build_base_http_request``, and returns an
+        :class:`AsyncRequest` for it.
+        """
+        if override_num_retries is None:
+            num_retries = config.getint('Boto', 'num_retries',
+                                        self.connection.num_retries)
+        else:
+            num_retries = override_num_retries
+        boto.log.debug('Method: %s' % http_request.method)
+        boto.log.debug('Path: %s' % http_request.path)
+        boto.log.debug('Host: %s' % http_request.host)
+        request = AsyncRequest(self, http_request, num_retries)
+        if self._in_flight < self.max_concurrency:
+            self._in_flight += 1
+            request._send()
+        else:
+            self._waiting.append(request)
+        return request
+
+    def make_request(self, method, path, headers=None, data='', host=None,
+                     auth_path=None, override_num_retries=None):
+        """
+        The event loop counterpart of
+        :meth:`boto.connection.AWSAuthConnection.make_request`.
+        """
+        http_request = self.connection.build_base_http_request(
+            method, path, auth_path, {}, headers, data, host)
+        return self.mexe(http_request, override_num_retries)
+
+    def make_query_request(self, action, params=None, path='/', verb='GET'):
+        """
+        The event loop counterpart of
+        :meth:`boto.connection.AWSQueryConnection.make_request`.
+        """
+        connection = self.connection
+        http_request = connection.build_base_http_request(
+            verb, path, None, params, {}, '', connection.server_name())
+        if action:
+            http_request.params['Action'] = action
+        if connection.APIVersion:
+            http_request.params['Version'] = connection.APIVersion
+        return self.mexe(http_request)
+
+    def close(self):
+        """Closes any idle sockets kept for reuse."""
+        for sockets in self._idle_sockets.values():
+            for sock in sockets:
+                sock.close()
+        self._idle_sockets = {}
+
+    def _request_done(self):
+        if self._waiting:
+            self._waiting.popleft()._send()
+        else:
+            self._in_flight -= 1
+
+    def _start_exchange(self, host, is_secure, method, path, body, headers,
+                        callback):
+        pool_key = (host, is_secure)
+        exchange = _Exchange(self, pool_key, method, path, body, headers,
+                             callback)
+        sockets = self._idle_sockets.get(pool_key)
+        exchange.start(sockets and sockets.pop() or None)
+
+    def _put_socket(self, pool_key, sock):
+        self._idle_sockets.setdefault(pool_key, []).append(sock)
+
+    def _address(self, pool_key):
+        host, is_secure = pool_key
+        port = is_secure and 443 or 80
+        if ':' in host:
+            host, port = host.rsplit(':', 1)
+            port = int(port)
+        return host, port, is_secure
+
+    def _wrap_ssl(self, sock):
+        if not HAVE_HTTPS_CONNECTION:
+            raise BotoClientError('SSL is not available')
+        if self.connection.https_validate_certificates:
+            return ssl.wrap_socket(sock, do_handshake_on_connect=False,
+                                   cert_reqs=ssl.CERT_REQUIRED,
+                                   ca_certs=self.connection.ca_certificates_file)
+        return ssl.wrap_socket(sock, do_handshake_on_connect=False)
+
+    def _check_certificate(self, sock, host):
+        if not self.connection.https_validate_certificates:
+            return
+        hostname = host.split(':', 1)[0]
+        cert = sock.getpeercert()
+        if not https_connection.ValidateCertificateHostname(cert, hostname):
+            raise https_connection.InvalidCertificateException(
+                hostname, cert,
+                'remote hostname "%s" does not match certificate' % hostname)
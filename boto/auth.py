@@ -287,10 +287,23 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
 
     capability = ['hmac-v4']
 
+    #
+    # The most signing keys kept by a handler.  A key is needed for each
+    # date, region and service signed for, so only a handful are in use
+    # at any one time.
+    #
+    MAX_SIGNING_KEYS = 16
+
     def __init__(self, host, config, provider):
         AuthHandler.__init__(self, host, config, provider)
         HmacKeys.__init__(self, host, config, provider)
 
+    def update_provider(self, provider):
+        super(HmacAuthV4Handler, self).update_provider(provider)
+        # Mapping from (date, region, service, secret key) to an HMAC
+        # keyed with the signing key derived from them.
+        self._signing_hmacs = {}
+
     def _sign(self, key, msg, hex=False):
         if hex:
             sig = hmac.new(key, msg.encode('utf-8'), sha256).hexdigest()
@@ -350,7 +363,15 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
         return http_request.path
 
     def payload(self, http_request):
-        return sha256(http_request.body).hexdigest()
+        # Requests are signed again each time they are retried, so the
+        # hash of their body is kept rather than worked out every time.
+        body = http_request.body
+        cached = getattr(http_request, '_payload_hash', None)
+        if cached is not None and cached[0] is body:
+            return cached[1]
+        digest = sha256(body).hexdigest()
+        http_request._payload_hash = (body, digest)
+        return digest
 
     def canonical_request(self, http_request):
         cr = [http_request.method.upper()]
@@ -397,14 +418,33 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
         sts.append(sha256(canonical_request).hexdigest())
         return '\n'.join(sts)
 
-    def signature(self, http_request, string_to_sign):
+    def signing_hmac(self, http_request):
+        """
+        Return an HMAC keyed with the signing key for the date, region
+        and service of the request.  The key only changes once a day,
+        so it is derived once and the HMAC copied for each signature.
+        """
         key = self._provider.secret_key
-        k_date = self._sign(('AWS4' + key).encode('utf-8'),
-                              http_request.timestamp)
-        k_region = self._sign(k_date, http_request.region_name)
-        k_service = self._sign(k_region, http_request.service_name)
-        k_signing = self._sign(k_service, 'aws4_request')
-        return self._sign(k_signing, string_to_sign, hex=True)
+        cache_key = (http_request.timestamp, http_request.region_name,
+                     http_request.service_name, key)
+        signing_hmac = self._signing_hmacs.get(cache_key)
+        if signing_hmac is None:
+            k_date = self._sign(('AWS4' + key).encode('utf-8'),
+                                http_request.timestamp)
+            k_region = self._sign(k_date, http_request.region_name)
+            k_service = self._sign(k_region, http_request.service_name)
+            k_signing = self._sign(k_service, 'aws4_request')
+            signing_hmac = hmac.new(k_signing, digestmod=sha256)
+            if len(self._signing_hmacs) >= self.MAX_SIGNING_KEYS:
+                # Most of these will be for earlier days.
+                self._signing_hmacs.clear()
+            self._signing_hmacs[cache_key] = signing_hmac
+        return signing_hmac.copy()
+
+    def signature(self, http_request, string_to_sign):
+        signing_hmac = self.signing_hmac(http_request)
+        signing_hmac.update(string_to_sign.encode('utf-8'))
+        return signing_hmac.hexdigest()
 
     def add_auth(self, req, **kwargs):
         """
@@ -20,7 +20,6 @@
 # IN THE SOFTWARE.
 #
 
-import xml.sax
 import time
 import boto
 from boto.connection import AWSAuthConnection
@@ -74,7 +73,7 @@ class CloudFrontConnection(AWSAuthConnection):
         rs_kwargs = result_set_kwargs or dict()
         rs = rs_class(tags, **rs_kwargs)
         h = handler.XmlHandler(rs, self)
-        xml.sax.parseString(body, h)
+        handler.parseString(body, h)
         return rs
 
     def _get_info(self, id, resource, dist_class):
@@ -90,7 +89,7 @@ class CloudFrontConnection(AWSAuthConnection):
             if key.lower() == 'etag':
                 d.etag = response_headers[key]
         h = handler.XmlHandler(d, self)
-        xml.sax.parseString(body, h)
+        handler.parseString(body, h)
         return d
 
     def _get_config(self, id, resource, config_class):
@@ -103,7 +102,7 @@ class CloudFrontConnection(AWSAuthConnection):
         d = config_class(connection=self)
         d.etag = self.get_etag(response)
         h = handler.XmlHandler(d, self)
-        xml.sax.parseString(body, h)
+        handler.parseString(body, h)
         return d
 
     def _set_config(self, distribution_id, etag, config):
@@ -130,7 +129,7 @@ class CloudFrontConnection(AWSAuthConnection):
         if response.status == 201:
             d = dist_class(connection=self)
             h = handler.XmlHandler(d, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             d.etag = self.get_etag(response)
             return d
         else:
@@ -253,7 +252,7 @@ class CloudFrontConnection(AWSAuthConnection):
         body = response.read()
         if response.status == 201:
             h = handler.XmlHandler(paths, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return paths
         else:
             raise CloudFrontServerError(response.status, response.reason, body)
@@ -268,7 +267,7 @@ class CloudFrontConnection(AWSAuthConnection):
         if response.status == 200:
             paths = InvalidationBatch([])
             h = handler.XmlHandler(paths, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return paths
         else:
             raise CloudFrontServerError(response.status, response.reason, body)
@@ -48,13 +48,12 @@ import errno
 import httplib
 import os
 import Queue
-import random
 import re
+import select
 import socket
 import sys
 import time
 import urllib, urlparse
-import xml.sax
 
 import auth
 import auth_handler
@@ -65,9 +64,11 @@ import boto.cacerts
 
 from boto import config, UserAgent
 from boto.exception import AWSConnectionError, BotoClientError
+from boto.exception import ConnectionPoolExhaustedError
 from boto.exception import BotoServerError
 from boto.provider import Provider
 from boto.resultset import ResultSet
+from boto.retry import RetryPolicy
 
 HAVE_HTTPS_CONNECTION = False
 try:
@@ -92,6 +93,10 @@ PORTS_BY_SECURITY = { True: 443, False: 80 }
 DEFAULT_CA_CERTS_FILE = os.path.join(
         os.path.dirname(os.path.abspath(boto.cacerts.__file__ )), "cacerts.txt")
 
+def _new_pool_stats():
+    return {'hits': 0, 'misses': 0, 'evictions': 0, 'reconnects': 0,
+            'waits': 0, 'timeouts': 0}
+
 class HostConnectionPool(object):
 
     """
@@ -112,14 +117,25 @@ class HostConnectionPool(object):
     if AWS has decided to close it on the other end because of
     inactivity.
 
+    The pool also keeps count of every connection to its host that
+    is open, whether idle in the pool or in use, so that
+    ConnectionPool can limit them.  At most max_idle connections are
+    kept in the queue; the oldest are evicted to make room.
+
     Thread Safety:
 
         This class is used only fram ConnectionPool while it's mutex
         is held.
     """
 
-    def __init__(self):
+    def __init__(self, max_idle=None, stats=None):
         self.queue = []
+        self.max_idle = max_idle
+        # Connections to this host, idle or in use.
+        self.total = 0
+        if stats is None:
+            stats = _new_pool_stats()
+        self.stats = stats
 
     def size(self):
         """
@@ -135,6 +151,9 @@ class HostConnectionPool(object):
         added.
         """
         self.queue.append((conn, time.time()))
+        if self.max_idle is not None:
+            while len(self.queue) > self.max_idle:
+                self._evict(self.queue.pop(0)[0])
 
     def get(self):
         """
@@ -148,12 +167,16 @@ class HostConnectionPool(object):
         # from the queue.  Connections that aren't ready are returned
         # to the end of the queue with an updated time, on the
         # assumption that somebody is actively reading the response.
+        # Ready connections whose socket has been closed by the other
+        # end are evicted rather than handed out.
         for _ in range(len(self.queue)):
             (conn, _) = self.queue.pop(0)
-            if self._conn_ready(conn):
+            if not self._conn_ready(conn):
+                self.queue.append((conn, time.time()))
+            elif self._conn_alive(conn):
                 return conn
             else:
-                self.put(conn)
+                self._evict(conn)
         return None
 
     def _conn_ready(self, conn):
@@ -179,14 +202,39 @@ class HostConnectionPool(object):
             response = getattr(conn, '_HTTPConnection__response', None)
             return (response is None) or response.isclosed()
 
+    def _conn_alive(self, conn):
+        """
+        An idle connection's socket should have nothing to read.  If
+        it is readable, the other end has closed it (or sent something
+        we did not ask for), and it can't be reused.
+        """
+        sock = getattr(conn, 'sock', None)
+        if sock is None:
+            # Not connected yet; httplib will connect on the next request.
+            return True
+        try:
+            if hasattr(select, 'poll'):
+                poller = select.poll()
+                poller.register(sock, select.POLLIN)
+                return not poller.poll(0)
+            return not select.select([sock], [], [], 0)[0]
+        except (select.error, socket.error, ValueError):
+            return False
+
+    def _evict(self, conn):
+        self.total -= 1
+        self.stats['evictions'] += 1
+        # A connection that isn't ready may still be being read from,
+        # so only ready connections are closed.
+        if self._conn_ready(conn):
+            conn.close()
+
     def clean(self):
         """
         Get rid of stale connections.
         """
-        # Note that we do not close the connection here -- somebody
-        # may still be reading from it.
         while len(self.queue) > 0 and self._pair_stale(self.queue[0]):
-            self.queue.pop(0)
+            self._evict(self.queue.pop(0)[0])
 
     def _pair_stale(self, pair):
         """
@@ -204,6 +252,20 @@ class ConnectionPool(object):
     time.  This saves time spent waiting for a connection that AWS has
     timed out on the other end.
 
+    The pool can also limit the connections to each host.  At most
+    max_idle_per_host idle connections are kept for reuse, and at most
+    max_per_host connections are open at once; once that many are in
+    use, get_http_connection waits up to timeout seconds for one to be
+    returned before raising ConnectionPoolExhaustedError.  A timeout of
+    0 fails straight away and None waits indefinitely.  Each limit
+    defaults to the Boto config option of the same name prefixed with
+    connection_pool_, and is unlimited if that is not set.
+
+    The pool counts hits (reused connections), misses (new
+    connections), evictions (idle connections discarded as stale,
+    closed or surplus), reconnects (connections discarded after an
+    error), waits and timeouts; stats() returns the counts.
+
     This class is thread-safe.
     """
 
@@ -226,16 +288,45 @@ class ConnectionPool(object):
 
     STALE_DURATION = 60.0
 
-    def __init__(self):
+    #
+    # How often a caller waiting for a free connection checks whether
+    # one of the connections in use has finished reading its response.
+    # Those connections are not returned to the pool explicitly, so
+    # waiters can't simply be notified.
+    #
+
+    WAIT_INTERVAL = 0.1
+
+    def __init__(self, max_idle_per_host=None, max_per_host=None,
+                 timeout=None):
         # Mapping from (host,is_secure) to HostConnectionPool.
         # If a pool becomes empty, it is removed.
         self.host_to_pool = {}
         # The last time the pool was cleaned.
         self.last_clean_time = 0.0
         self.mutex = threading.Lock()
+        self.condition = threading.Condition(self.mutex)
+        self._stats = _new_pool_stats()
         ConnectionPool.STALE_DURATION = \
             config.getfloat('Boto', 'connection_stale_duration',
                             ConnectionPool.STALE_DURATION)
+        if max_idle_per_host is None:
+            max_idle_per_host = self._config_limit(
+                'connection_pool_max_idle_per_host', int)
+        if max_per_host is None:
+            max_per_host = self._config_limit(
+                'connection_pool_max_per_host', int)
+        if timeout is None:
+            timeout = self._config_limit('connection_pool_timeout', float)
+        self.max_idle_per_host = max_idle_per_host
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+
+    def _config_limit(self, name, type_):
+        value = config.get('Boto', name, None)
+        if value is None:
+            return None
+        return type_(value)
 
     def size(self):
         """
@@ -243,19 +334,61 @@ class ConnectionPool(object):
         """
         return sum(pool.size() for pool in self.host_to_pool.values())
 
+    def stats(self):
+        """
+        Returns a dict of the pool's counters, along with the number
+        of connections that are open and the number idle in the pool.
+        """
+        with self.mutex:
+            stats = self._stats.copy()
+            stats['connections'] = sum(pool.total for pool in
+                                       self.host_to_pool.values())
+            stats['idle'] = self.size()
+        return stats
+
     def get_http_connection(self, host, is_secure):
         """
         Gets a connection from the pool for the named host.  Returns
-        None if there is no connection that can be reused. It's the caller's
-        responsibility to call close() on the connection when it's no longer
-        needed.
+        None if there is no connection that can be reused, in which
+        case the caller may open a new one.  It's the caller's
+        responsibility to call close() on the connection when it's no
+        longer needed, and to hand it back with put_http_connection or
+        discard_http_connection.
+
+        If max_per_host connections to the host are already open,
+        this waits for one to become free and raises
+        ConnectionPoolExhaustedError if none does within the timeout.
         """
         self.clean()
+        key = (host, is_secure)
+        deadline = None
+        waited = False
         with self.mutex:
-            key = (host, is_secure)
-            if key not in self.host_to_pool:
-                return None
-            return self.host_to_pool[key].get()
+            while True:
+                pool = self._host_pool(key)
+                conn = pool.get()
+                if conn is not None:
+                    self._stats['hits'] += 1
+                    return conn
+                if self.max_per_host is None or \
+                        pool.total < self.max_per_host:
+                    pool.total += 1
+                    self._stats['misses'] += 1
+                    return None
+                wait = self.WAIT_INTERVAL
+                if self.timeout is not None:
+                    if deadline is None:
+                        deadline = time.time() + self.timeout
+                    wait = min(wait, deadline - time.time())
+                    if wait <= 0:
+                        self._stats['timeouts'] += 1
+                        raise ConnectionPoolExhaustedError(
+                            'All %d connections to %s are in use' %
+                            (self.max_per_host, host))
+                if not waited:
+                    self._stats['waits'] += 1
+                    waited = True
+                self.condition.wait(wait)
 
     def put_http_connection(self, host, is_secure, conn):
         """
@@ -263,10 +396,27 @@ class ConnectionPool(object):
         reused for the named host.
         """
         with self.mutex:
-            key = (host, is_secure)
-            if key not in self.host_to_pool:
-                self.host_to_pool[key] = HostConnectionPool()
-            self.host_to_pool[key].put(conn)
+            self._host_pool((host, is_secure)).put(conn)
+            self.condition.notify()
+
+    def discard_http_connection(self, host, is_secure, conn):
+        """
+        Closes a connection that can't be reused, typically after an
+        error, freeing its place for a new one.
+        """
+        with self.mutex:
+            pool = self._host_pool((host, is_secure))
+            pool.total -= 1
+            self._stats['reconnects'] += 1
+            self.condition.notify()
+        conn.close()
+
+    def _host_pool(self, key):
+        pool = self.host_to_pool.get(key)
+        if pool is None:
+            pool = HostConnectionPool(self.max_idle_per_host, self._stats)
+            self.host_to_pool[key] = pool
+        return pool
 
     def clean(self):
         """
@@ -282,11 +432,13 @@ class ConnectionPool(object):
                 to_remove = []
                 for (host, pool) in self.host_to_pool.items():
                     pool.clean()
-                    if pool.size() == 0:
+                    if pool.size() == 0 and pool.total <= 0:
                         to_remove.append(host)
                 for host in to_remove:
                     del self.host_to_pool[host]
                 self.last_clean_time = now
+                # Connections may have been evicted.
+                self.condition.notify_all()
 
 class HTTPRequest(object):
 
@@ -519,6 +671,7 @@ class AWSAuthConnection(object):
             self.host = self.provider.host
 
         self._pool = ConnectionPool()
+        self.retry_policy = RetryPolicy()
         self._connection = (self.server_name(), self.is_secure)
         self._last_rs = None
         self._auth_handler = auth.get_auth_handler(
@@ -531,7 +684,10 @@ class AWSAuthConnection(object):
         return []
 
     def connection(self):
-        return self.get_http_connection(*self._connection)
+        # Callers of this legacy attribute never hand the connection
+        # back, so it is made outside the pool rather than counted
+        # against connection_pool_max_per_host forever.
+        return self.new_http_connection(*self._connection)
     connection = property(connection)
 
     def aws_access_key_id(self):
@@ -680,6 +836,9 @@ class AWSAuthConnection(object):
     def put_http_connection(self, host, is_secure, connection):
         self._pool.put_http_connection(host, is_secure, connection)
 
+    def discard_http_connection(self, host, is_secure, connection):
+        self._pool.discard_http_connection(host, is_secure, connection)
+
     def proxy_ssl(self):
         host = '%s:%d' % (self.host, self.port)
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -773,15 +932,19 @@ class AWSAuthConnection(object):
         else:
             num_retries = override_num_retries
         i = 0
-        connection = self.get_http_connection(request.host, self.is_secure)
+        next_sleep = 0
+        policy = self.retry_policy
+        connection_key = (request.host, self.is_secure)
+        connection = self.get_http_connection(*connection_key)
         # The original headers/params are stored so that we can restore them
         # if credentials are refreshed.
         original_headers = request.headers.copy()
         original_params = request.params.copy()
         while i <= num_retries:
-            # Use binary exponential backoff to desynchronize client requests
-            next_sleep = random.random() * (2 ** i)
+            # Use jittered backoff to desynchronize client requests
+            next_sleep = policy.delay(next_sleep)
             try:
+                policy.check_endpoint(request.host)
                 # we now re-sign each request before it is retried
                 boto.log.debug('Token: %s' % self.provider.security_token)
                 request.authorize(connection=self)
@@ -807,11 +970,17 @@ class AWSAuthConnection(object):
                             boto.log.debug(msg)
                         time.sleep(next_sleep)
                         continue
-                if response.status == 500 or response.status == 503:
+                failure = policy.classify(response)
+                if failure is not None:
+                    body = response.read()
+                    policy.record_failure(request.host)
+                    if not policy.acquire_retry(failure):
+                        boto.log.debug('Retry budget exhausted, not retrying '
+                                       '%d response' % response.status)
+                        break
                     msg = 'Received %d response.  ' % response.status
                     msg += 'Retrying in %3.1f seconds' % next_sleep
                     boto.log.debug(msg)
-                    body = response.read()
                 elif self._credentials_expired(response):
                     # The same request object is used so the security token and
                     # access key params are cleared because they are no longer
@@ -821,8 +990,9 @@ class AWSAuthConnection(object):
                     self._renew_credentials()
                 elif response.status < 300 or response.status >= 400 or \
                         not location:
-                    self.put_http_connection(request.host, self.is_secure,
-                                             connection)
+                    policy.record_success(request.host)
+                    self.put_http_connection(connection_key[0],
+                                             connection_key[1], connection)
                     return response
                 else:
                     scheme, request.host, request.path, \
@@ -832,8 +1002,13 @@ class AWSAuthConnection(object):
                     msg = 'Redirecting: %s' % scheme + '://'
                     msg += request.host + request.path
                     boto.log.debug(msg)
-                    connection = self.get_http_connection(request.host,
-                                                          scheme == 'https')
+                    # Finish reading the redirect so that its connection
+                    # can be reused.
+                    response.read()
+                    self.put_http_connection(connection_key[0],
+                                             connection_key[1], connection)
+                    connection_key = (request.host, scheme == 'https')
+                    connection = self.get_http_connection(*connection_key)
                     response = None
                     continue
             except self.http_exceptions, e:
@@ -842,13 +1017,30 @@ class AWSAuthConnection(object):
                         boto.log.debug(
                             'encountered unretryable %s exception, re-raising' %
                             e.__class__.__name__)
+                        self.discard_http_connection(connection_key[0],
+                                                     connection_key[1],
+                                                     connection)
                         raise e
+                self.discard_http_connection(connection_key[0],
+                                             connection_key[1], connection)
+                policy.record_failure(request.host)
+                if not policy.acquire_retry(RetryPolicy.CONNECTION_ERROR):
+                    boto.log.debug('Retry budget exhausted, re-raising %s' %
+                                   e.__class__.__name__)
+                    raise e
                 boto.log.debug('encountered %s exception, reconnecting' % \
                                   e.__class__.__name__)
-                connection = self.new_http_connection(request.host,
-                                                      self.is_secure)
+                connection = self.get_http_connection(*connection_key)
+            except:
+                self.discard_http_connection(connection_key[0],
+                                             connection_key[1], connection)
+                raise
             time.sleep(next_sleep)
             i += 1
+        # The last response, if any, has been read, so the connection
+        # can be reused.
+        self.put_http_connection(connection_key[0], connection_key[1],
+                                 connection)
         # If we made it here, it's because we have exhausted our retries
         # and stil haven't succeeded.  So, if we have a response object,
         # use it to raise an exception.
@@ -972,7 +1164,7 @@ class AWSQueryConnection(AWSAuthConnection):
         elif response.status == 200:
             rs = ResultSet(markers)
             h = boto.handler.XmlHandler(rs, parent)
-            xml.sax.parseString(body, h)
+            boto.handler.parseString(body, h)
             return rs
         else:
             boto.log.error('%s %s' % (response.status, response.reason))
@@ -992,7 +1184,7 @@ class AWSQueryConnection(AWSAuthConnection):
         elif response.status == 200:
             obj = cls(parent)
             h = boto.handler.XmlHandler(obj, parent)
-            xml.sax.parseString(body, h)
+            boto.handler.parseString(body, h)
             return obj
         else:
             boto.log.error('%s %s' % (response.status, response.reason))
@@ -1011,7 +1203,7 @@ class AWSQueryConnection(AWSAuthConnection):
         elif response.status == 200:
             rs = ResultSet()
             h = boto.handler.XmlHandler(rs, parent)
-            xml.sax.parseString(body, h)
+            boto.handler.parseString(body, h)
             return rs.status
         else:
             boto.log.error('%s %s' % (response.status, response.reason))
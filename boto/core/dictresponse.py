@@ -23,6 +23,7 @@
 #
 
 import xml.sax
+import boto.handler
 
 
 def pythonize_name(name, sep='_'):
@@ -63,7 +64,7 @@ class XmlHandler(xml.sax.ContentHandler):
         self.current_text += content
 
     def parse(self, s):
-        xml.sax.parseString(s, self)
+        boto.handler.parseString(s, self)
 
 
 class Element(dict):
@@ -20,6 +20,16 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
+import threading
+import time
+import Queue
+
+import boto
+from boto.dynamodb.exceptions import DynamoDBUnprocessedItemsError
+from boto.dynamodb.throughput import ThroughputGovernor
+from boto.dynamodb.types import undynamize_value
+
+_END_SENTINEL = object()
 
 
 class Batch(object):
@@ -207,3 +217,227 @@ class BatchWriteList(list):
             d[table_name] = batch_dict
         return d
 
+
+def write_request_key(schema, request, undynamize=undynamize_value):
+    """
+    Return the ``(hash_key, range_key)`` of a PutRequest or
+    DeleteRequest of a BatchWriteItem request, decoding the values
+    with ``undynamize``.
+    """
+    if 'PutRequest' in request:
+        item = request['PutRequest']['Item']
+        hash_key = item[schema.hash_key_name]
+        range_key = None
+        if schema.range_key_name is not None:
+            range_key = item.get(schema.range_key_name)
+    else:
+        key = request['DeleteRequest']['Key']
+        hash_key = key['HashKeyElement']
+        range_key = key.get('RangeKeyElement')
+    hash_key = undynamize(hash_key)
+    if range_key is not None:
+        range_key = undynamize(range_key)
+    return hash_key, range_key
+
+
+class BatchWriteWorkerThread(threading.Thread):
+    """
+    Sends the requests that a :class:`BatchWriter` hands to it.
+    """
+    def __init__(self, writer):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._writer = writer
+
+    def run(self):
+        writer = self._writer
+        while True:
+            pending = writer._worker_queue.get()
+            if pending is _END_SENTINEL:
+                return
+            try:
+                if writer._error is None:
+                    writer._write(pending)
+            except Exception, e:
+                boto.log.debug('DynamoDB batch write failed: %s', e,
+                               exc_info=True)
+                writer._error = e
+
+
+class BatchWriter(object):
+    """
+    Buffers puts and deletes for a single table and writes them with
+    BatchWriteItem requests of up to 25 items each.  If one item is
+    written more than once before its request is sent, only the last
+    write is sent.  Any UnprocessedItems in a response are sent again,
+    after a pause chosen by the connection's retry policy, until none
+    are left or ``num_retries`` is used up, when
+    :class:`boto.dynamodb.exceptions.DynamoDBUnprocessedItemsError` is
+    raised.
+
+    By default requests are sent on the calling thread.  If
+    ``num_threads`` is given they are sent by that many background
+    threads instead, and an error in one of them is raised by the next
+    call to the writer.
+
+    A BatchWriter is best used as a context manager, so the items left
+    in the buffer are written at the end::
+
+        >>> with table.batch_writer() as writer:
+        ...     for item in items:
+        ...         writer.put_item(item)
+
+    :ivar consumed_units: The ConsumedCapacityUnits of all the requests
+        sent so far.
+    """
+
+    MAX_BATCH_SIZE = 25
+
+    def __init__(self, table, num_threads=0, num_retries=10):
+        self.table = table
+        self.num_threads = num_threads
+        self.num_retries = num_retries
+        self.consumed_units = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._error = None
+        self._threads = []
+        if num_threads:
+            # Bounded, so a fast producer waits for the threads rather
+            # than buffering the whole load.
+            self._worker_queue = Queue.Queue(maxsize=num_threads * 2)
+            for i in xrange(num_threads):
+                thread = BatchWriteWorkerThread(self)
+                thread.start()
+                self._threads.append(thread)
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._stop_threads()
+            self.closed = True
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _add(self, key, op):
+        assert not self.closed, "Tried to write to a closed BatchWriter!"
+        self._check_error()
+        self._pending[key] = op
+        if len(self._pending) >= self.MAX_BATCH_SIZE:
+            self.flush()
+
+    def put_item(self, item):
+        """
+        Queue an item to be written.
+
+        :type item: :class:`boto.dynamodb.item.Item`
+        :param item: The Item to write to Amazon DynamoDB.
+        """
+        op = {'PutRequest': {'Item': self.table.layer2.dynamize_item(item)}}
+        self._add((item.hash_key, item.range_key), op)
+
+    def delete_item(self, hash_key, range_key=None):
+        """
+        Queue an item to be deleted.
+
+        :type hash_key: int|long|float|str|unicode
+        :param hash_key: The HashKey of the item to delete.
+
+        :type range_key: int|long|float|str|unicode
+        :param range_key: The RangeKey of the item to delete, if the
+            table has one.
+        """
+        key = self.table.layer2.build_key_from_values(self.table.schema,
+                                                      hash_key, range_key)
+        self._add((hash_key, range_key), {'DeleteRequest': {'Key': key}})
+
+    def _invalidate_written(self, keys, unprocessed_items):
+        """
+        Drop the items of ``keys`` that are not in
+        ``unprocessed_items`` from the table's cache, now that they are
+        written, and return the keys still to be written.
+        """
+        unprocessed = set(write_request_key(self.table.schema, request)
+                          for request in unprocessed_items.get(
+                              self.table.name, []))
+        for key in keys:
+            if key not in unprocessed:
+                self.table.layer2.invalidate_cached_item(self.table, *key)
+        return [key for key in keys if key in unprocessed]
+
+    def _write(self, pending):
+        layer2 = self.table.layer2
+        layer1 = layer2.layer1
+        batch_write_item = layer2.pace(ThroughputGovernor.WRITE, [self.table],
+                                       layer1.batch_write_item)
+        keys = [key for key, op in pending]
+        request_items = {self.table.name: [op for key, op in pending]}
+        delay = 0
+        for i in xrange(self.num_retries + 1):
+            # No object_hook, so that any UnprocessedItems come back in
+            # the form they have to be sent in again.
+            response = batch_write_item(request_items)
+            units = 0
+            for table_response in response.get('Responses', {}).values():
+                units += table_response.get('ConsumedCapacityUnits', 0)
+            with self._lock:
+                self.consumed_units += units
+            request_items = response.get('UnprocessedItems')
+            # Cached copies are only dropped once the write is made, so
+            # a read in the meantime can't cache the old item again.
+            keys = self._invalidate_written(keys, request_items or {})
+            if not request_items:
+                return
+            if i == self.num_retries:
+                break
+            delay = layer1.retry_policy.delay(delay)
+            boto.log.debug('Retrying %d unprocessed items in %.2fs' %
+                           (len(request_items.get(self.table.name, [])),
+                            delay))
+            time.sleep(delay)
+        raise DynamoDBUnprocessedItemsError(
+            'Items still unprocessed after %d retries' % self.num_retries,
+            request_items)
+
+    def flush(self):
+        """
+        Send the buffered writes now rather than waiting for a full
+        request.
+        """
+        self._check_error()
+        if not self._pending:
+            return
+        pending = self._pending.items()
+        self._pending = {}
+        if self._threads:
+            self._worker_queue.put(pending)
+        else:
+            self._write(pending)
+
+    def _stop_threads(self):
+        for thread in self._threads:
+            self._worker_queue.put(_END_SENTINEL)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def close(self):
+        """
+        Write whatever is left in the buffer and wait for all the
+        requests to finish.
+        """
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._stop_threads()
+            self.closed = True
+        self._check_error()
@@ -0,0 +1,124 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+"""
+An optional in-process cache of the items of a DynamoDB table.
+"""
+import threading
+import time
+
+from boto.utils import LRUCache
+
+
+class ItemCache(object):
+    """
+    Keeps up to ``max_items`` items of a table for ``ttl`` seconds,
+    dropping the least recently used when it is full.  Keys that
+    turned out not to exist are remembered too, for ``negative_ttl``
+    seconds.
+
+    A cache is attached to a table with
+    :meth:`boto.dynamodb.table.Table.enable_cache`.  It serves
+    eventually consistent reads of whole items, and the puts, updates
+    and deletes made through the same Layer2 keep it up to date.
+    Writes made by anything else show up once the cached copy expires.
+
+    :ivar hits: The number of reads served from the cache.
+    :ivar misses: The number of reads that went to DynamoDB.
+
+    This class is thread-safe.
+    """
+
+    #
+    # Returned by get() for keys the cache knows nothing about.
+    #
+    MISSING = object()
+
+    def __init__(self, max_items=1000, ttl=60, negative_ttl=None):
+        if negative_ttl is None:
+            negative_ttl = ttl
+        self.max_items = max_items
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = LRUCache(max_items)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """
+        Return the attributes cached for ``key``, None if the key is
+        known not to exist, or ``ItemCache.MISSING`` if the cache
+        can't say.  A copy is returned, so changing it doesn't change
+        the cache.
+        """
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._items[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return self.MISSING
+            self.hits += 1
+        attrs = entry[1]
+        if attrs is not None:
+            attrs = dict(attrs)
+        return attrs
+
+    def put(self, key, attrs):
+        """
+        Cache the attributes of the item with ``key``, or that there
+        is no such item if ``attrs`` is None.
+        """
+        if attrs is None:
+            expires = time.time() + self.negative_ttl
+        else:
+            expires = time.time() + self.ttl
+            attrs = dict(attrs)
+        with self._lock:
+            self._items[key] = (expires, attrs)
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._items:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """
+        Return a dict of the number of hits and misses, the fraction
+        of reads that were hits and the number of items cached.
+        """
+        with self._lock:
+            reads = self.hits + self.misses
+            hit_rate = 0.0
+            if reads:
+                hit_rate = self.hits / float(reads)
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': hit_rate, 'size': len(self._items)}
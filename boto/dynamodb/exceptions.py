@@ -28,6 +28,34 @@ class DynamoDBItemError(BotoClientError):
     pass
 
 
+class DynamoDBUnprocessedItemsError(BotoClientError):
+    """
+    Raised when a batch write still has unprocessed items after it has
+    been retried as many times as it is allowed to be.
+
+    :ivar unprocessed_items: The UnprocessedItems of the last response,
+        in the form they would be passed to Layer1.
+    """
+
+    def __init__(self, reason, unprocessed_items):
+        BotoClientError.__init__(self, reason)
+        self.unprocessed_items = unprocessed_items
+
+
+class DynamoDBUnprocessedKeysError(BotoClientError):
+    """
+    Raised when a batch get still has unprocessed keys after it has
+    been retried as many times as it is allowed to be.
+
+    :ivar unprocessed_keys: The keys that were left, in the form they
+        would be passed to Layer1.
+    """
+
+    def __init__(self, reason, unprocessed_keys):
+        BotoClientError.__init__(self, reason)
+        self.unprocessed_keys = unprocessed_keys
+
+
 class DynamoDBConditionalCheckFailedError(DynamoDBResponseError):
     """
     Raised when a ConditionalCheckFailedException response is received.
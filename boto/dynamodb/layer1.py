@@ -25,6 +25,7 @@ import boto
 from boto.connection import AWSAuthConnection
 from boto.exception import DynamoDBResponseError
 from boto.provider import Provider
+from boto.retry import RetryPolicy
 from boto.dynamodb import exceptions as dynamodb_exceptions
 
 import time
@@ -32,6 +33,12 @@ try:
     import simplejson as json
 except ImportError:
     import json
+try:
+    # ujson decodes much faster but has no object_hook, so it is only
+    # used for responses that are decoded without one.
+    from ujson import loads as fast_json_loads
+except ImportError:
+    fast_json_loads = json.loads
 
 #
 # To get full debug output, uncomment the following line and set the
@@ -130,6 +137,8 @@ class Layer1(AWSAuthConnection):
             self.instrumentation['ids'].append(self.request_id)
         response_body = response.read()
         boto.log.debug(response_body)
+        if object_hook is None:
+            return fast_json_loads(response_body)
         return json.loads(response_body, object_hook=object_hook)
 
     def _retry_handler(self, response, i, next_sleep):
@@ -140,11 +149,15 @@ class Layer1(AWSAuthConnection):
             data = json.loads(response_body)
             if self.ThruputError in data.get('__type'):
                 self.throughput_exceeded_events += 1
+                if not self.retry_policy.acquire_retry(RetryPolicy.THROTTLED):
+                    raise self.ResponseError(response.status, response.reason,
+                                             data)
                 msg = "%s, retry attempt %s" % (self.ThruputError, i)
                 if i == 0:
                     next_sleep = 0
                 else:
-                    next_sleep = 0.05 * (2 ** i)
+                    next_sleep = min(0.05 * (2 ** i),
+                                     self.retry_policy.max_delay)
                 i += 1
                 status = (msg, i, next_sleep)
             elif self.SessionExpiredError in data.get('__type'):
@@ -507,7 +520,7 @@ class Layer1(AWSAuthConnection):
     def scan(self, table_name, scan_filter=None,
              attributes_to_get=None, limit=None,
              count=False, exclusive_start_key=None,
-             object_hook=None):
+             object_hook=None, segment=None, total_segments=None):
         """
         Perform a scan of DynamoDB.  This version is currently punting
         and expecting you to provide a full and correct JSON body
@@ -537,6 +550,14 @@ class Layer1(AWSAuthConnection):
         :param exclusive_start_key: Primary key of the item from
             which to continue an earlier query.  This would be
             provided as the LastEvaluatedKey in that query.
+
+        :type segment: int
+        :param segment: For a parallel scan, the segment of the table
+            to scan, from 0 to total_segments - 1.
+
+        :type total_segments: int
+        :param total_segments: For a parallel scan, the number of
+            segments the table is divided into.
         """
         data = {'TableName': table_name}
         if scan_filter:
@@ -549,5 +570,8 @@ class Layer1(AWSAuthConnection):
             data['Count'] = True
         if exclusive_start_key:
             data['ExclusiveStartKey'] = exclusive_start_key
+        if total_segments is not None:
+            data['Segment'] = segment
+            data['TotalSegments'] = total_segments
         json_input = json.dumps(data)
         return self.make_request('Scan', json_input, object_hook=object_hook)
@@ -20,13 +20,22 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
-
+import Queue
+import threading
+import time
+
+import boto
+from boto.dynamodb.cache import ItemCache
+from boto.dynamodb.exceptions import DynamoDBKeyNotFoundError
+from boto.dynamodb.exceptions import DynamoDBUnprocessedKeysError
 from boto.dynamodb.layer1 import Layer1
 from boto.dynamodb.table import Table
 from boto.dynamodb.schema import Schema
 from boto.dynamodb.item import Item
-from boto.dynamodb.batch import BatchList, BatchWriteList
+from boto.dynamodb.batch import BatchList, BatchWriteList, write_request_key
+from boto.dynamodb.throughput import TokenBucket, ThroughputGovernor
 from boto.dynamodb.types import get_dynamodb_type, dynamize_value, convert_num
+from boto.dynamodb.types import undynamize_item
 
 
 def item_object_hook(dct):
@@ -47,6 +56,26 @@ def item_object_hook(dct):
         return set(map(convert_num, dct['NS']))
     return dct
 
+
+def undynamize_attributes(response):
+    """
+    Decode the Attributes of a put, update or delete response in place.
+    """
+    if 'Attributes' in response:
+        response['Attributes'] = undynamize_item(response['Attributes'])
+
+
+def consumed_units(response, table_name):
+    """
+    Return the ConsumedCapacityUnits of a response, or of the part of
+    a batch response for ``table_name``.
+    """
+    if 'ConsumedCapacityUnits' in response:
+        return response['ConsumedCapacityUnits']
+    table_response = response.get('Responses', {}).get(table_name, {})
+    return table_response.get('ConsumedCapacityUnits', 0)
+
+
 def table_generator(tgen):
     """
     A low-level generator used to page through results from
@@ -62,9 +91,9 @@ def table_generator(tgen):
         if response is True:
             pass
         elif 'LastEvaluatedKey' in response:
-            lek = response['LastEvaluatedKey']
-            esk = tgen.table.layer2.dynamize_last_evaluated_key(lek)
-            tgen.kwargs['exclusive_start_key'] = esk
+            # Responses aren't decoded with an object hook, so the key
+            # is already in the form the next request needs.
+            tgen.kwargs['exclusive_start_key'] = response['LastEvaluatedKey']
         else:
             break
         response = tgen.callable(**tgen.kwargs)
@@ -73,7 +102,7 @@ def table_generator(tgen):
         for item in response['Items']:
             if tgen.max_results and n == tgen.max_results:
                 break
-            yield tgen.item_class(tgen.table, attrs=item)
+            yield tgen.item_class(tgen.table, attrs=undynamize_item(item))
             n += 1
 
 
@@ -101,14 +130,274 @@ class TableGenerator:
         return table_generator(self)
 
 
+_END_SENTINEL = object()
+
+
+def _put_result(results, stop, value):
+    """
+    Put a value on a bounded results queue, giving up if ``stop`` is
+    set while waiting for room.
+    """
+    while not stop.is_set():
+        try:
+            results.put(value, timeout=0.1)
+            return True
+        except Queue.Full:
+            pass
+    return False
+
+
+def parallel_table_generator(tgen):
+    """
+    A low-level generator that starts a thread to scan each segment of
+    a table and yields their items as they arrive.  This is used by
+    :class:`boto.dynamodb.layer2.ParallelTableGenerator` and is not
+    intended to be used outside of that context.
+    """
+    results = Queue.Queue(maxsize=tgen.total_segments * 2)
+    stop = threading.Event()
+    for segment in range(tgen.total_segments):
+        t = threading.Thread(target=tgen.scan_segment,
+                             args=(segment, results, stop))
+        t.daemon = True
+        t.start()
+    finished = 0
+    n = 0
+    try:
+        while finished < tgen.total_segments:
+            response = results.get()
+            if response is _END_SENTINEL:
+                finished += 1
+                continue
+            if isinstance(response, Exception):
+                raise response
+            for item in response.get('Items', []):
+                if tgen.max_results and n == tgen.max_results:
+                    return
+                yield tgen.item_class(tgen.table,
+                                      attrs=undynamize_item(item))
+                n += 1
+    finally:
+        # Stop the remaining threads if we finished early, whether
+        # because of an error, max_results or the caller giving up.
+        stop.set()
+
+
+class ParallelTableGenerator(object):
+    """
+    Scans a table as a number of segments, each on its own thread, and
+    yields the items of all of them in the order they arrive.
+
+    :ivar consumed_units: A number that holds the ConsumedCapacityUnits
+        accumulated thus far across all segments.
+    """
+
+    def __init__(self, table, callable, max_results, item_class, kwargs,
+                 total_segments, read_units_per_second=None):
+        self.table = table
+        self.callable = callable
+        self.max_results = max_results
+        self.item_class = item_class
+        self.kwargs = kwargs
+        self.total_segments = total_segments
+        self.read_units_per_second = read_units_per_second
+        self.consumed_units = 0
+        self._lock = threading.Lock()
+        self._bucket = None
+        if read_units_per_second:
+            self._bucket = TokenBucket(read_units_per_second)
+
+    def __iter__(self):
+        return parallel_table_generator(self)
+
+    def _consume(self, units):
+        with self._lock:
+            self.consumed_units += units
+        if self._bucket is not None:
+            self._bucket.consume(units)
+
+    def scan_segment(self, segment, results, stop):
+        kwargs = dict(self.kwargs, segment=segment,
+                      total_segments=self.total_segments)
+        try:
+            while not stop.is_set():
+                if self._bucket is not None:
+                    self._bucket.wait()
+                response = self.callable(**kwargs)
+                self._consume(response.get('ConsumedCapacityUnits', 0))
+                if not _put_result(results, stop, response):
+                    return
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['exclusive_start_key'] = response['LastEvaluatedKey']
+        except Exception, e:
+            _put_result(results, stop, e)
+        _put_result(results, stop, _END_SENTINEL)
+
+
+def batch_get_generator(bgen):
+    """
+    A low-level generator that starts threads to send the requests of
+    a :class:`boto.dynamodb.layer2.BatchGetGenerator` and yields the
+    items of the responses as they arrive.  It is not intended to be
+    used outside of that context.
+    """
+    if not bgen.key_lists:
+        return
+    work = Queue.Queue()
+    for key_list in bgen.key_lists:
+        work.put(key_list)
+    num_threads = min(bgen.num_threads, len(bgen.key_lists))
+    results = Queue.Queue(maxsize=num_threads * 2)
+    stop = threading.Event()
+    for i in range(num_threads):
+        t = threading.Thread(target=bgen.get_keys, args=(work, results, stop))
+        t.daemon = True
+        t.start()
+    finished = 0
+    try:
+        while finished < num_threads:
+            items = results.get()
+            if items is _END_SENTINEL:
+                finished += 1
+                continue
+            if isinstance(items, Exception):
+                raise items
+            for item in items:
+                yield bgen.item_class(bgen.table, attrs=undynamize_item(item))
+    finally:
+        stop.set()
+
+
+class BatchGetGenerator(object):
+    """
+    Gets a list of keys from a table with as many BatchGetItem requests
+    as it takes, sent concurrently, and yields the items in the order
+    they arrive.  Keys left unprocessed by a request are sent again
+    until none are left.
+
+    :ivar consumed_units: A number that holds the ConsumedCapacityUnits
+        accumulated thus far across all requests.
+    """
+
+    def __init__(self, table, key_lists, attributes_to_get, item_class,
+                 num_threads, num_retries):
+        self.table = table
+        self.key_lists = key_lists
+        self.attributes_to_get = attributes_to_get
+        self.item_class = item_class
+        self.num_threads = num_threads
+        self.num_retries = num_retries
+        self.consumed_units = 0
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return batch_get_generator(self)
+
+    def _get(self, key_list, results, stop):
+        layer2 = self.table.layer2
+        batch_get_item = layer2.pace(ThroughputGovernor.READ, [self.table],
+                                     layer2.layer1.batch_get_item)
+        delay = 0
+        for i in xrange(self.num_retries + 1):
+            request = {'Keys': key_list}
+            if self.attributes_to_get:
+                request['AttributesToGet'] = self.attributes_to_get
+            response = batch_get_item({self.table.name: request})
+            table_response = response.get('Responses', {}).get(
+                self.table.name, {})
+            with self._lock:
+                self.consumed_units += table_response.get(
+                    'ConsumedCapacityUnits', 0)
+            if not _put_result(results, stop,
+                               table_response.get('Items', [])):
+                return
+            unprocessed = response.get('UnprocessedKeys', {}).get(
+                self.table.name)
+            if not unprocessed:
+                return
+            key_list = unprocessed['Keys']
+            if i == self.num_retries or stop.is_set():
+                break
+            delay = layer2.layer1.retry_policy.delay(delay)
+            boto.log.debug('Retrying %d unprocessed keys in %.2fs' %
+                           (len(key_list), delay))
+            time.sleep(delay)
+        if not stop.is_set():
+            raise DynamoDBUnprocessedKeysError(
+                'Keys still unprocessed after %d retries' % self.num_retries,
+                key_list)
+
+    def get_keys(self, work, results, stop):
+        try:
+            while not stop.is_set():
+                try:
+                    key_list = work.get_nowait()
+                except Queue.Empty:
+                    break
+                self._get(key_list, results, stop)
+        except Exception, e:
+            _put_result(results, stop, e)
+        _put_result(results, stop, _END_SENTINEL)
+
+
 class Layer2(object):
 
+    #
+    # The most keys a single BatchGetItem request may ask for.
+    #
+    MAX_BATCH_GET_KEYS = 100
+
     def __init__(self, aws_access_key_id=None, aws_secret_access_key=None,
                  is_secure=True, port=None, proxy=None, proxy_port=None,
                  debug=0, security_token=None, region=None):
         self.layer1 = Layer1(aws_access_key_id, aws_secret_access_key,
                              is_secure, port, proxy, proxy_port,
                              debug, security_token, region)
+        # An optional ThroughputGovernor pacing requests to each table.
+        self.governor = None
+        # Mapping from table name to the ItemCache of that table, for
+        # the tables that have one.
+        self.item_caches = {}
+
+    def invalidate_cached_item(self, table, hash_key, range_key=None):
+        """
+        Drop an item from the table's
+        :class:`boto.dynamodb.cache.ItemCache`, if it has one, when the
+        item is written.  Returns the cache, or None.
+        """
+        cache = self.item_caches.get(table.name)
+        if cache is not None:
+            cache.invalidate((hash_key, range_key))
+        return cache
+
+    def pace(self, kind, tables, func):
+        """
+        Return ``func``, wrapped so that each call waits for the
+        governor, if there is one, before it is made and charges the
+        consumed capacity in its response to each of ``tables``
+        afterwards.
+
+        :type kind: str
+        :param kind: ThroughputGovernor.READ or ThroughputGovernor.WRITE
+
+        :type tables: list
+        :param tables: The :class:`boto.dynamodb.table.Table` objects
+            that calls to ``func`` use.
+        """
+        governor = self.governor
+        if governor is None:
+            return func
+
+        def paced(*args, **kwargs):
+            for table in tables:
+                governor.acquire(table, kind)
+            response = func(*args, **kwargs)
+            for table in tables:
+                governor.record(table, kind,
+                                consumed_units(response, table.name))
+            return response
+        return paced
 
     def dynamize_attribute_updates(self, pending_updates):
         """
@@ -406,11 +695,30 @@ class Layer2(object):
             to generate the items. This should be a subclass of
             :class:`boto.dynamodb.item.Item`
         """
+        cache = None
+        if attributes_to_get is None:
+            cache = self.item_caches.get(table.name)
+        cache_key = (hash_key, range_key)
+        if cache is not None and not consistent_read:
+            attrs = cache.get(cache_key)
+            if attrs is None:
+                raise DynamoDBKeyNotFoundError("Key does not exist.")
+            if attrs is not ItemCache.MISSING:
+                return item_class(table, hash_key, range_key, attrs)
         key = self.build_key_from_values(table.schema, hash_key, range_key)
-        response = self.layer1.get_item(table.name, key,
-                                        attributes_to_get, consistent_read,
-                                        object_hook=item_object_hook)
-        item = item_class(table, hash_key, range_key, response['Item'])
+        get_item = self.pace(ThroughputGovernor.READ, [table],
+                             self.layer1.get_item)
+        try:
+            response = get_item(table.name, key, attributes_to_get,
+                                consistent_read)
+        except DynamoDBKeyNotFoundError:
+            if cache is not None:
+                cache.put(cache_key, None)
+            raise
+        attrs = undynamize_item(response['Item'])
+        if cache is not None:
+            cache.put(cache_key, attrs)
+        item = item_class(table, hash_key, range_key, attrs)
         if 'ConsumedCapacityUnits' in response:
             item.consumed_units = response['ConsumedCapacityUnits']
         return item
@@ -428,8 +736,76 @@ class Layer2(object):
             request.
         """
         request_items = batch_list.to_dict()
-        return self.layer1.batch_get_item(request_items,
-                                          object_hook=item_object_hook)
+        batch_get_item = self.pace(ThroughputGovernor.READ,
+                                   [batch.table for batch in batch_list],
+                                   self.layer1.batch_get_item)
+        return batch_get_item(request_items, object_hook=item_object_hook)
+
+    def batch_get_iter(self, table, keys, attributes_to_get=None,
+                       item_class=Item, num_threads=4, num_retries=10):
+        """
+        Get any number of items from a table by their primary keys.
+        The keys are split into BatchGetItem requests of up to 100
+        keys, which are sent on ``num_threads`` threads.  When a
+        response is cut short, by the 1 MB response limit or by
+        throttling, the keys it left unprocessed are sent again after a
+        pause chosen by the connection's retry policy.  Keys still
+        unprocessed after ``num_retries`` attempts raise
+        :class:`boto.dynamodb.exceptions.DynamoDBUnprocessedKeysError`.
+
+        :type table: :class:`boto.dynamodb.table.Table`
+        :param table: The Table object in which the items are contained.
+
+        :type keys: list
+        :param keys: A list of scalar or tuple values.  Each element in
+            the list represents one Item to retrieve.  If the schema
+            for the table has both a HashKey and a RangeKey, each
+            element in the list should be a tuple consisting of
+            (hash_key, range_key).  Repeated keys are only requested
+            once.
+
+        :type attributes_to_get: list
+        :param attributes_to_get: A list of attribute names.
+            If supplied, only the specified attribute names will
+            be returned.  Otherwise, all attributes will be returned.
+
+        :type item_class: Class
+        :param item_class: Allows you to override the class used
+            to generate the items. This should be a subclass of
+            :class:`boto.dynamodb.item.Item`
+
+        :type num_threads: int
+        :param num_threads: The most requests to have in flight at once.
+
+        :type num_retries: int
+        :param num_retries: How many times unprocessed keys are sent
+            again before giving up on them.
+
+        :rtype: :class:`boto.dynamodb.layer2.BatchGetGenerator`
+        :return: An iterable of the items that were found, in no
+            particular order.
+        """
+        key_lists = []
+        key_list = []
+        seen = set()
+        for key in keys:
+            if key in seen:
+                continue
+            seen.add(key)
+            if isinstance(key, tuple):
+                hash_key, range_key = key
+            else:
+                hash_key = key
+                range_key = None
+            key_list.append(self.build_key_from_values(table.schema,
+                                                       hash_key, range_key))
+            if len(key_list) == self.MAX_BATCH_GET_KEYS:
+                key_lists.append(key_list)
+                key_list = []
+        if key_list:
+            key_lists.append(key_list)
+        return BatchGetGenerator(table, key_lists, attributes_to_get,
+                                 item_class, num_threads, num_retries)
 
     def batch_write_item(self, batch_list):
         """
@@ -442,8 +818,28 @@ class Layer2(object):
             batch of objects that you wish to put or delete.
         """
         request_items = batch_list.to_dict()
-        return self.layer1.batch_write_item(request_items,
-                                            object_hook=item_object_hook)
+        batch_write_item = self.pace(ThroughputGovernor.WRITE,
+                                     [batch.table for batch in batch_list],
+                                     self.layer1.batch_write_item)
+        response = batch_write_item(request_items,
+                                    object_hook=item_object_hook)
+        # Only the items written are dropped from the cache, and only
+        # now, so a read made before the write can't be cached after it.
+        unprocessed_items = response.get('UnprocessedItems') or {}
+        for batch in batch_list:
+            unprocessed = set(
+                write_request_key(batch.table.schema, request,
+                                  lambda value: value)
+                for request in unprocessed_items.get(batch.table.name, []))
+            keys = [(item.hash_key, item.range_key) for item in batch.puts]
+            for key in batch.deletes:
+                if not isinstance(key, tuple):
+                    key = (key, None)
+                keys.append(key)
+            for key in keys:
+                if key not in unprocessed:
+                    self.invalidate_cached_item(batch.table, *key)
+        return response
 
     def put_item(self, item, expected_value=None, return_values=None):
         """
@@ -468,10 +864,15 @@ class Layer2(object):
             of the old item is returned.
         """
         expected_value = self.dynamize_expected_value(expected_value)
-        response = self.layer1.put_item(item.table.name,
-                                        self.dynamize_item(item),
-                                        expected_value, return_values,
-                                        object_hook=item_object_hook)
+        put_item = self.pace(ThroughputGovernor.WRITE, [item.table],
+                             self.layer1.put_item)
+        cache = self.invalidate_cached_item(item.table, item.hash_key,
+                                            item.range_key)
+        response = put_item(item.table.name, self.dynamize_item(item),
+                            expected_value, return_values)
+        undynamize_attributes(response)
+        if cache is not None:
+            cache.put((item.hash_key, item.range_key), item)
         if 'ConsumedCapacityUnits' in response:
             item.consumed_units = response['ConsumedCapacityUnits']
         return response
@@ -509,10 +910,17 @@ class Layer2(object):
                                          item.hash_key, item.range_key)
         attr_updates = self.dynamize_attribute_updates(item._updates)
 
-        response = self.layer1.update_item(item.table.name, key,
-                                           attr_updates,
-                                           expected_value, return_values,
-                                           object_hook=item_object_hook)
+        update_item = self.pace(ThroughputGovernor.WRITE, [item.table],
+                                self.layer1.update_item)
+        cache = self.invalidate_cached_item(item.table, item.hash_key,
+                                            item.range_key)
+        response = update_item(item.table.name, key, attr_updates,
+                               expected_value, return_values)
+        undynamize_attributes(response)
+        if cache is not None and return_values == 'ALL_NEW' and \
+                'Attributes' in response:
+            cache.put((item.hash_key, item.range_key),
+                      response['Attributes'])
         item._updates.clear()
         if 'ConsumedCapacityUnits' in response:
             item.consumed_units = response['ConsumedCapacityUnits']
@@ -542,10 +950,17 @@ class Layer2(object):
         expected_value = self.dynamize_expected_value(expected_value)
         key = self.build_key_from_values(item.table.schema,
                                          item.hash_key, item.range_key)
-        return self.layer1.delete_item(item.table.name, key,
-                                       expected=expected_value,
-                                       return_values=return_values,
-                                       object_hook=item_object_hook)
+        delete_item = self.pace(ThroughputGovernor.WRITE, [item.table],
+                                self.layer1.delete_item)
+        cache = self.invalidate_cached_item(item.table, item.hash_key,
+                                            item.range_key)
+        response = delete_item(item.table.name, key,
+                               expected=expected_value,
+                               return_values=return_values)
+        undynamize_attributes(response)
+        if cache is not None:
+            cache.put((item.hash_key, item.range_key), None)
+        return response
 
     def query(self, table, hash_key, range_key_condition=None,
               attributes_to_get=None, request_limit=None,
@@ -630,14 +1045,14 @@ class Layer2(object):
                   'limit': request_limit,
                   'consistent_read': consistent_read,
                   'scan_index_forward': scan_index_forward,
-                  'exclusive_start_key': esk,
-                  'object_hook': item_object_hook}
-        return TableGenerator(table, self.layer1.query,
-                              max_results, item_class, kwargs)
+                  'exclusive_start_key': esk}
+        query = self.pace(ThroughputGovernor.READ, [table], self.layer1.query)
+        return TableGenerator(table, query, max_results, item_class, kwargs)
 
     def scan(self, table, scan_filter=None,
              attributes_to_get=None, request_limit=None, max_results=None,
-             count=False, exclusive_start_key=None, item_class=Item):
+             count=False, exclusive_start_key=None, item_class=Item,
+             total_segments=None, read_units_per_second=None):
         """
         Perform a scan of DynamoDB.
 
@@ -699,8 +1114,22 @@ class Layer2(object):
             to generate the items. This should be a subclass of
             :class:`boto.dynamodb.item.Item`
 
-        :rtype: :class:`boto.dynamodb.layer2.TableGenerator`
+        :type total_segments: int
+        :param total_segments: If supplied, the table is scanned as
+            this many segments in parallel, each on its own thread, and
+            the items are returned in no particular order.
+
+        :type read_units_per_second: int
+        :param read_units_per_second: For a parallel scan, the most
+            read capacity units to consume per second across all the
+            segments.  The default is not to limit the rate.
+
+        :rtype: :class:`boto.dynamodb.layer2.TableGenerator` or
+            :class:`boto.dynamodb.layer2.ParallelTableGenerator`
         """
+        if total_segments is not None and exclusive_start_key:
+            raise ValueError('exclusive_start_key cannot be used with '
+                             'a parallel scan')
         if exclusive_start_key:
             esk = self.build_key_from_values(table.schema,
                                              *exclusive_start_key)
@@ -711,7 +1140,10 @@ class Layer2(object):
                   'attributes_to_get': attributes_to_get,
                   'limit': request_limit,
                   'count': count,
-                  'exclusive_start_key': esk,
-                  'object_hook': item_object_hook}
-        return TableGenerator(table, self.layer1.scan,
-                              max_results, item_class, kwargs)
+                  'exclusive_start_key': esk}
+        scan = self.pace(ThroughputGovernor.READ, [table], self.layer1.scan)
+        if total_segments is not None:
+            return ParallelTableGenerator(table, scan, max_results,
+                                          item_class, kwargs, total_segments,
+                                          read_units_per_second)
+        return TableGenerator(table, scan, max_results, item_class, kwargs)
@@ -23,6 +23,8 @@
 
 from boto.dynamodb.schema import Schema
 from boto.dynamodb.item import Item
+from boto.dynamodb.batch import BatchWriter
+from boto.dynamodb.cache import ItemCache
 from boto.dynamodb import exceptions as dynamodb_exceptions
 import time
 
@@ -345,7 +347,8 @@ class Table(object):
 
     def scan(self, scan_filter=None,
              attributes_to_get=None, request_limit=None, max_results=None,
-             count=False, exclusive_start_key=None, item_class=Item):
+             count=False, exclusive_start_key=None, item_class=Item,
+             total_segments=None, read_units_per_second=None):
         """
         Scan through this table, this is a very long
         and expensive operation, and should be avoided if
@@ -407,8 +410,74 @@ class Table(object):
             to generate the items. This should be a subclass of
             :class:`boto.dynamodb.item.Item`
 
+        :type total_segments: int
+        :param total_segments: If supplied, the table is scanned as
+            this many segments in parallel, each on its own thread, and
+            the items are returned in no particular order.
+
+        :type read_units_per_second: int
+        :param read_units_per_second: For a parallel scan, the most
+            read capacity units to consume per second across all the
+            segments.  The default is not to limit the rate.
+
         :rtype: generator
         """
         return self.layer2.scan(self, scan_filter, attributes_to_get,
                                 request_limit, max_results, count,
-                                exclusive_start_key, item_class=item_class)
+                                exclusive_start_key, item_class=item_class,
+                                total_segments=total_segments,
+                                read_units_per_second=read_units_per_second)
+
+    @property
+    def cache(self):
+        """
+        The :class:`boto.dynamodb.cache.ItemCache` of this table, or
+        None if it doesn't have one.
+        """
+        return self.layer2.item_caches.get(self.name)
+
+    def enable_cache(self, max_items=1000, ttl=60, negative_ttl=None):
+        """
+        Keep the items read with :meth:`get_item` in an in-process
+        cache, so repeated reads of the same items are served without
+        a request.  Only eventually consistent reads of whole items
+        use the cache.  Writes made through the same Layer2 update it;
+        other writers' changes are seen once ``ttl`` has passed.
+
+        :type max_items: int
+        :param max_items: The most items to keep.  The least recently
+            used are dropped first.
+
+        :type ttl: int
+        :param ttl: How many seconds an item is kept for.
+
+        :type negative_ttl: int
+        :param negative_ttl: How many seconds a key that doesn't exist
+            is remembered for.  Defaults to ``ttl``.
+
+        :rtype: :class:`boto.dynamodb.cache.ItemCache`
+        """
+        cache = ItemCache(max_items, ttl, negative_ttl)
+        self.layer2.item_caches[self.name] = cache
+        return cache
+
+    def disable_cache(self):
+        """Stop caching the items of this table."""
+        self.layer2.item_caches.pop(self.name, None)
+
+    def batch_writer(self, num_threads=0, num_retries=10):
+        """
+        Return a :class:`boto.dynamodb.batch.BatchWriter` that buffers
+        puts and deletes to this table and writes them in batches.
+
+        :type num_threads: int
+        :param num_threads: If supplied, the batches are written by
+            this many background threads.
+
+        :type num_retries: int
+        :param num_retries: How many times a batch with unprocessed
+            items is sent again before giving up on them.
+
+        :rtype: :class:`boto.dynamodb.batch.BatchWriter`
+        """
+        return BatchWriter(self, num_threads, num_retries)
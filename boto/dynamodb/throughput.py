@@ -0,0 +1,155 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Client-side pacing of the capacity consumed by DynamoDB requests.
+
+The capacity a request will consume isn't known until its response
+arrives, so a :class:`TokenBucket` lets its balance go negative: a
+request waits while the balance is negative, and the units it consumed
+are taken off afterwards.  The requests that follow then wait for the
+balance to recover.
+"""
+import threading
+import time
+
+import boto
+
+
+class TokenBucket(object):
+    """
+    Tokens accrue at ``rate`` per second, up to ``capacity``.
+
+    :ivar rate: Tokens added per second.
+    :ivar capacity: The most tokens the bucket holds, which bounds the
+        size of a burst.  Defaults to one second's worth.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        if capacity is None:
+            capacity = self.rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate, capacity=None):
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+            if capacity is None:
+                capacity = self.rate
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity)
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait(self):
+        """
+        Sleep until the balance is no longer negative.  Returns the time
+        slept, in seconds.
+        """
+        with self._lock:
+            self._refill()
+            if self.tokens >= 0 or self.rate <= 0:
+                return 0
+            delay = -self.tokens / self.rate
+        time.sleep(delay)
+        return delay
+
+    def consume(self, amount):
+        """Take ``amount`` tokens, even if that leaves a negative balance."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class ThroughputGovernor(object):
+    """
+    Paces the requests a :class:`boto.dynamodb.layer2.Layer2` makes so
+    that the capacity each table consumes stays within a fraction of its
+    provisioned read and write units.  Each table has a read and a
+    write :class:`TokenBucket`, shared by every thread using the
+    connection, that is charged with the ConsumedCapacityUnits of each
+    response.
+
+    A governor is opt-in, by setting one on a connection::
+
+        >>> conn = boto.connect_dynamodb()
+        >>> conn.governor = ThroughputGovernor(utilization=0.8)
+
+    :type utilization: float
+    :param utilization: The fraction of each table's provisioned
+        throughput to use.
+
+    :type burst_seconds: float
+    :param burst_seconds: How many seconds' worth of unused capacity
+        can be saved up and spent at once.
+    """
+
+    READ = 'read'
+    WRITE = 'write'
+
+    def __init__(self, utilization=0.9, burst_seconds=1.0):
+        self.utilization = utilization
+        self.burst_seconds = burst_seconds
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, table, kind):
+        """
+        Return the :class:`TokenBucket` for ``kind`` (READ or WRITE)
+        requests to ``table``.  The bucket follows changes in the
+        table's provisioned throughput.
+        """
+        if kind == self.READ:
+            units = table.read_units
+        else:
+            units = table.write_units
+        rate = units * self.utilization
+        key = (table.name, kind)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(rate, rate * self.burst_seconds)
+                self._buckets[key] = bucket
+        if bucket.rate != rate:
+            bucket.set_rate(rate, rate * self.burst_seconds)
+        return bucket
+
+    def acquire(self, table, kind):
+        """Wait until a request of ``kind`` may be sent to ``table``."""
+        delay = self.bucket(table, kind).wait()
+        if delay:
+            boto.log.debug('Paced %s of %s for %.2fs' %
+                           (kind, table.name, delay))
+
+    def record(self, table, kind, units):
+        """Charge ``table`` with the units a request consumed."""
+        if units:
+            self.bucket(table, kind).consume(units)
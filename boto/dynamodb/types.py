@@ -43,21 +43,27 @@ def convert_num(s):
     return n
 
 
+_SCALAR_TYPES = {int: 'N', long: 'N', float: 'N', bool: 'N',
+                 str: 'S', unicode: 'S'}
+
+
 def get_dynamodb_type(val):
     """
     Take a scalar Python value and return a string representing
     the corresponding Amazon DynamoDB type.  If the value passed in is
     not a supported type, raise a TypeError.
     """
-    dynamodb_type = None
+    dynamodb_type = _SCALAR_TYPES.get(type(val))
+    if dynamodb_type is not None:
+        return dynamodb_type
     if is_num(val):
         dynamodb_type = 'N'
     elif is_str(val):
         dynamodb_type = 'S'
     elif isinstance(val, (set, frozenset)):
-        if False not in map(is_num, val):
+        if all(is_num(n) for n in val):
             dynamodb_type = 'NS'
-        elif False not in map(is_str, val):
+        elif all(is_str(n) for n in val):
             dynamodb_type = 'SS'
     if dynamodb_type is None:
         msg = 'Unsupported type "%s" for value "%s"' % (type(val), val)
@@ -65,12 +71,10 @@ def get_dynamodb_type(val):
     return dynamodb_type
 
 
-def dynamize_value(val):
+def _dynamize_value(val):
     """
-    Take a scalar Python value and return a dict consisting
-    of the Amazon DynamoDB type specification and the value that
-    needs to be sent to Amazon DynamoDB.  If the type of the value
-    is not supported, raise a TypeError
+    The general case of :func:`dynamize_value`, for values whose type
+    isn't in the encoder table.
     """
     def _str(val):
         """
@@ -88,7 +92,112 @@ def dynamize_value(val):
     elif dynamodb_type == 'S':
         val = {dynamodb_type: val}
     elif dynamodb_type == 'NS':
-        val = {dynamodb_type: [str(n) for n in val]}
+        val = {dynamodb_type: [_str(n) for n in val]}
     elif dynamodb_type == 'SS':
         val = {dynamodb_type: [n for n in val]}
     return val
+
+
+def _dynamize_number(val):
+    return {'N': str(val)}
+
+
+def _dynamize_bool(val):
+    return {'N': str(int(val))}
+
+
+def _dynamize_number_string(val):
+    if type(val) is bool:
+        return str(int(val))
+    return str(val)
+
+
+def _dynamize_string(val):
+    return {'S': val}
+
+
+_NUMBER_SET = frozenset(['N'])
+_STRING_SET = frozenset(['S'])
+
+
+def _dynamize_set(val):
+    types = set(map(_SCALAR_TYPES.get, map(type, val)))
+    if types == _NUMBER_SET:
+        return {'NS': [_dynamize_number_string(n) for n in val]}
+    if types == _STRING_SET:
+        return {'SS': list(val)}
+    # Empty sets, subclasses and mixed sets.
+    return _dynamize_value(val)
+
+
+#
+# Encoders for the common types, looked up by the exact type of a
+# value.  Subclasses take the general path.
+#
+_ENCODERS = {
+    int: _dynamize_number,
+    long: _dynamize_number,
+    float: _dynamize_number,
+    bool: _dynamize_bool,
+    str: _dynamize_string,
+    unicode: _dynamize_string,
+    set: _dynamize_set,
+    frozenset: _dynamize_set,
+}
+
+
+def dynamize_value(val):
+    """
+    Take a scalar Python value and return a dict consisting
+    of the Amazon DynamoDB type specification and the value that
+    needs to be sent to Amazon DynamoDB.  If the type of the value
+    is not supported, raise a TypeError
+    """
+    encoder = _ENCODERS.get(type(val))
+    if encoder is not None:
+        return encoder(val)
+    return _dynamize_value(val)
+
+
+def _decode_number_set(val):
+    return set(map(convert_num, val))
+
+
+#
+# Decoders for each Amazon DynamoDB type.
+#
+_DECODERS = {
+    'S': lambda val: val,
+    'N': convert_num,
+    'SS': set,
+    'NS': _decode_number_set,
+}
+
+
+def undynamize_value(val):
+    """
+    Take a dict consisting of an Amazon DynamoDB type specification
+    and a value, as found in a response, and return the Python value.
+    """
+    for dynamodb_type, value in val.iteritems():
+        if dynamodb_type in _DECODERS:
+            return _DECODERS[dynamodb_type](value)
+    return val
+
+
+def undynamize_item(attrs):
+    """
+    Take the attributes of an item, as found in a response, and
+    return a dict mapping each attribute name to its Python value.
+    """
+    decoders = _DECODERS
+    item = {}
+    for name, val in attrs.iteritems():
+        # Each attribute value has exactly one type.
+        (dynamodb_type, value), = val.items()
+        try:
+            item[name] = decoders[dynamodb_type](value)
+        except KeyError:
+            # A type we don't know, left as it is.
+            item[name] = val
+    return item
@@ -23,7 +23,6 @@ import boto
 from boto.connection import AWSQueryConnection, AWSAuthConnection
 import time
 import urllib
-import xml.sax
 from boto.ecs.item import ItemSet
 from boto import handler
 
@@ -71,7 +70,7 @@ class ECSConnection(AWSQueryConnection):
         else:
             rs = itemSet
         h = handler.XmlHandler(rs, self)
-        xml.sax.parseString(body, h)
+        handler.parseString(body, h)
         return rs
 
     #
@@ -84,7 +84,7 @@ class BotoServerError(StandardError):
         if self.body:
             try:
                 h = handler.XmlHandler(self, self)
-                xml.sax.parseString(self.body, h)
+                handler.parseString(self.body, h)
             except (TypeError, xml.sax.SAXParseException), pe:
                 # Remove unparsable message body so we don't include garbage
                 # in exception. But first, save self.body in self.error_message
@@ -231,6 +231,18 @@ class SQSDecodeError(BotoClientError):
     def __str__(self):
         return 'SQSDecodeError: %s' % self.reason
 
+class SQSBatchError(BotoClientError):
+    """
+    Error when some of the messages of a batch could not be sent.
+
+    :ivar errors: A list of ``(message, entry)`` tuples, where each
+        entry is the :class:`boto.sqs.batchresults.ResultEntry` SQS
+        returned for the message.
+    """
+    def __init__(self, reason, errors):
+        BotoClientError.__init__(self, reason, errors)
+        self.errors = errors
+
 class StorageResponseError(BotoServerError):
     """
     Error in response from a storage service.
@@ -384,6 +396,20 @@ class AWSConnectionError(BotoClientError):
     """
     pass
 
+class ConnectionPoolExhaustedError(AWSConnectionError):
+    """
+    Raised when no connection to a host became free in time.
+    """
+    pass
+
+class CircuitOpenError(BotoClientError):
+    """
+    Raised instead of sending a request to an endpoint that has been
+    failing, until the endpoint's circuit breaker lets requests through
+    again.
+    """
+    pass
+
 class StorageDataError(BotoClientError):
     """
     Error receiving data from a storage service.
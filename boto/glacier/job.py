@@ -20,15 +20,109 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
+import math
+import os
+import random
+import threading
+import time
 import urllib
 import json
+import Queue
 
-from .utils import chunk_hashes, tree_hash, bytes_to_hex
+import boto
+from .utils import TreeHasher, tree_hash, bytes_to_hex
  
 from .exceptions import HashesDoNotMatchError, UnexpectedHTTPResponseError
 
+_ONE_MEGABYTE = 1024 * 1024
+_END_SENTINEL = object()
+
+
+class DownloadWorkerThread(threading.Thread):
+    """
+    Downloads ranges of a job's output handed to it by
+    :meth:`Job.download_to_file`, writing each one into place in the
+    output file.  A range is retried a few times before giving up on
+    it, and each range is checked against the tree hash Glacier
+    returns for it.
+    """
+    def __init__(self, job, worker_queue, result_queue, filename,
+                 num_retries=5, time_between_retries=1):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.should_continue = True
+        self._job = job
+        self._worker_queue = worker_queue
+        self._result_queue = result_queue
+        self._filename = filename
+        self._num_retries = num_retries
+        self._time_between_retries = time_between_retries
+
+    def run(self):
+        try:
+            fileobj = open(self._filename, 'r+b')
+        except Exception, e:
+            boto.log.debug('Unable to open %s: %s', self._filename, e,
+                           exc_info=True)
+            # No range can be written, so report the error rather than
+            # leave download_to_file waiting for results.
+            self._result_queue.put((None, e))
+            return
+        try:
+            while self.should_continue:
+                work = self._worker_queue.get()
+                if work is _END_SENTINEL:
+                    return
+                try:
+                    result = self._download_with_retries(fileobj, work)
+                except Exception, e:
+                    boto.log.debug('Glacier range download failed: %s', e,
+                                   exc_info=True)
+                    result = e
+                self._result_queue.put((work[0], result))
+        finally:
+            fileobj.close()
+
+    def _download_with_retries(self, fileobj, work):
+        for i in xrange(self._num_retries + 1):
+            try:
+                return self._download_range(fileobj, *work)
+            except Exception, e:
+                if i == self._num_retries:
+                    raise
+                boto.log.debug('Retrying Glacier range download: %s', e)
+                time.sleep(random.random() * self._time_between_retries *
+                           (2 ** i))
+
+    def _download_range(self, fileobj, chunk_number, byte_range):
+        response = self._job.get_output(byte_range)
+        hasher = TreeHasher()
+        fileobj.seek(byte_range[0])
+        size = byte_range[1] - byte_range[0] + 1
+        remaining = size
+        while remaining > 0:
+            data = response.read(min(remaining, _ONE_MEGABYTE))
+            if not data:
+                break
+            hasher.update(data)
+            fileobj.write(data)
+            remaining -= len(data)
+        if remaining:
+            raise HashesDoNotMatchError(
+                'Expected %d bytes in range %d-%d but received %d' %
+                (size, byte_range[0], byte_range[1], size - remaining))
+        hex_tree_hash = hasher.hexdigest()
+        if response['TreeHash'] and response['TreeHash'] != hex_tree_hash:
+            raise HashesDoNotMatchError(
+                'Hashes do not match in downloaded range %d-%d' % byte_range)
+        fileobj.flush()
+        return hex_tree_hash
+
+
 class Job(object):
 
+    DefaultChunkSize = 4 * _ONE_MEGABYTE
+
     ResponseDataElements = (('Action', 'action', None),
                             ('ArchiveId', 'archive_id', None),
                             ('ArchiveSizeInBytes', 'archive_size', 0),
@@ -75,7 +169,8 @@ class Job(object):
            multiple of 1MB.
         """
         try:
-            response = self.get_output((chunk_number*chunk_size, (chunk_number*(chunk_number+1))-1))
+            response = self.get_output((chunk_number * chunk_size,
+                                        (chunk_number + 1) * chunk_size - 1))
         except UnexpectedHTTPResponseError, e:
             if e.status == 400 and e.code == "InvalidParameterValueException":
                 # This just means that we specified a range beyond the
@@ -85,7 +180,7 @@ class Job(object):
             else:
                 raise
         data = response.read()
-        if response["TreeHash"] != bytes_to_hex(tree_hash(chunk_hashes(data))):
+        if response["TreeHash"] != TreeHasher(data).hexdigest():
             raise HashesDoNotMatchError("Hashes do not match in downloaded chunk")
         return data
 
@@ -112,3 +207,148 @@ class Job(object):
         return self.vault.layer1.get_job_output(self.vault.name,
                                                 self.id,
                                                 byte_range)
+
+    def download_to_file(self, filename, chunk_size=DefaultChunkSize,
+                         num_threads=4, state_filename=None, num_retries=5,
+                         time_between_retries=1):
+        """
+        Downloads the output of the job to a file, fetching
+        ``chunk_size`` ranges on ``num_threads`` threads at a time.
+
+        Each range is checked against the tree hash Glacier returns
+        for it, and the tree hash of the whole output is checked
+        against the job's once every range is in.  Finished ranges
+        are recorded in a small state file next to ``filename`` so
+        that calling this again after an interruption only downloads
+        the ranges that are still missing.  The state file is removed
+        once the download completes.
+
+        :type filename: str
+        :param filename: The name of the file to write the output to.
+
+        :type chunk_size: int
+        :param chunk_size: The size of each range to download.  Must
+            be a power of two multiple of 1MB, so that Glacier returns
+            a tree hash for every range.
+
+        :type num_threads: int
+        :param num_threads: The number of ranges to download at once.
+
+        :type state_filename: str
+        :param state_filename: Where to record finished ranges.
+            Defaults to ``filename`` with ``.state`` appended.
+
+        :type num_retries: int
+        :param num_retries: How many times to retry a range before
+            giving up on the download.
+
+        :type time_between_retries: int
+        :param time_between_retries: The base number of seconds to
+            back off between retries of a range.
+        """
+        chunks = chunk_size // _ONE_MEGABYTE
+        if chunk_size % _ONE_MEGABYTE or chunks & (chunks - 1) or not chunks:
+            raise ValueError('chunk_size must be a power of two multiple '
+                             'of 1MB, not %d' % chunk_size)
+        if state_filename is None:
+            state_filename = filename + '.state'
+        if self.action == 'InventoryRetrieval':
+            size = self.inventory_size
+        else:
+            size = self.archive_size
+        num_chunks = int(math.ceil(size / float(chunk_size)))
+
+        hashes = self._read_download_state(state_filename, chunk_size, size)
+        if not hashes or not os.path.exists(filename):
+            hashes = {}
+            self._write_download_state_header(state_filename, chunk_size,
+                                              size)
+            fileobj = open(filename, 'wb')
+            fileobj.truncate(size)
+            fileobj.close()
+
+        pending = [i for i in xrange(num_chunks) if i not in hashes]
+        if pending:
+            self._download_chunks(filename, state_filename, pending,
+                                  chunk_size, size, hashes, num_threads,
+                                  num_retries, time_between_retries)
+
+        if self.sha256_treehash and num_chunks:
+            hex_tree_hash = bytes_to_hex(tree_hash(
+                [hashes[i].decode('hex') for i in xrange(num_chunks)]))
+            if hex_tree_hash != self.sha256_treehash:
+                os.remove(state_filename)
+                raise HashesDoNotMatchError(
+                    'Tree hash of downloaded output does not match the job')
+        os.remove(state_filename)
+
+    def _download_chunks(self, filename, state_filename, pending,
+                         chunk_size, size, hashes, num_threads,
+                         num_retries, time_between_retries):
+        worker_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+        for chunk_number in pending:
+            start = chunk_number * chunk_size
+            end = min(start + chunk_size, size) - 1
+            worker_queue.put((chunk_number, (start, end)))
+        threads = []
+        for i in xrange(min(num_threads, len(pending))):
+            worker_queue.put(_END_SENTINEL)
+            thread = DownloadWorkerThread(self, worker_queue, result_queue,
+                                          filename, num_retries,
+                                          time_between_retries)
+            thread.start()
+            threads.append(thread)
+        state = open(state_filename, 'a')
+        try:
+            for i in xrange(len(pending)):
+                chunk_number, result = result_queue.get()
+                if isinstance(result, Exception):
+                    raise result
+                hashes[chunk_number] = result
+                state.write('%d %s\n' % (chunk_number, result))
+                state.flush()
+        finally:
+            state.close()
+            for thread in threads:
+                thread.should_continue = False
+            for thread in threads:
+                thread.join()
+
+    def _write_download_state_header(self, state_filename, chunk_size, size):
+        state = open(state_filename, 'w')
+        try:
+            state.write(json.dumps({'JobId': self.id,
+                                    'ChunkSize': chunk_size,
+                                    'Size': size}) + '\n')
+        finally:
+            state.close()
+
+    def _read_download_state(self, state_filename, chunk_size, size):
+        """
+        Returns a dict of the tree hashes of the ranges a previous
+        call to :meth:`download_to_file` finished, keyed by range
+        number.  Returns an empty dict if there is no state file or it
+        was written for a different job or chunk size.
+        """
+        if not os.path.exists(state_filename):
+            return {}
+        hashes = {}
+        state = open(state_filename)
+        try:
+            try:
+                header = json.loads(state.readline())
+            except ValueError:
+                return {}
+            if header != {'JobId': self.id, 'ChunkSize': chunk_size,
+                          'Size': size}:
+                return {}
+            for line in state:
+                # A line cut short by an interruption is ignored, and
+                # its range is downloaded again.
+                fields = line.split()
+                if len(fields) == 2 and len(fields[1]) == 64:
+                    hashes[int(fields[0])] = fields[1]
+        finally:
+            state.close()
+        return hashes
@@ -23,16 +23,37 @@
 #
 import hashlib
 import math
+import mmap
+import os
+
+_ONE_MEGABYTE = 1024 * 1024
+
+try:
+    _memoryview = memoryview
+except NameError:
+    # Python 2.6 has no memoryview.
+    _memoryview = None
+
+
+def _slice(data, offset, size):
+    # A zero-copy view of ``size`` bytes of ``data`` from ``offset``.
+    if _memoryview is not None and isinstance(data, _memoryview):
+        return data[offset:offset + size]
+    return buffer(data, offset, size)
+
 
 def chunk_hashes(str):
     """
     Break up the byte-string into 1MB chunks and return sha256 hashes
     for each.
     """
-    chunk = 1024 * 1024
+    chunk = _ONE_MEGABYTE
     chunk_count = int(math.ceil(len(str) / float(chunk)))
-    chunks = [str[i * chunk:(i + 1) * chunk] for i in range(chunk_count)]
-    return [hashlib.sha256(x).digest() for x in chunks]
+    hashes = [hashlib.sha256(_slice(str, i * chunk, chunk)).digest()
+              for i in xrange(chunk_count)]
+    if not hashes:
+        return [hashlib.sha256('').digest()]
+    return hashes
 
 
 def tree_hash(chunk_hashes):
@@ -41,22 +62,102 @@ def tree_hash(chunk_hashes):
     together adjacent hashes until it ends up with one big one. So a
     tree of hashes.
     """
-    hashes = []
-    hashes.extend(chunk_hashes)
+    hashes = list(chunk_hashes)
     while len(hashes) > 1:
-        new_hashes = []
-        while True:
-            if len(hashes) > 1:
-                first = hashes.pop(0)
-                second = hashes.pop(0)
-                new_hashes.append(hashlib.sha256(first + second).digest())
-            elif len(hashes) == 1:
-                only = hashes.pop(0)
-                new_hashes.append(only)
-            else:
-                break
-        hashes.extend(new_hashes)
-    return hashes[0] 
+        new_hashes = [hashlib.sha256(hashes[i] + hashes[i + 1]).digest()
+                      for i in xrange(0, len(hashes) - 1, 2)]
+        if len(hashes) % 2:
+            # An odd hash out is carried up to the next level as is.
+            new_hashes.append(hashes[-1])
+        hashes = new_hashes
+    return hashes[0]
+
+
+class TreeHasher(object):
+    """
+    Computes the SHA256 tree hash of a stream of data, one ``update``
+    at a time, in the same way as ``tree_hash(chunk_hashes(data))``.
+
+    Rather than a list of every 1MB chunk hash, only the hash of the
+    chunk currently being filled and one hash per completed level of
+    the tree are kept, so hashing an archive of n chunks needs
+    O(log n) memory.
+    """
+    def __init__(self, data=None):
+        self._chunk = hashlib.sha256()
+        self._chunk_size = 0
+        # (level, hash) pairs for completed subtrees, with the largest
+        # (leftmost) subtree first.
+        self._stack = []
+        if data:
+            self.update(data)
+
+    def _add_chunk_hash(self, digest):
+        level = 0
+        while self._stack and self._stack[-1][0] == level:
+            digest = hashlib.sha256(self._stack.pop()[1] + digest).digest()
+            level += 1
+        self._stack.append((level, digest))
+
+    def update(self, data):
+        offset = 0
+        length = len(data)
+        while offset < length:
+            count = min(_ONE_MEGABYTE - self._chunk_size, length - offset)
+            self._chunk.update(_slice(data, offset, count))
+            self._chunk_size += count
+            offset += count
+            if self._chunk_size == _ONE_MEGABYTE:
+                self._add_chunk_hash(self._chunk.digest())
+                self._chunk = hashlib.sha256()
+                self._chunk_size = 0
+
+    def digest(self):
+        hashes = [digest for level, digest in self._stack]
+        if self._chunk_size or not hashes:
+            hashes.append(self._chunk.digest())
+        # The subtrees left on the stack shrink from left to right, so
+        # they are combined from the right, just as tree_hash carries
+        # an odd hash out up until it meets a subtree of its own size.
+        result = hashes.pop()
+        while hashes:
+            result = hashlib.sha256(hashes.pop() + result).digest()
+        return result
+
+    def hexdigest(self):
+        return bytes_to_hex(self.digest())
+
+
+def compute_hashes_from_file(filename, chunk_size=_ONE_MEGABYTE):
+    """
+    Compute the linear SHA256 hash and the tree hash of a file
+    without reading it into memory.  The file is mapped into memory
+    with mmap and hashed a chunk at a time straight from the mapping.
+
+    :type filename: str
+    :param filename: The file to hash
+
+    :rtype: tuple
+    :return: The hex linear hash and the hex tree hash of the file
+    """
+    linear_hash = hashlib.sha256()
+    hasher = TreeHasher()
+    fp = open(filename, 'rb')
+    try:
+        size = os.fstat(fp.fileno()).st_size
+        if size:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for offset in xrange(0, size, chunk_size):
+                    chunk = buffer(mapped, offset, chunk_size)
+                    linear_hash.update(chunk)
+                    hasher.update(chunk)
+            finally:
+                mapped.close()
+    finally:
+        fp.close()
+    return linear_hash.hexdigest(), hasher.hexdigest()
+
 
 def bytes_to_hex(str):
     return ''.join(["%02x" % ord(x) for x in str]).strip()
@@ -23,6 +23,7 @@
 
 from . import job 
 from . import writer
+from .utils import TreeHasher
 import hashlib
 import os.path
 
@@ -89,13 +90,13 @@ class Vault(object):
         with open(filename, 'rb') as fd:
             archive = fd.read()
         linear_hash = hashlib.sha256(archive).hexdigest()
-        hex_tree_hash  = writer.bytes_to_hex(writer.tree_hash(writer.chunk_hashes(archive)))
+        hex_tree_hash = TreeHasher(archive).hexdigest()
         response = self.layer1.upload_archive(self.name, archive, linear_hash,
                                               hex_tree_hash)
         return response['ArchiveId']
 
     def create_archive_writer(self, part_size=DefaultPartSize,
-                              description=None):
+                              description=None, num_threads=0):
         """
         Create a new archive and begin a multi-part upload to it.
         Returns a file-like object to which the data for the archive
@@ -106,6 +107,10 @@ class Vault(object):
         :type part_size: int
         :param part_size: The part size for the multipart upload.
 
+        :type num_threads: int
+        :param num_threads: If non-zero, the number of background
+            threads used to upload parts while more data is written.
+
         :rtype: :class:`boto.glaicer.writer.Writer`
         :return: A Writer object that to which the archive data
             should be written.
@@ -113,9 +118,11 @@ class Vault(object):
         response = self.layer1.initiate_multipart_upload(self.name,
                                                          part_size,
                                                          description)
-        return writer.Writer(self, response['UploadId'], part_size=part_size)
+        return writer.Writer(self, response['UploadId'], part_size=part_size,
+                             num_threads=num_threads)
 
-    def create_archive_from_file(self, file=None, file_obj=None):
+    def create_archive_from_file(self, file=None, file_obj=None,
+                                 num_threads=0):
         """
         Create a new archive and upload the data from the given file
         or file-like object.
@@ -126,13 +133,17 @@ class Vault(object):
         :type file_obj: file
         :param file_obj: A file-like object to upload
 
+        :type num_threads: int
+        :param num_threads: If non-zero, the number of parts to upload
+            at the same time.
+
         :rtype: str
         :return: The archive id of the newly created archive
         """
         if not file_obj:
             file_obj = open(file, "rb")
 
-        writer = self.create_archive_writer()
+        writer = self.create_archive_writer(num_threads=num_threads)
         while True:
             data = file_obj.read(1024 * 1024 * 4)
             if not data:
@@ -22,68 +22,183 @@
 # IN THE SOFTWARE.
 #
 import hashlib
+import random
+import threading
+import time
+import Queue
+
+import boto
+from .utils import tree_hash, bytes_to_hex, TreeHasher
+
+_END_SENTINEL = object()
+
+
+class UploadWorkerThread(threading.Thread):
+    """
+    Uploads parts handed to it by a :class:`Writer`, retrying a part
+    a few times before giving up on it.  The part's buffer is given
+    back to the writer once the upload is finished with it.
+    """
+    def __init__(self, writer, num_retries=5, time_between_retries=1):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._writer = writer
+        self._num_retries = num_retries
+        self._time_between_retries = time_between_retries
+
+    def run(self):
+        writer = self._writer
+        while True:
+            work = writer._worker_queue.get()
+            if work is _END_SENTINEL:
+                return
+            try:
+                if writer._error is None:
+                    self._upload_with_retries(work)
+            except Exception, e:
+                boto.log.debug('Glacier part upload failed: %s', e,
+                               exc_info=True)
+                writer._error = e
+            finally:
+                writer._free_buffers.put(work[0])
+
+    def _upload_with_retries(self, work):
+        for i in xrange(self._num_retries + 1):
+            try:
+                return self._writer._upload_part(*work)
+            except Exception, e:
+                if i == self._num_retries:
+                    raise
+                boto.log.debug('Retrying Glacier part upload: %s', e)
+                time.sleep(random.random() * self._time_between_retries *
+                           (2 ** i))
 
-from .utils import chunk_hashes, tree_hash, bytes_to_hex
 
 class Writer(object):
     """
     Presents a file-like object for writing to a Amazon Glacier
     Archive. The data is written using the multi-part upload API.
+
+    Data is copied into reusable part-sized buffers and hashed with a
+    :class:`boto.glacier.utils.TreeHasher` as it arrives, so memory use
+    does not grow with the size of the archive.  By default each full
+    part is uploaded on the calling thread.  If ``num_threads`` is
+    given, full parts are instead uploaded by that many background
+    threads while writing carries on into a spare buffer; once every
+    buffer is in flight ``write`` blocks until an upload finishes.
     """
-    def __init__(self, vault, upload_id, part_size):
+    def __init__(self, vault, upload_id, part_size, num_threads=0):
         self.vault = vault
         self.upload_id = upload_id
         self.part_size = part_size
-        
+        self.num_threads = num_threads
+
+        self._buffer = None
         self._buffer_size = 0
         self._uploaded_size = 0
-        self._buffer = []
         self._tree_hashes = []
-        
+        self._reset_part_hashes()
+
+        self._error = None
+        self._free_buffers = Queue.Queue()
+        self._threads = []
+        if num_threads:
+            self._worker_queue = Queue.Queue()
+            for i in xrange(num_threads):
+                thread = UploadWorkerThread(self)
+                thread.start()
+                self._threads.append(thread)
+            # One buffer per thread, plus one to keep writing into.
+            num_buffers = num_threads + 1
+        else:
+            num_buffers = 1
+        for i in xrange(num_buffers):
+            self._free_buffers.put(bytearray(part_size))
+
         self.archive_location = None
         self.closed = False
 
-    def send_part(self):
-        buf = "".join(self._buffer)
-        # Put back any data remaining over the part size into the
-        # buffer
-        if len(buf) > self.part_size:
-            self._buffer = [buf[self.part_size:]]
-            self._buffer_size = len(self._buffer[0])
+    def _reset_part_hashes(self):
+        self._tree_hasher = TreeHasher()
+        self._linear_hash = hashlib.sha256()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _upload_part(self, buf, size, linear_hash, hex_tree_hash,
+                     content_range):
+        if size == len(buf):
+            part = buf
         else:
-            self._buffer = []
-            self._buffer_size = 0
-        # The part we will send
-        part = buf[:self.part_size]
-        # Create a request and sign it
-        part_tree_hash = tree_hash(chunk_hashes(part))
-        self._tree_hashes.append(part_tree_hash)
+            part = buffer(buf, 0, size)
+        self.vault.layer1.upload_part(self.vault.name, self.upload_id,
+                                      linear_hash, hex_tree_hash,
+                                      content_range, part)
 
-        hex_tree_hash = bytes_to_hex(part_tree_hash)
-        linear_hash = hashlib.sha256(part).hexdigest()
+    def send_part(self):
+        if self._buffer is None:
+            return
+        # Tree hashes are recorded in part order here, whatever order
+        # the uploads themselves finish in.
+        part_tree_hash = self._tree_hasher.digest()
+        self._tree_hashes.append(part_tree_hash)
         content_range = (self._uploaded_size,
-                         (self._uploaded_size + len(part)) - 1)
-        response = self.vault.layer1.upload_part(self.vault.name,
-                                                 self.upload_id,
-                                                 linear_hash,
-                                                 hex_tree_hash,
-                                                 content_range, part)
-        self._uploaded_size += len(part)
+                         (self._uploaded_size + self._buffer_size) - 1)
+        work = (self._buffer, self._buffer_size,
+                self._linear_hash.hexdigest(), bytes_to_hex(part_tree_hash),
+                content_range)
+        self._uploaded_size += self._buffer_size
+        self._buffer = None
+        self._buffer_size = 0
+        self._reset_part_hashes()
+        if self._threads:
+            self._worker_queue.put(work)
+        else:
+            try:
+                self._upload_part(*work)
+            finally:
+                self._free_buffers.put(work[0])
 
     def write(self, str):
         assert not self.closed, "Tried to write to a Writer that is already closed!"
-        if str == "":
-            return
-        self._buffer.append(str)
-        self._buffer_size += len(str)
-        while self._buffer_size > self.part_size:
-            self.send_part()
+        self._check_error()
+        offset = 0
+        length = len(str)
+        while offset < length:
+            if self._buffer is None:
+                # Blocks while every buffer is waiting to be uploaded.
+                self._buffer = self._free_buffers.get()
+                self._check_error()
+            count = min(self.part_size - self._buffer_size, length - offset)
+            self._buffer[self._buffer_size:self._buffer_size + count] = \
+                buffer(str, offset, count)
+            # Hash the data as it arrives rather than all at once when
+            # the part is sent.
+            written = buffer(self._buffer, self._buffer_size, count)
+            self._tree_hasher.update(written)
+            self._linear_hash.update(written)
+            self._buffer_size += count
+            offset += count
+            if self._buffer_size == self.part_size:
+                self.send_part()
+
+    def _stop_threads(self):
+        for thread in self._threads:
+            self._worker_queue.put(_END_SENTINEL)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
 
     def close(self):
         if self.closed:
             return
-        if self._buffer_size > 0:
-            self.send_part()
+        try:
+            if self._buffer_size > 0:
+                self.send_part()
+        finally:
+            self._stop_threads()
+        self._check_error()
         # Complete the multiplart glacier upload
         hex_tree_hash = bytes_to_hex(tree_hash(self._tree_hashes))
         response = self.vault.layer1.complete_multipart_upload(
@@ -28,7 +28,6 @@ from boto.gs.cors import Cors
 from boto.gs.key import Key as GSKey
 from boto.s3.acl import Policy
 from boto.s3.bucket import Bucket as S3Bucket
-import xml.sax
 
 # constants for http query args
 DEF_OBJ_ACL = 'defaultObjectAcl'
@@ -76,7 +75,7 @@ class Bucket(S3Bucket):
         if response.status == 200:
             acl = ACL(self)
             h = handler.XmlHandler(acl, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return acl
         else:
             raise self.connection.provider.storage_response_error(
@@ -143,7 +142,7 @@ class Bucket(S3Bucket):
             # Success - parse XML and return Cors object.
             cors = Cors()
             h = handler.XmlHandler(cors, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return cors
         else:
             raise self.connection.provider.storage_response_error(
@@ -20,27 +20,104 @@
 # IN THE SOFTWARE.
 
 import xml.sax
+from xml.parsers import expat
+from xml.sax.xmlreader import AttributesImpl
+
+import boto
+
 
 class XmlHandler(xml.sax.ContentHandler):
 
     def __init__(self, root_node, connection):
         self.connection = connection
         self.nodes = [('root', root_node)]
-        self.current_text = ''
+        self._text = []
+
+    @property
+    def current_text(self):
+        return ''.join(self._text)
 
     def startElement(self, name, attrs):
-        self.current_text = ''
+        self._text = []
         new_node = self.nodes[-1][1].startElement(name, attrs, self.connection)
         if new_node != None:
             self.nodes.append((name, new_node))
 
     def endElement(self, name):
-        self.nodes[-1][1].endElement(name, self.current_text, self.connection)
-        if self.nodes[-1][0] == name:
+        node_name, node = self.nodes[-1]
+        node.endElement(name, ''.join(self._text), self.connection)
+        if node_name == name:
             self.nodes.pop()
-        self.current_text = ''
+        self._text = []
 
     def characters(self, content):
-        self.current_text += content
-            
+        self._text.append(content)
+
+
+class _ExpatLocator(object):
+    """Lets an expat parser stand in for a SAX locator."""
+
+    def __init__(self, parser):
+        self._parser = parser
+
+    def getColumnNumber(self):
+        return self._parser.ErrorColumnNumber
+
+    def getLineNumber(self):
+        return self._parser.ErrorLineNumber
+
+    def getPublicId(self):
+        return None
+
+    def getSystemId(self):
+        return None
+
+
+def _sax_parse(string, handler):
+    xml.sax.parseString(string, handler)
+
+
+def _expat_parse(string, handler):
+    # Without a namespace separator expat reports qualified names and
+    # passes xmlns declarations as ordinary attributes, which is what
+    # the SAX parser does with namespace processing turned off.
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.buffer_size = 64 * 1024
+    # Handlers such as boto.mws.response.ResponseElement use the SAX
+    # Attributes interface, not just the mapping one.
+    start_element = handler.startElement
+    parser.StartElementHandler = \
+        lambda name, attrs: start_element(name, AttributesImpl(attrs))
+    parser.EndElementHandler = handler.endElement
+    parser.CharacterDataHandler = handler.characters
+    try:
+        parser.Parse(string, True)
+    except expat.ExpatError, e:
+        raise xml.sax.SAXParseException(expat.ErrorString(e.code), e,
+                                        _ExpatLocator(parser))
+
+
+XML_PARSERS = {'sax': _sax_parse,
+               'expat': _expat_parse}
+
+
+def parseString(string, handler):
+    """
+    Parses an XML document held in a string, calling the
+    ``startElement``, ``endElement`` and ``characters`` methods of
+    ``handler`` as :func:`xml.sax.parseString` does.
 
+    By default the document is parsed directly with expat, which skips
+    the overhead of the SAX reader.  Setting ``xml_parser = sax`` in the
+    ``Boto`` section of the config file switches back to
+    :mod:`xml.sax`; an unknown value is logged and also uses
+    :mod:`xml.sax`.  Malformed documents raise
+    :class:`xml.sax.SAXParseException` with either parser.
+    """
+    name = boto.config.get('Boto', 'xml_parser', 'expat')
+    parse = XML_PARSERS.get(name)
+    if parse is None:
+        boto.log.warning('Unknown xml_parser %r, using sax' % name)
+        parse = _sax_parse
+    parse(string, handler)
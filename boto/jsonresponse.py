@@ -21,6 +21,7 @@
 # IN THE SOFTWARE.
 
 import xml.sax
+import boto.handler
 import utils
 
 class XmlHandler(xml.sax.ContentHandler):
@@ -49,7 +50,7 @@ class XmlHandler(xml.sax.ContentHandler):
         self.current_text += content
 
     def parse(self, s):
-        xml.sax.parseString(s, self)
+        boto.handler.parseString(s, self)
         
 class Element(dict):
 
@@ -19,7 +19,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
-import xml.sax
 import datetime
 import itertools
 
@@ -741,7 +740,7 @@ class MTurkConnection(AWSQueryConnection):
         if '<Errors>' not in body:
             rs = ResultSet(marker_elems)
             h = handler.XmlHandler(rs, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return rs
         else:
             raise MTurkRequestError(response.status, response.reason, body)
@@ -883,7 +882,7 @@ class Assignment(BaseAutoResultElement):
             answer_rs = ResultSet([('Answer', QuestionFormAnswer),])
             h = handler.XmlHandler(answer_rs, connection)
             value = connection.get_utf8_value(value)
-            xml.sax.parseString(value, h)
+            handler.parseString(value, h)
             self.answers.append(answer_rs)
         else:
             BaseAutoResultElement.endElement(self, name, value, connection)
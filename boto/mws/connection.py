@@ -18,13 +18,12 @@
 # WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
-import xml.sax
 import hashlib
 import base64
 from boto.connection import AWSQueryConnection
 from boto.mws.exception import ResponseErrorFactory
 from boto.mws.response import ResponseFactory, ResponseElement
-from boto.handler import XmlHandler
+from boto.handler import XmlHandler, parseString
 import boto.mws.response
 
 __all__ = ['MWSConnection']
@@ -275,7 +274,7 @@ class MWSConnection(AWSQueryConnection):
             return body
         obj = cls(self)
         h = XmlHandler(obj, self)
-        xml.sax.parseString(body, h)
+        parseString(body, h)
         return obj
 
     @boolean_arguments('PurgeAndReplace')
@@ -0,0 +1,262 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+Decides whether, and after how long, a failed request is retried.
+
+Every :class:`boto.connection.AWSAuthConnection` has a ``retry_policy``
+that its request loop consults.  A policy combines:
+
+* Capped, decorrelated jitter between attempts, so that clients that
+  failed together don't retry together.
+* A retry token budget shared by every request on the connection.  Each
+  retry spends tokens and each success earns one back, so when a
+  service starts throttling, a busy connection soon stops multiplying
+  its load with retries and fails fast instead.
+* Recognition of the throttling errors of the different services,
+  which are retried even though most are 4xx responses.
+* An optional :class:`CircuitBreaker` that stops sending requests to an
+  endpoint for a while after repeated failures.
+
+A policy can be set on a connection after it is created::
+
+    >>> conn.retry_policy = RetryPolicy(max_delay=5, budget=100,
+    ...                                 circuit_breaker=CircuitBreaker())
+"""
+
+import random
+import re
+import threading
+import time
+
+import boto
+from boto import config
+from boto.exception import CircuitOpenError
+
+#
+# Error codes that services use to say a client is sending requests too
+# quickly.  DynamoDB prefixes its codes with a namespace and '#'.
+#
+THROTTLING_ERROR_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestLimitExceeded',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'BandwidthLimitExceeded',
+    'SlowDown',
+    'PriorRequestNotComplete',
+])
+
+_XML_ERROR_CODE = re.compile(r'<Code>([^<]+)</Code>')
+_JSON_ERROR_CODE = re.compile(r'"__type"\s*:\s*"([^"]+)"')
+
+
+def get_error_code(body):
+    """
+    Returns the error code in an XML or JSON error response body, or
+    None if there isn't one.
+    """
+    if not body:
+        return None
+    match = _XML_ERROR_CODE.search(body) or _JSON_ERROR_CODE.search(body)
+    if match is None:
+        return None
+    return match.group(1).split('#')[-1]
+
+
+class CircuitBreaker(object):
+    """
+    Tracks consecutive failures per endpoint.  After
+    ``failure_threshold`` of them the endpoint's circuit opens and
+    requests to it fail straight away with
+    :class:`boto.exception.CircuitOpenError`.  After ``reset_timeout``
+    seconds a single trial request is let through; if it succeeds the
+    circuit closes, otherwise it stays open for another
+    ``reset_timeout``.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        # Mapping from endpoint to [consecutive failures, time opened].
+        self._endpoints = {}
+
+    def allow(self, endpoint):
+        """Returns True if a request may be sent to ``endpoint``."""
+        with self._lock:
+            state = self._endpoints.get(endpoint)
+            if state is None or state[1] is None:
+                return True
+            now = time.time()
+            if state[1] + self.reset_timeout <= now:
+                # Half open: let this request through and hold back
+                # the rest until it has finished.
+                state[1] = now
+                return True
+            return False
+
+    def is_open(self, endpoint):
+        with self._lock:
+            state = self._endpoints.get(endpoint)
+            return state is not None and state[1] is not None
+
+    def record_success(self, endpoint):
+        with self._lock:
+            self._endpoints.pop(endpoint, None)
+
+    def record_failure(self, endpoint):
+        with self._lock:
+            state = self._endpoints.setdefault(endpoint, [0, None])
+            state[0] += 1
+            if state[0] >= self.failure_threshold:
+                if state[1] is None:
+                    boto.log.debug('Opening circuit for %s' % endpoint)
+                state[1] = time.time()
+
+
+class RetryPolicy(object):
+    """
+    The retry policy of a connection.
+
+    :type base_delay: float
+    :param base_delay: The shortest time to wait before a retry.
+        Defaults to the ``retry_base_delay`` Boto config option, or
+        half a second.
+
+    :type max_delay: float
+    :param max_delay: The longest time to wait before a retry.
+        Defaults to the ``max_retry_delay`` Boto config option, or 20
+        seconds.
+
+    :type budget: int
+    :param budget: The number of retry tokens, with 0 meaning no
+        limit.  Defaults to the ``retry_budget`` Boto config option,
+        or 500.
+
+    :type circuit_breaker: :class:`CircuitBreaker`
+    :param circuit_breaker: If given, consulted before each request.
+
+    This class is thread-safe.
+    """
+
+    #
+    # The kinds of failure, as returned by classify().
+    #
+    THROTTLED = 'throttled'
+    SERVER_ERROR = 'server_error'
+    CONNECTION_ERROR = 'connection_error'
+
+    #
+    # Tokens spent by a retry of each kind of failure.  Connection
+    # errors cost more, as they usually mean a request timed out.
+    #
+    RETRY_COSTS = {THROTTLED: 5, SERVER_ERROR: 5, CONNECTION_ERROR: 10}
+
+    #
+    # Tokens earned back by each successful request.
+    #
+    SUCCESS_REFUND = 1
+
+    RETRYABLE_STATUSES = (500, 502, 503, 504)
+
+    def __init__(self, base_delay=None, max_delay=None, budget=None,
+                 circuit_breaker=None):
+        if base_delay is None:
+            base_delay = config.getfloat('Boto', 'retry_base_delay', 0.5)
+        if max_delay is None:
+            max_delay = config.getfloat('Boto', 'max_retry_delay', 20.0)
+        if budget is None:
+            budget = config.getint('Boto', 'retry_budget', 500)
+        if budget <= 0:
+            budget = None
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.tokens = budget
+        self.circuit_breaker = circuit_breaker
+        self._lock = threading.Lock()
+
+    def delay(self, previous_delay):
+        """
+        Returns how long to wait before the next retry, given how long
+        was waited before the last one (0 if there hasn't been one).
+        """
+        upper = max(previous_delay, self.base_delay) * 3
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def classify(self, response):
+        """
+        Returns the kind of failure ``response`` represents if it
+        should be retried, or None if it shouldn't.  The body of error
+        responses is read to find their error code; as boto's
+        responses cache their body, it can still be read afterwards.
+        """
+        if response.status < 400:
+            return None
+        code = get_error_code(response.read())
+        if code in THROTTLING_ERROR_CODES:
+            return self.THROTTLED
+        if response.status in self.RETRYABLE_STATUSES:
+            return self.SERVER_ERROR
+        return None
+
+    def acquire_retry(self, kind):
+        """
+        Spends the tokens for a retry after a failure of ``kind``.
+        Returns False, without spending anything, if the budget can't
+        cover it.
+        """
+        if self.budget is None:
+            return True
+        cost = self.RETRY_COSTS[kind]
+        with self._lock:
+            if self.tokens < cost:
+                return False
+            self.tokens -= cost
+            return True
+
+    def check_endpoint(self, endpoint):
+        """
+        Raises :class:`boto.exception.CircuitOpenError` if requests to
+        ``endpoint`` are being held back.
+        """
+        if self.circuit_breaker is not None and \
+                not self.circuit_breaker.allow(endpoint):
+            raise CircuitOpenError('Circuit open for %s' % endpoint)
+
+    def record_success(self, endpoint):
+        if self.budget is not None:
+            with self._lock:
+                self.tokens = min(self.budget,
+                                  self.tokens + self.SUCCESS_REFUND)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success(endpoint)
+
+    def record_failure(self, endpoint):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure(endpoint)
@@ -20,7 +20,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
-import xml.sax
 import time
 import uuid
 import urllib
@@ -288,7 +287,7 @@ class Route53Connection(AWSAuthConnection):
                                            body)
         rs = ResourceRecordSets(connection=self, hosted_zone_id=hosted_zone_id)
         h = handler.XmlHandler(rs, self)
-        xml.sax.parseString(body, h)
+        handler.parseString(body, h)
         return rs
 
     def change_rrsets(self, hosted_zone_id, xml_body):
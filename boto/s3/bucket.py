@@ -37,6 +37,8 @@ from boto.s3.bucketlistresultset import BucketListResultSet
 from boto.s3.bucketlistresultset import VersionedBucketListResultSet
 from boto.s3.bucketlistresultset import MultiPartUploadListResultSet
 from boto.s3.lifecycle import Lifecycle
+from boto.s3.concurrent import ConcurrentCopier, ConcurrentDeleter
+from boto.s3.concurrent import DEFAULT_COPY_PART_SIZE, MAX_COPY_SIZE
 from boto.s3.bucketlogging import BucketLogging
 import boto.jsonresponse
 import boto.utils
@@ -47,6 +49,10 @@ import urllib
 import re
 import base64
 from collections import defaultdict
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
 
 # as per http://goo.gl/BDuud (02/19/2011)
 class S3WebsiteEndpointTranslate:
@@ -207,7 +213,8 @@ class Bucket(object):
                 raise self.connection.provider.storage_response_error(
                     response.status, response.reason, '')
 
-    def list(self, prefix='', delimiter='', marker='', headers=None):
+    def list(self, prefix='', delimiter='', marker='', headers=None,
+             num_threads=0, shards=None, ordered=True):
         """
         List key objects within a bucket.  This returns an instance of an
         BucketListResultSet that automatically handles all of the result
@@ -240,14 +247,33 @@ class Bucket(object):
                         
         :type marker: string
         :param marker: The "marker" of where you are in the result set
+
+        :type num_threads: int
+        :param num_threads: If given, the listing is split into shards
+                        by prefix, which are listed on this many threads.
+                        See
+                        :func:`boto.s3.bucketlistresultset.parallel_bucket_lister`.
+                        Cannot be combined with delimiter or marker.
+
+        :type shards: list
+        :param shards: The non-overlapping prefixes, relative to prefix,
+                        to split a parallel listing into.  Defaults to
+                        the common prefixes under prefix, using '/' as
+                        the delimiter.
+
+        :type ordered: bool
+        :param ordered: If False, a parallel listing returns keys as
+                        they arrive rather than in key order.
         
         :rtype: :class:`boto.s3.bucketlistresultset.BucketListResultSet`
         :return: an instance of a BucketListResultSet that handles paging, etc
         """
-        return BucketListResultSet(self, prefix, delimiter, marker, headers)
+        return BucketListResultSet(self, prefix, delimiter, marker, headers,
+                                   num_threads, shards, ordered)
 
     def list_versions(self, prefix='', delimiter='', key_marker='',
-                      version_id_marker='', headers=None):
+                      version_id_marker='', headers=None, num_threads=0,
+                      shards=None, ordered=True):
         """
         List version objects within a bucket.  This returns an instance of an
         VersionedBucketListResultSet that automatically handles all of the result
@@ -271,12 +297,18 @@ class Bucket(object):
                         
         :type marker: string
         :param marker: The "marker" of where you are in the result set
+
+        :type num_threads: int
+        :param num_threads: If given, the versions are listed on this
+                        many threads, as for :meth:`list`.  Cannot be
+                        combined with delimiter or the markers.
         
         :rtype: :class:`boto.s3.bucketlistresultset.BucketListResultSet`
         :return: an instance of a BucketListResultSet that handles paging, etc
         """
         return VersionedBucketListResultSet(self, prefix, delimiter, key_marker,
-                                            version_id_marker, headers)
+                                            version_id_marker, headers,
+                                            num_threads, shards, ordered)
 
     def list_multipart_uploads(self, key_marker='',
                                upload_id_marker='',
@@ -320,7 +352,7 @@ class Bucket(object):
         if response.status == 200:
             rs = ResultSet(element_map)
             h = handler.XmlHandler(rs, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return rs
         else:
             raise self.connection.provider.storage_response_error(
@@ -464,7 +496,8 @@ class Bucket(object):
                                             response_headers=response_headers,
                                             expires_in_absolute=expires_in_absolute)
 
-    def delete_keys(self, keys, quiet=False, mfa_token=None, headers=None):
+    def delete_keys(self, keys, quiet=False, mfa_token=None, headers=None,
+                    num_threads=0):
         """
         Deletes a set of keys using S3's Multi-object delete API. If a
         VersionID is specified for that key then that version is removed.
@@ -473,7 +506,10 @@ class Bucket(object):
         
         :type keys: list
         :param keys: A list of either key_names or (key_name, versionid) pairs
-                     or a list of Key instances.
+                     or a list of Key instances.  Any iterable will do,
+                     such as the result of :meth:`list` or
+                     :meth:`list_versions`; it is read as the deletes
+                     are sent.
 
         :type quiet: boolean
         :param quiet: In quiet mode the response includes only keys where
@@ -489,75 +525,114 @@ class Bucket(object):
                           deleting versioned objects from a bucket
                           that has the MFADelete option on the bucket.
 
+        :type num_threads: int
+        :param num_threads: If given, this many requests of up to 1000
+                            keys are sent at once, by a
+                            :class:`boto.s3.concurrent.ConcurrentDeleter`.
+
         :returns: An instance of MultiDeleteResult
         """
-        ikeys = iter(keys)
         result = MultiDeleteResult(self)
-        provider = self.connection.provider
-        query_args = 'delete'
-        def delete_keys2(hdrs):
-            hdrs = hdrs or {}
-            data = u"""<?xml version="1.0" encoding="UTF-8"?>"""
-            data += u"<Delete>"
-            if quiet:
-                data += u"<Quiet>true</Quiet>"
-            count = 0
-            while count < 1000:
-                try:
-                    key = ikeys.next()
-                except StopIteration:
-                    break
-                if isinstance(key, basestring):
-                    key_name = key
-                    version_id = None
-                elif isinstance(key, tuple) and len(key) == 2:
-                    key_name, version_id = key
-                elif (isinstance(key, Key) or isinstance(key, DeleteMarker)) and key.name:
+        if num_threads:
+            deleter = ConcurrentDeleter(num_threads=num_threads)
+            results = deleter.delete(self, keys, quiet=quiet,
+                                     mfa_token=mfa_token, headers=headers)
+        else:
+            results = self._delete_batches(keys, quiet, mfa_token, headers)
+        for rs in results:
+            result.deleted.extend(rs.deleted)
+            result.errors.extend(rs.errors)
+        return result
+
+    def _delete_batches(self, keys, quiet=False, mfa_token=None,
+                        headers=None):
+        """
+        Deletes ``keys`` one Multi-object delete request at a time,
+        yielding a MultiDeleteResult for each.
+        """
+        for objects, errors in self.split_delete_batches(keys):
+            rs = MultiDeleteResult(self)
+            if objects:
+                rs = self.delete_objects(objects, quiet, mfa_token, headers)
+            rs.errors.extend(errors)
+            yield rs
+
+    def split_delete_batches(self, keys, batch_size=1000):
+        """
+        Splits ``keys``, as accepted by :meth:`delete_keys`, into
+        ``(objects, errors)`` pairs, where ``objects`` is a list of up
+        to ``batch_size`` ``(key_name, version_id)`` pairs and
+        ``errors`` a list of :class:`boto.s3.multidelete.Error` for
+        the keys that can't be deleted.
+        """
+        objects = []
+        errors = []
+        for key in keys:
+            if isinstance(key, basestring):
+                key_name = key
+                version_id = None
+            elif isinstance(key, tuple) and len(key) == 2:
+                key_name, version_id = key
+            elif (isinstance(key, Key) or isinstance(key, DeleteMarker)) and key.name:
+                key_name = key.name
+                version_id = key.version_id
+            else:
+                if isinstance(key, Prefix):
                     key_name = key.name
-                    version_id = key.version_id
+                    code = 'PrefixSkipped'   # Don't delete Prefix
                 else:
-                    if isinstance(key, Prefix):
-                        key_name = key.name
-                        code = 'PrefixSkipped'   # Don't delete Prefix
-                    else:
-                        key_name = repr(key)     # try get a string
-                        code = 'InvalidArgument' # other unknown type
-                    message = 'Invalid. No delete action taken for this object.'
-                    error = Error(key_name, code=code, message=message)
-                    result.errors.append(error)
-                    continue
-                count += 1
-                #key_name = key_name.decode('utf-8')
-                data += u"<Object><Key>%s</Key>" % xml.sax.saxutils.escape(key_name)
-                if version_id:
-                    data += u"<VersionId>%s</VersionId>" % version_id
-                data += u"</Object>"
-            data += u"</Delete>"
-            if count <= 0:
-                return False # no more
-            data = data.encode('utf-8')
-            fp = StringIO.StringIO(data)
-            md5 = boto.utils.compute_md5(fp)
-            hdrs['Content-MD5'] = md5[1]
-            hdrs['Content-Type'] = 'text/xml'
-            if mfa_token:
-                hdrs[provider.mfa_header] = ' '.join(mfa_token)
-            response = self.connection.make_request('POST', self.name,
-                                                    headers=hdrs,
-                                                    query_args=query_args,
-                                                    data=data)
-            body = response.read()
-            if response.status == 200:
-                h = handler.XmlHandler(result, self)
-                xml.sax.parseString(body, h)
-                return count >= 1000 # more?
-            else:
-                raise provider.storage_response_error(response.status,
-                                                      response.reason,
-                                                      body)
-        while delete_keys2(headers):
-            pass
-        return result
+                    key_name = repr(key)     # try get a string
+                    code = 'InvalidArgument' # other unknown type
+                message = 'Invalid. No delete action taken for this object.'
+                errors.append(Error(key_name, code=code, message=message))
+                continue
+            objects.append((key_name, version_id))
+            if len(objects) == batch_size:
+                yield objects, errors
+                objects = []
+                errors = []
+        if objects or errors:
+            yield objects, errors
+
+    def delete_objects(self, objects, quiet=False, mfa_token=None,
+                       headers=None):
+        """
+        Deletes up to 1000 ``(key_name, version_id)`` pairs with a
+        single Multi-object delete request.
+
+        :returns: An instance of MultiDeleteResult
+        """
+        provider = self.connection.provider
+        parts = [u"""<?xml version="1.0" encoding="UTF-8"?>""", u"<Delete>"]
+        if quiet:
+            parts.append(u"<Quiet>true</Quiet>")
+        for key_name, version_id in objects:
+            parts.append(u"<Object><Key>%s</Key>" %
+                         xml.sax.saxutils.escape(key_name))
+            if version_id:
+                parts.append(u"<VersionId>%s</VersionId>" % version_id)
+            parts.append(u"</Object>")
+        parts.append(u"</Delete>")
+        data = u''.join(parts).encode('utf-8')
+        hdrs = dict(headers or {})
+        hdrs['Content-MD5'] = base64.b64encode(md5(data).digest())
+        hdrs['Content-Type'] = 'text/xml'
+        if mfa_token:
+            hdrs[provider.mfa_header] = ' '.join(mfa_token)
+        response = self.connection.make_request('POST', self.name,
+                                                headers=hdrs,
+                                                query_args='delete',
+                                                data=data)
+        body = response.read()
+        if response.status == 200:
+            result = MultiDeleteResult(self)
+            h = handler.XmlHandler(result, self)
+            handler.parseString(body, h)
+            return result
+        else:
+            raise provider.storage_response_error(response.status,
+                                                  response.reason,
+                                                  body)
 
     def delete_key(self, key_name, headers=None,
                    version_id=None, mfa_token=None):
@@ -701,7 +776,7 @@ class Bucket(object):
         if response.status == 200:
             key = self.new_key(new_key_name)
             h = handler.XmlHandler(key, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             if hasattr(key, 'Error'):
                 raise provider.storage_copy_error(key.Code, key.Message, body)
             key.handle_version_headers(response)
@@ -712,6 +787,105 @@ class Bucket(object):
             raise provider.storage_response_error(response.status,
                                                   response.reason, body)
 
+    def copy_large_key(self, new_key_name, src_bucket_name, src_key_name,
+                       metadata=None, src_version_id=None,
+                       storage_class='STANDARD', preserve_acl=False,
+                       encrypt_key=False, headers=None,
+                       part_size=DEFAULT_COPY_PART_SIZE, num_threads=10,
+                       cb=None):
+        """
+        Create a new key in the bucket by copying another existing key,
+        which may be larger than the 5GB a single copy allows.
+
+        A HEAD request is made to find the size of the source.  If it
+        fits in one part it is copied with :meth:`copy_key`; otherwise
+        a multipart upload is started and ranges of the source are
+        copied into its parts on the server side, ``num_threads`` at a
+        time, with :class:`boto.s3.concurrent.ConcurrentCopier`.  If a
+        part cannot be copied the upload is cancelled.
+
+        :type new_key_name: string
+        :param new_key_name: The name of the new key
+
+        :type src_bucket_name: string
+        :param src_bucket_name: The name of the source bucket
+
+        :type src_key_name: string
+        :param src_key_name: The name of the source key
+
+        :type metadata: dict
+        :param metadata: Metadata to be associated with new key.  If
+                         metadata is supplied, it will replace the
+                         metadata of the source key being copied.  If
+                         no metadata is supplied, the source key's
+                         metadata and content headers will be copied
+                         to the new key.
+
+        :type src_version_id: string
+        :param src_version_id: The version id for the key.  If not
+                               specified, the newest version of the
+                               key will be copied.
+
+        :type storage_class: string
+        :param storage_class: The storage class of the new key.
+                              Possible values are:
+                              STANDARD | REDUCED_REDUNDANCY
+
+        :type preserve_acl: bool
+        :param preserve_acl: If True, the ACL from the source key
+                             will be copied to the destination key.
+
+        :type encrypt_key: bool
+        :param encrypt_key: If True, the new copy of the object will
+                            be encrypted on the server-side by S3.
+
+        :type headers: dict
+        :param headers: A dictionary of header name/value pairs.
+
+        :type part_size: int
+        :param part_size: The size, in bytes, of each copied part.  No
+                          more than 5GB.
+
+        :type num_threads: int
+        :param num_threads: The number of parts to copy at once.
+
+        :type cb: function
+        :param cb: An optional callback called with the number of
+                   bytes copied so far and the total size each time a
+                   part completes.
+
+        :rtype: :class:`boto.s3.key.Key` or subclass
+        :returns: An instance of the newly created key object
+        """
+        if self.name == src_bucket_name:
+            src_bucket = self
+        else:
+            src_bucket = self.connection.get_bucket(src_bucket_name,
+                                                    validate=False)
+        src_key = src_bucket.get_key(src_key_name, version_id=src_version_id)
+        if src_key is None:
+            raise self.connection.provider.storage_response_error(
+                404, 'Not Found', 'Source key %s/%s does not exist' %
+                (src_bucket_name, src_key_name))
+        part_size = min(part_size, MAX_COPY_SIZE)
+        if src_key.size <= part_size:
+            key = self.copy_key(new_key_name, src_bucket_name, src_key_name,
+                                metadata=metadata,
+                                src_version_id=src_key.version_id,
+                                storage_class=storage_class,
+                                preserve_acl=preserve_acl,
+                                encrypt_key=encrypt_key, headers=headers)
+            if cb:
+                cb(src_key.size, src_key.size)
+            return key
+        copier = ConcurrentCopier(self, part_size=part_size,
+                                  num_threads=num_threads)
+        return copier.copy(
+            new_key_name, src_key, metadata=metadata,
+            reduced_redundancy=(storage_class == 'REDUCED_REDUNDANCY'),
+            preserve_acl=preserve_acl, encrypt_key=encrypt_key,
+            headers=headers, cb=cb)
+
     def set_canned_acl(self, acl_str, key_name='', headers=None,
                        version_id=None):
         assert acl_str in CannedACLStrings
@@ -776,7 +950,7 @@ class Bucket(object):
         if response.status == 200:
             policy = Policy(self)
             h = handler.XmlHandler(policy, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return policy
         else:
             raise self.connection.provider.storage_response_error(
@@ -957,7 +1131,7 @@ class Bucket(object):
         if response.status == 200:
             rs = ResultSet(self)
             h = handler.XmlHandler(rs, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return rs.LocationConstraint
         else:
             raise self.connection.provider.storage_response_error(
@@ -1032,7 +1206,7 @@ class Bucket(object):
         if response.status == 200:
             blogging = BucketLogging()
             h = handler.XmlHandler(blogging, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return blogging
         else:
             raise self.connection.provider.storage_response_error(
@@ -1190,7 +1364,7 @@ class Bucket(object):
         if response.status == 200:
             lifecycle = Lifecycle()
             h = handler.XmlHandler(lifecycle, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return lifecycle
         else:
             raise self.connection.provider.storage_response_error(
@@ -1430,7 +1604,7 @@ class Bucket(object):
         if response.status == 200:
             resp = MultiPartUpload(self)
             h = handler.XmlHandler(resp, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return resp
         else:
             raise self.connection.provider.storage_response_error(
@@ -1459,7 +1633,7 @@ class Bucket(object):
         if response.status == 200 and not contains_error:
             resp = CompleteMultiPartUpload(self)
             h = handler.XmlHandler(resp, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             # Use a dummy key to parse various response headers
             # for versioning, encryption info and then explicitly
             # set the completed MPU object values from key.
@@ -19,21 +19,218 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
-def bucket_lister(bucket, prefix='', delimiter='', marker='', headers=None):
+import threading
+import Queue
+
+from boto.s3.prefix import Prefix
+
+_END_SENTINEL = object()
+
+def _bucket_pages(bucket, prefix='', delimiter='', marker='', headers=None):
     """
-    A generator function for listing keys in a bucket.
+    A generator function for listing a bucket a page at a time.
     """
     more_results = True
     k = None
     while more_results:
         rs = bucket.get_all_keys(prefix=prefix, marker=marker,
                                  delimiter=delimiter, headers=headers)
-        for k in rs:
-            yield k
+        yield rs
+        if rs:
+            k = rs[-1]
         if k:
             marker = rs.next_marker or k.name
         more_results= rs.is_truncated
+
+def bucket_lister(bucket, prefix='', delimiter='', marker='', headers=None):
+    """
+    A generator function for listing keys in a bucket.
+    """
+    for rs in _bucket_pages(bucket, prefix=prefix, delimiter=delimiter,
+                            marker=marker, headers=headers):
+        for k in rs:
+            yield k
         
+def _put(queue, item, stop):
+    """
+    Put ``item`` on a bounded ``queue``, giving up if ``stop`` is set
+    while waiting for room.  Returns False if it gave up.
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=1)
+            return True
+        except Queue.Full:
+            pass
+    return False
+
+def _sorted_entries(pages):
+    """
+    Yields the entries of each page of a delimited listing in name
+    order.  A page lists its keys before its common prefixes, but the
+    pages themselves follow each other in name order.
+    """
+    for rs in pages:
+        for entry in sorted(rs, key=lambda entry: entry.name):
+            yield entry
+
+def _find_shards(entries, found, work_queue, stop, page_size, shared,
+                 num_threads):
+    """
+    Hands each Prefix in ``entries`` to the listing threads as soon as
+    it is seen, putting its output queue on ``found`` in its place;
+    other entries are put on ``found`` in pages.  Ends with
+    _END_SENTINEL, or the error that ended the search, and then tells
+    the listing threads there is no more work.
+    """
+    try:
+        try:
+            page = []
+            for entry in entries:
+                if not isinstance(entry, Prefix):
+                    page.append(entry)
+                    if len(page) == page_size:
+                        if not _put(found, page, stop):
+                            return
+                        page = []
+                    continue
+                if page and not _put(found, page, stop):
+                    return
+                page = []
+                if shared is None:
+                    output = Queue.Queue(4)
+                else:
+                    output = shared
+                if not _put(found, output, stop):
+                    return
+                work_queue.put((entry.name, output))
+            if page and not _put(found, page, stop):
+                return
+            item = _END_SENTINEL
+        except Exception, e:
+            item = e
+        _put(found, item, stop)
+    finally:
+        for i in xrange(num_threads):
+            work_queue.put(_END_SENTINEL)
+
+def _list_shards(lister, bucket, headers, work_queue, stop, page_size):
+    """
+    Lists each ``(shard, output)`` handed to it from ``work_queue``,
+    putting pages of results and then _END_SENTINEL, or the error
+    that ended the listing, on the shard's output queue.
+    """
+    while not stop.is_set():
+        work = work_queue.get()
+        if work is _END_SENTINEL:
+            return
+        shard, output = work
+        try:
+            page = []
+            for k in lister(bucket, prefix=shard, headers=headers):
+                page.append(k)
+                if len(page) == page_size:
+                    if not _put(output, page, stop):
+                        return
+                    page = []
+            if page and not _put(output, page, stop):
+                return
+            item = _END_SENTINEL
+        except Exception, e:
+            item = e
+        if not _put(output, item, stop):
+            return
+
+def parallel_bucket_lister(bucket, prefix='', shards=None, delimiter='/',
+                           num_threads=8, ordered=True, versions=False,
+                           headers=None, page_size=1000):
+    """
+    A generator function for listing keys, or versions, in a bucket
+    on several threads at once.
+
+    The key space is split into shards by prefix, and each shard is
+    listed by its own chain of requests.  Unless ``shards`` is given,
+    the shards are the common prefixes found by listing ``prefix``
+    with ``delimiter``; the keys directly under ``prefix`` are yielded
+    from that first listing, and each shard is listed as soon as that
+    listing reaches it.  Shards given explicitly are relative to
+    ``prefix`` and must not overlap, and only keys within them are
+    listed.  The listing is fastest when there are many more shards
+    than threads.
+
+    If ``ordered`` is True the keys are yielded in the same order as
+    :func:`bucket_lister` yields them; up to ``num_threads`` shards are
+    listed ahead of the one being yielded, each buffering a few pages.
+    Otherwise keys are yielded as they arrive.
+    """
+    if versions:
+        lister = versioned_bucket_lister
+        pages = _versioned_bucket_pages
+    else:
+        lister = bucket_lister
+        pages = _bucket_pages
+    if shards is None:
+        entries = _sorted_entries(pages(bucket, prefix=prefix,
+                                        delimiter=delimiter, headers=headers))
+    else:
+        entries = [Prefix(bucket, prefix + shard) for shard in sorted(shards)]
+    stop = threading.Event()
+    work_queue = Queue.Queue()
+    if ordered:
+        shared = None
+        found = Queue.Queue(num_threads * 4)
+    else:
+        shared = found = Queue.Queue(num_threads * 4)
+    finder = threading.Thread(target=_find_shards,
+                              args=(entries, found, work_queue, stop,
+                                    page_size, shared, num_threads))
+    finder.daemon = True
+    finder.start()
+    for i in xrange(num_threads):
+        thread = threading.Thread(target=_list_shards,
+                                  args=(lister, bucket, headers, work_queue,
+                                        stop, page_size))
+        thread.daemon = True
+        thread.start()
+    try:
+        if ordered:
+            while True:
+                item = found.get()
+                if item is _END_SENTINEL:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, list):
+                    for k in item:
+                        yield k
+                    continue
+                while True:
+                    page = item.get()
+                    if page is _END_SENTINEL:
+                        break
+                    if isinstance(page, Exception):
+                        raise page
+                    for k in page:
+                        yield k
+        else:
+            # The search for shards, and each shard found, end with
+            # their own _END_SENTINEL.
+            remaining = 1
+            while remaining:
+                page = shared.get()
+                if page is _END_SENTINEL:
+                    remaining -= 1
+                    continue
+                if isinstance(page, Exception):
+                    raise page
+                if page is shared:
+                    remaining += 1
+                    continue
+                for k in page:
+                    yield k
+    finally:
+        stop.set()
+
 class BucketListResultSet:
     """
     A resultset for listing keys within a bucket.  Uses the bucket_lister
@@ -41,37 +238,66 @@ class BucketListResultSet:
     transparently handles the results paging from S3 so even if you have
     many thousands of keys within the bucket you can iterate over all
     keys in a reasonably efficient manner.
+
+    If ``num_threads`` is given, the keys are listed on that many
+    threads by :func:`parallel_bucket_lister`, sharded by ``shards``
+    or by the common prefixes under ``prefix``.
     """
 
-    def __init__(self, bucket=None, prefix='', delimiter='', marker='', headers=None):
+    def __init__(self, bucket=None, prefix='', delimiter='', marker='', headers=None,
+                 num_threads=0, shards=None, ordered=True):
+        if num_threads and (delimiter or marker):
+            raise ValueError('delimiter and marker cannot be used with '
+                             'a parallel listing')
         self.bucket = bucket
         self.prefix = prefix
         self.delimiter = delimiter
         self.marker = marker
         self.headers = headers
+        self.num_threads = num_threads
+        self.shards = shards
+        self.ordered = ordered
 
     def __iter__(self):
+        if self.num_threads:
+            return parallel_bucket_lister(self.bucket, prefix=self.prefix,
+                                          shards=self.shards,
+                                          num_threads=self.num_threads,
+                                          ordered=self.ordered,
+                                          headers=self.headers)
         return bucket_lister(self.bucket, prefix=self.prefix,
                              delimiter=self.delimiter, marker=self.marker,
                              headers=self.headers)
 
-def versioned_bucket_lister(bucket, prefix='', delimiter='',
-                            key_marker='', version_id_marker='', headers=None):
+def _versioned_bucket_pages(bucket, prefix='', delimiter='', key_marker='',
+                            version_id_marker='', headers=None):
     """
-    A generator function for listing versions in a bucket.
+    A generator function for listing versions in a bucket a page at a
+    time.
     """
     more_results = True
-    k = None
     while more_results:
         rs = bucket.get_all_versions(prefix=prefix, key_marker=key_marker,
                                      version_id_marker=version_id_marker,
                                      delimiter=delimiter, headers=headers,
                                      max_keys=999)
-        for k in rs:
-            yield k
+        yield rs
         key_marker = rs.next_key_marker
         version_id_marker = rs.next_version_id_marker
         more_results= rs.is_truncated
+
+def versioned_bucket_lister(bucket, prefix='', delimiter='',
+                            key_marker='', version_id_marker='', headers=None):
+    """
+    A generator function for listing versions in a bucket.
+    """
+    for rs in _versioned_bucket_pages(bucket, prefix=prefix,
+                                      delimiter=delimiter,
+                                      key_marker=key_marker,
+                                      version_id_marker=version_id_marker,
+                                      headers=headers):
+        for k in rs:
+            yield k
         
 class VersionedBucketListResultSet:
     """
@@ -83,15 +309,29 @@ class VersionedBucketListResultSet:
     """
 
     def __init__(self, bucket=None, prefix='', delimiter='', key_marker='',
-                 version_id_marker='', headers=None):
+                 version_id_marker='', headers=None, num_threads=0,
+                 shards=None, ordered=True):
+        if num_threads and (delimiter or key_marker or version_id_marker):
+            raise ValueError('delimiter and markers cannot be used with '
+                             'a parallel listing')
         self.bucket = bucket
         self.prefix = prefix
         self.delimiter = delimiter
         self.key_marker = key_marker
         self.version_id_marker = version_id_marker
         self.headers = headers
+        self.num_threads = num_threads
+        self.shards = shards
+        self.ordered = ordered
 
     def __iter__(self):
+        if self.num_threads:
+            return parallel_bucket_lister(self.bucket, prefix=self.prefix,
+                                          shards=self.shards,
+                                          num_threads=self.num_threads,
+                                          ordered=self.ordered,
+                                          versions=True,
+                                          headers=self.headers)
         return versioned_bucket_lister(self.bucket, prefix=self.prefix,
                                        delimiter=self.delimiter,
                                        key_marker=self.key_marker,
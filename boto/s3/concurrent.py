@@ -0,0 +1,799 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Multi-threaded transfer helpers for S3.
+
+All of the worker threads share a single S3Connection.  Each request
+made by a worker checks a connection out of the connection's
+thread-safe :class:`boto.connection.ConnectionPool`, so N workers end
+up using N separate HTTP connections to S3.
+"""
+import math
+import os
+import random
+import rfc822
+import threading
+import time
+import Queue
+import StringIO
+
+import boto
+from boto.s3.multidelete import MultiDeleteResult
+
+_MEGABYTE = 1024 * 1024
+_END_SENTINEL = object()
+
+MIN_PART_SIZE = 5 * _MEGABYTE
+MAXIMUM_NUMBER_OF_PARTS = 10000
+DEFAULT_PART_SIZE = 8 * _MEGABYTE
+# Server-side copies move no data through the client, so fewer, larger
+# parts just save requests.
+DEFAULT_COPY_PART_SIZE = 128 * _MEGABYTE
+# The most a single copy, or the copy of one part, may move.
+MAX_COPY_SIZE = 5 * 1024 * _MEGABYTE
+
+
+def minimum_part_size(size_in_bytes, default_part_size=DEFAULT_PART_SIZE):
+    """
+    Return the part size to use for an object of ``size_in_bytes``.
+
+    S3 requires every part but the last to be at least 5MB and allows
+    no more than 10,000 parts, so the requested part size is raised
+    when it would violate either limit.
+    """
+    part_size = max(default_part_size, MIN_PART_SIZE)
+    if size_in_bytes > part_size * MAXIMUM_NUMBER_OF_PARTS:
+        part_size = int(math.ceil(float(size_in_bytes) /
+                                  MAXIMUM_NUMBER_OF_PARTS))
+    return part_size
+
+
+def calculate_ranges(total_size, part_size, start=0):
+    """
+    Split ``total_size`` bytes starting at ``start`` into a list of
+    ``(part_num, offset, size)`` tuples, numbered from 1.  A zero byte
+    source still yields a single (empty) part.
+    """
+    num_parts = max(int(math.ceil(total_size / float(part_size))), 1)
+    ranges = []
+    for i in xrange(num_parts):
+        offset = i * part_size
+        size = min(part_size, total_size - offset)
+        ranges.append((i + 1, start + offset, size))
+    return ranges
+
+
+def complete_upload_xml(etags):
+    """
+    Return the body of a Complete Multipart Upload request, given a
+    mapping from part number to the ETag of that part.
+    """
+    s = '<CompleteMultipartUpload>\n'
+    for part_num in sorted(etags):
+        s += '  <Part>\n'
+        s += '    <PartNumber>%d</PartNumber>\n' % part_num
+        s += '    <ETag>%s</ETag>\n' % etags[part_num]
+        s += '  </Part>\n'
+    s += '</CompleteMultipartUpload>'
+    return s
+
+
+class TransferThread(threading.Thread):
+    """
+    A worker thread that pulls work items off ``worker_queue``, hands
+    each one to :meth:`_process` and puts a ``(work, result, error)``
+    tuple on ``result_queue``.  A work item that keeps failing is
+    retried up to ``num_retries`` times before its last error is
+    reported.  Subclasses implement :meth:`_process`.
+    """
+
+    def __init__(self, worker_queue, result_queue, num_retries=5,
+                 time_between_retries=1):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.should_continue = True
+        self._worker_queue = worker_queue
+        self._result_queue = result_queue
+        self._num_retries = num_retries
+        self._time_between_retries = time_between_retries
+
+    def run(self):
+        try:
+            while self.should_continue:
+                try:
+                    work = self._worker_queue.get(timeout=1)
+                except Queue.Empty:
+                    continue
+                if work is _END_SENTINEL:
+                    return
+                result, error = self._process_with_retries(work)
+                self._result_queue.put((work, result, error))
+        finally:
+            self._cleanup()
+
+    def _process_with_retries(self, work):
+        error = None
+        for i in xrange(self._num_retries + 1):
+            if not self.should_continue:
+                break
+            try:
+                return self._process(work), None
+            except Exception, e:
+                boto.log.debug('Exception caught processing %s: %s',
+                               work, e, exc_info=True)
+                error = e
+                if i < self._num_retries:
+                    time.sleep(random.random() * self._time_between_retries *
+                               (2 ** i))
+        return None, error
+
+    def _process(self, work):
+        raise NotImplementedError
+
+    def _cleanup(self):
+        pass
+
+
+def run_workers(threads, work_items, worker_queue, result_queue):
+    """
+    Start ``threads``, feed them ``work_items`` and yield each
+    ``(work, result)`` pair as it completes.  If any work item fails
+    after its retries the remaining workers are told to stop and the
+    error is raised.
+    """
+    count = 0
+    for work in work_items:
+        worker_queue.put(work)
+        count += 1
+    for thread in threads:
+        worker_queue.put(_END_SENTINEL)
+    for thread in threads:
+        thread.start()
+    try:
+        for i in xrange(count):
+            work, result, error = result_queue.get()
+            if error is not None:
+                raise error
+            yield work, result
+    finally:
+        for thread in threads:
+            thread.should_continue = False
+        for thread in threads:
+            thread.join()
+
+
+class UploadWorkerThread(TransferThread):
+    """
+    Uploads ``(part_num, offset, size)`` ranges of a file as parts of
+    a :class:`boto.s3.multipart.MultiPartUpload`.
+
+    When ``filename`` is given each thread opens its own handle on the
+    file and streams the part straight from disk.  Otherwise the part
+    is read out of the shared ``file_obj`` while holding ``lock``.
+    """
+
+    def __init__(self, mp, worker_queue, result_queue, filename=None,
+                 file_obj=None, lock=None, **kwargs):
+        TransferThread.__init__(self, worker_queue, result_queue, **kwargs)
+        self._mp = mp
+        self._filename = filename
+        self._file_obj = file_obj
+        self._lock = lock
+        self._fp = None
+
+    def _process(self, work):
+        part_num, offset, size = work
+        if self._filename is not None:
+            if self._fp is None:
+                self._fp = open(self._filename, 'rb')
+            fp = self._fp
+            fp.seek(offset)
+        else:
+            self._lock.acquire()
+            try:
+                self._file_obj.seek(offset)
+                fp = StringIO.StringIO(self._file_obj.read(size))
+            finally:
+                self._lock.release()
+        key = self._mp.upload_part_from_file(fp, part_num, size=size)
+        return key.etag
+
+    def _cleanup(self):
+        if self._fp is not None:
+            self._fp.close()
+
+
+class ConcurrentUploader(object):
+    """
+    Uploads a file to S3 as a multipart upload, sending several parts
+    at the same time.
+
+    Each part is retried on its own if it fails; only when a part has
+    exhausted its retries is the whole multipart upload cancelled.
+    """
+
+    def __init__(self, bucket, part_size=DEFAULT_PART_SIZE, num_threads=10,
+                 num_retries=5, time_between_retries=1):
+        """
+        :type bucket: :class:`boto.s3.bucket.Bucket`
+        :param bucket: The bucket to upload to.
+
+        :type part_size: int
+        :param part_size: The size, in bytes, of each part.  This is
+            raised if needed to satisfy the S3 part limits.
+
+        :type num_threads: int
+        :param num_threads: The number of parts to upload at once.
+
+        :type num_retries: int
+        :param num_retries: How many times a single part is retried
+            before the upload is abandoned.
+        """
+        self.bucket = bucket
+        self.part_size = part_size
+        self.num_threads = num_threads
+        self.num_retries = num_retries
+        self.time_between_retries = time_between_retries
+
+    def upload(self, key_name, filename=None, file_obj=None, headers=None,
+               reduced_redundancy=False, metadata=None, encrypt_key=False,
+               policy=None, cb=None):
+        """
+        Upload the contents of ``filename`` or the seekable ``file_obj``
+        (from its current position to EOF) to ``key_name``.  The
+        remaining parameters are as defined for
+        :meth:`boto.s3.bucket.Bucket.initiate_multipart_upload`.
+
+        :type cb: function
+        :param cb: An optional callback called with the number of
+            bytes uploaded so far and the total size each time a part
+            completes.
+
+        :rtype: :class:`boto.s3.multipart.CompleteMultiPartUpload`
+        :returns: An object representing the completed upload.
+        """
+        mp = self.bucket.initiate_multipart_upload(
+            key_name, headers=headers, reduced_redundancy=reduced_redundancy,
+            metadata=metadata, encrypt_key=encrypt_key, policy=policy)
+        return self.upload_parts(mp, filename=filename, file_obj=file_obj,
+                                 cb=cb)
+
+    def upload_parts(self, mp, filename=None, file_obj=None, cb=None):
+        """
+        Upload the parts of an already initiated multipart upload and
+        complete it.  If any part cannot be uploaded the multipart
+        upload is cancelled and the part's error is raised.
+        """
+        if filename is not None:
+            start = 0
+            total_size = os.path.getsize(filename)
+        elif file_obj is not None:
+            start = file_obj.tell()
+            file_obj.seek(0, os.SEEK_END)
+            total_size = file_obj.tell() - start
+            file_obj.seek(start)
+        else:
+            raise ValueError('Either filename or file_obj must be provided')
+        part_size = minimum_part_size(total_size, self.part_size)
+        ranges = calculate_ranges(total_size, part_size, start)
+
+        worker_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+        lock = threading.Lock()
+        threads = []
+        for i in xrange(min(self.num_threads, len(ranges))):
+            threads.append(UploadWorkerThread(
+                mp, worker_queue, result_queue, filename=filename,
+                file_obj=file_obj, lock=lock, num_retries=self.num_retries,
+                time_between_retries=self.time_between_retries))
+
+        etags = {}
+        uploaded = 0
+        try:
+            for work, etag in run_workers(threads, ranges, worker_queue,
+                                          result_queue):
+                part_num, offset, size = work
+                etags[part_num] = etag
+                uploaded += size
+                if cb:
+                    cb(uploaded, total_size)
+            return mp.bucket.complete_multipart_upload(
+                mp.key_name, mp.id, complete_upload_xml(etags))
+        except:
+            boto.log.debug('Cancelling multipart upload %s', mp.id)
+            mp.cancel_upload()
+            raise
+
+
+class DownloadWorkerThread(TransferThread):
+    """
+    Downloads ``(part_num, offset, size)`` ranges of a key with ranged
+    GETs and writes each one at its offset in the local file.
+
+    When ``filename`` is given each thread writes through its own
+    handle on the (already preallocated) file.  Otherwise writes go to
+    the shared ``file_obj`` while holding ``lock``.
+    """
+
+    def __init__(self, key, worker_queue, result_queue, filename=None,
+                 file_obj=None, lock=None, buffer_size=_MEGABYTE, **kwargs):
+        TransferThread.__init__(self, worker_queue, result_queue, **kwargs)
+        self._key = key
+        self._filename = filename
+        self._file_obj = file_obj
+        self._lock = lock
+        self._buffer_size = buffer_size
+        self._fp = None
+
+    def _write(self, offset, data):
+        if self._filename is not None:
+            if self._fp is None:
+                self._fp = open(self._filename, 'r+b')
+            self._fp.seek(offset)
+            self._fp.write(data)
+        else:
+            self._lock.acquire()
+            try:
+                self._file_obj.seek(offset)
+                self._file_obj.write(data)
+            finally:
+                self._lock.release()
+
+    def _process(self, work):
+        part_num, offset, size = work
+        src = self._key
+        # Each range gets its own Key object since a Key holds on to
+        # the response it is reading from.
+        key = src.bucket.new_key(src.name)
+        headers = {'Range': 'bytes=%d-%d' % (offset, offset + size - 1)}
+        if src.etag:
+            # Fail rather than stitch together ranges of two different
+            # versions of the object if it is overwritten mid-download.
+            headers['If-Match'] = src.etag
+        query_args = ''
+        if src.version_id:
+            query_args = 'versionId=%s' % src.version_id
+        key.open_read(headers=headers, query_args=query_args)
+        # A server that ignores the Range header answers 200 with the
+        # whole object, which must not be written at this offset.
+        content_range = key.resp.getheader('content-range') or ''
+        if key.resp.status != 206 or not content_range.startswith(
+                'bytes %d-%d/' % (offset, offset + size - 1)):
+            status = key.resp.status
+            key.close()
+            provider = src.bucket.connection.provider
+            raise provider.storage_data_error(
+                'Range %d-%d of %s was not honoured: got status %d, '
+                'Content-Range %r' % (offset, offset + size - 1, src.name,
+                                      status, content_range))
+        received = 0
+        try:
+            while received < size:
+                data = key.read(min(self._buffer_size, size - received))
+                if not data:
+                    break
+                self._write(offset + received, data)
+                received += len(data)
+        finally:
+            key.close()
+        if received != size:
+            provider = src.bucket.connection.provider
+            raise provider.storage_data_error(
+                'Range %d-%d of %s was truncated: expected %d bytes, got %d' %
+                (offset, offset + size - 1, src.name, size, received))
+        return received
+
+    def _cleanup(self):
+        if self._fp is not None:
+            self._fp.close()
+
+
+class ConcurrentDownloader(object):
+    """
+    Downloads a key from S3 by fetching several byte ranges of it at
+    the same time.
+
+    Every range is requested with an ``If-Match`` on the key's ETag and
+    its length is checked before it counts as done, so a range that
+    comes back short, or from a different version of the object, is
+    retried on its own.
+    """
+
+    def __init__(self, part_size=DEFAULT_PART_SIZE, num_threads=10,
+                 num_retries=5, time_between_retries=1):
+        """
+        :type part_size: int
+        :param part_size: The size, in bytes, of each ranged GET.
+
+        :type num_threads: int
+        :param num_threads: The number of ranges to download at once.
+
+        :type num_retries: int
+        :param num_retries: How many times a single range is retried
+            before the download is abandoned.
+        """
+        self.part_size = part_size
+        self.num_threads = num_threads
+        self.num_retries = num_retries
+        self.time_between_retries = time_between_retries
+
+    def download(self, key, filename=None, file_obj=None, cb=None,
+                 num_cb=10):
+        """
+        Download ``key`` into ``filename`` or the seekable, writable
+        ``file_obj``.  The file is preallocated to the size of the key
+        and each range is written at its own offset.
+
+        If the key's size or ETag are not known yet (for example, a key
+        made with :meth:`boto.s3.bucket.Bucket.new_key`) a HEAD request
+        is made to fetch them first.
+
+        :type cb: function
+        :param cb: a callback function that will be called to report
+            progress on the download.  The callback should accept two
+            integer parameters, the first representing the number of
+            bytes that have been downloaded across all ranges and the
+            second representing the size of the object.
+
+        :type num_cb: int
+        :param num_cb: (optional) If a callback is specified with the
+            cb parameter this parameter determines the granularity of
+            the callback by defining the maximum number of times the
+            callback will be called during the file transfer.
+        """
+        if filename is None and file_obj is None:
+            raise ValueError('Either filename or file_obj must be provided')
+        if key.size is None or key.etag is None:
+            bucket, key_name = key.bucket, key.name
+            key = bucket.get_key(key_name, version_id=key.version_id)
+            if key is None:
+                raise bucket.connection.provider.storage_response_error(
+                    404, 'Not Found', 'Key %s/%s does not exist' %
+                    (bucket.name, key_name))
+        total_size = key.size
+        if filename is not None:
+            fp = open(filename, 'wb')
+            try:
+                fp.truncate(total_size)
+            finally:
+                fp.close()
+        else:
+            file_obj.truncate(total_size)
+        if total_size == 0:
+            ranges = []
+        else:
+            ranges = calculate_ranges(total_size, self.part_size)
+
+        worker_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+        lock = threading.Lock()
+        threads = []
+        for i in xrange(min(self.num_threads, len(ranges))):
+            threads.append(DownloadWorkerThread(
+                key, worker_queue, result_queue, filename=filename,
+                file_obj=file_obj, lock=lock, num_retries=self.num_retries,
+                time_between_retries=self.time_between_retries))
+
+        if cb and num_cb > 0:
+            cb_step = total_size / float(num_cb)
+        else:
+            cb_step = 0
+        downloaded = 0
+        next_cb = cb_step
+        if cb:
+            cb(downloaded, total_size)
+        for work, received in run_workers(threads, ranges, worker_queue,
+                                          result_queue):
+            downloaded += received
+            if cb and (downloaded >= next_cb or downloaded == total_size):
+                cb(downloaded, total_size)
+                next_cb = downloaded + cb_step
+
+        if filename is not None and key.last_modified is not None:
+            # Match Key.get_contents_to_filename and carry the object's
+            # modification time over to the local file.
+            try:
+                modified_tuple = rfc822.parsedate_tz(key.last_modified)
+                modified_stamp = int(rfc822.mktime_tz(modified_tuple))
+                os.utime(filename, (modified_stamp, modified_stamp))
+            except Exception:
+                pass
+        return key
+
+
+class CopyWorkerThread(TransferThread):
+    """
+    Copies ``(part_num, offset, size)`` ranges of ``src_key`` into a
+    :class:`boto.s3.multipart.MultiPartUpload` with server-side
+    Upload Part - Copy requests.
+
+    Every range is pinned to the version of the source that was seen
+    when the copy started: by its version id if it has one, otherwise
+    with an ``x-amz-copy-source-if-match`` on its ETag.
+    """
+
+    def __init__(self, mp, src_key, worker_queue, result_queue, **kwargs):
+        TransferThread.__init__(self, worker_queue, result_queue, **kwargs)
+        self._mp = mp
+        self._src_key = src_key
+
+    def _process(self, work):
+        part_num, offset, size = work
+        src = self._src_key
+        headers = {}
+        if not src.version_id and src.etag:
+            provider = self._mp.bucket.connection.provider
+            headers[provider.header_prefix + 'copy-source-if-match'] = \
+                src.etag
+        key = self._mp.copy_part_from_key(
+            src.bucket.name, src.name, part_num, start=offset,
+            end=offset + size - 1, src_version_id=src.version_id,
+            headers=headers)
+        return key.etag
+
+
+class ConcurrentCopier(object):
+    """
+    Copies a key with a multipart upload whose parts are copied from
+    byte ranges of the source on the server side, several at once.
+    Unlike a single PUT-copy this works for keys larger than 5GB.
+
+    Each part is retried on its own if it fails; only when a part has
+    exhausted its retries is the whole multipart upload cancelled.
+    """
+
+    def __init__(self, bucket, part_size=DEFAULT_COPY_PART_SIZE,
+                 num_threads=10, num_retries=5, time_between_retries=1):
+        """
+        :type bucket: :class:`boto.s3.bucket.Bucket`
+        :param bucket: The bucket to copy to.
+
+        :type part_size: int
+        :param part_size: The size, in bytes, of each part.  This is
+            raised if needed to satisfy the S3 part limits.
+
+        :type num_threads: int
+        :param num_threads: The number of parts to copy at once.
+
+        :type num_retries: int
+        :param num_retries: How many times a single part is retried
+            before the copy is abandoned.
+        """
+        self.bucket = bucket
+        self.part_size = part_size
+        self.num_threads = num_threads
+        self.num_retries = num_retries
+        self.time_between_retries = time_between_retries
+
+    def copy(self, new_key_name, src_key, metadata=None,
+             reduced_redundancy=False, preserve_acl=False, encrypt_key=False,
+             headers=None, cb=None):
+        """
+        Copy ``src_key``, a key returned by
+        :meth:`boto.s3.bucket.Bucket.get_key` so that its size, ETag
+        and metadata are known, to ``new_key_name``.
+
+        As with :meth:`boto.s3.bucket.Bucket.copy_key`, the source's
+        metadata and content headers are copied to the new key unless
+        ``metadata`` is given, in which case it replaces them.
+
+        :type cb: function
+        :param cb: An optional callback called with the number of
+            bytes copied so far and the total size each time a part
+            completes.
+
+        :rtype: :class:`boto.s3.key.Key`
+        :returns: The new key.
+        """
+        headers = dict(headers or {})
+        if metadata is None:
+            metadata = src_key.metadata
+            for header, value in (('Content-Type', src_key.content_type),
+                                  ('Content-Encoding',
+                                   src_key.content_encoding),
+                                  ('Content-Disposition',
+                                   src_key.content_disposition),
+                                  ('Content-Language',
+                                   src_key.content_language),
+                                  ('Cache-Control', src_key.cache_control)):
+                if value and header not in headers:
+                    headers[header] = value
+        if preserve_acl:
+            acl = src_key.bucket.get_xml_acl(src_key.name,
+                                             version_id=src_key.version_id)
+        total_size = src_key.size
+        part_size = minimum_part_size(total_size,
+                                      min(self.part_size, MAX_COPY_SIZE))
+        ranges = calculate_ranges(total_size, part_size)
+
+        mp = self.bucket.initiate_multipart_upload(
+            new_key_name, headers=headers,
+            reduced_redundancy=reduced_redundancy, metadata=metadata,
+            encrypt_key=encrypt_key)
+        worker_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+        threads = []
+        for i in xrange(min(self.num_threads, len(ranges))):
+            threads.append(CopyWorkerThread(
+                mp, src_key, worker_queue, result_queue,
+                num_retries=self.num_retries,
+                time_between_retries=self.time_between_retries))
+
+        etags = {}
+        copied = 0
+        try:
+            for work, etag in run_workers(threads, ranges, worker_queue,
+                                          result_queue):
+                part_num, offset, size = work
+                etags[part_num] = etag
+                copied += size
+                if cb:
+                    cb(copied, total_size)
+            completed = self.bucket.complete_multipart_upload(
+                new_key_name, mp.id, complete_upload_xml(etags))
+        except:
+            boto.log.debug('Cancelling multipart upload %s', mp.id)
+            mp.cancel_upload()
+            raise
+        if preserve_acl:
+            self.bucket.set_xml_acl(acl, new_key_name)
+        key = self.bucket.new_key(new_key_name)
+        key.etag = completed.etag
+        key.version_id = completed.version_id
+        key.size = total_size
+        return key
+
+
+#
+# Multi-object delete error codes worth sending again.
+#
+RETRYABLE_DELETE_ERRORS = frozenset(['InternalError', 'ServiceUnavailable',
+                                     'SlowDown'])
+
+
+class DeleteWorkerThread(TransferThread):
+    """
+    Sends ``(objects, attempt, not_before)`` batches of
+    ``(key_name, version_id)`` pairs with
+    :meth:`boto.s3.bucket.Bucket.delete_objects`, waiting until the
+    time ``not_before`` to send a batch that is being retried.
+    """
+
+    def __init__(self, bucket, worker_queue, result_queue, quiet=False,
+                 mfa_token=None, headers=None, **kwargs):
+        TransferThread.__init__(self, worker_queue, result_queue, **kwargs)
+        self._bucket = bucket
+        self._quiet = quiet
+        self._mfa_token = mfa_token
+        self._headers = headers
+
+    def _process(self, work):
+        objects, attempt, not_before = work
+        # Back off here rather than in the thread collecting results,
+        # so the other requests carry on meanwhile.
+        delay = not_before - time.time()
+        while delay > 0 and self.should_continue:
+            time.sleep(min(delay, 1))
+            delay = not_before - time.time()
+        return self._bucket.delete_objects(objects, self._quiet,
+                                           self._mfa_token, self._headers)
+
+
+class ConcurrentDeleter(object):
+    """
+    Deletes keys with several Multi-object delete requests of up to
+    1000 keys in flight at once.
+
+    Keys whose delete fails with an error S3 expects to clear up, such
+    as ``SlowDown``, are sent again in a later request, up to
+    ``num_retries`` times.  A request that fails outright is retried
+    as a whole.
+    """
+
+    def __init__(self, num_threads=10, num_retries=5, time_between_retries=1):
+        """
+        :type num_threads: int
+        :param num_threads: The number of requests to send at once.
+
+        :type num_retries: int
+        :param num_retries: How many times a request, or a key that
+            failed to delete, is retried.
+        """
+        self.num_threads = num_threads
+        self.num_retries = num_retries
+        self.time_between_retries = time_between_retries
+
+    def delete(self, bucket, keys, quiet=False, mfa_token=None,
+               headers=None):
+        """
+        Delete ``keys``, any iterable accepted by
+        :meth:`boto.s3.bucket.Bucket.delete_keys`, from ``bucket``.
+        This is a generator that yields a
+        :class:`boto.s3.multidelete.MultiDeleteResult` for each request
+        as it completes; keys are read from ``keys`` only as requests
+        are sent, so it can be a listing of millions of keys.  If a
+        request fails after its retries the error is raised.
+        """
+        worker_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+        threads = []
+        for i in xrange(self.num_threads):
+            thread = DeleteWorkerThread(
+                bucket, worker_queue, result_queue, quiet=quiet,
+                mfa_token=mfa_token, headers=headers,
+                num_retries=self.num_retries,
+                time_between_retries=self.time_between_retries)
+            thread.start()
+            threads.append(thread)
+        in_flight = 0
+        try:
+            for objects, errors in bucket.split_delete_batches(keys):
+                if errors:
+                    rs = MultiDeleteResult(bucket)
+                    rs.errors.extend(errors)
+                    yield rs
+                if not objects:
+                    continue
+                # Keep the threads busy without reading far ahead.
+                while in_flight >= self.num_threads * 2:
+                    rs, requeued = self._next_result(worker_queue,
+                                                     result_queue)
+                    in_flight += requeued - 1
+                    yield rs
+                worker_queue.put((objects, 0, 0))
+                in_flight += 1
+            while in_flight:
+                rs, requeued = self._next_result(worker_queue, result_queue)
+                in_flight += requeued - 1
+                yield rs
+        finally:
+            for thread in threads:
+                thread.should_continue = False
+                worker_queue.put(_END_SENTINEL)
+            for thread in threads:
+                thread.join()
+
+    def _next_result(self, worker_queue, result_queue):
+        """
+        Wait for the next request to complete.  Returns its result,
+        less the keys that are to be sent again, and the number of
+        requests queued to send them.
+        """
+        work, result, error = result_queue.get()
+        if error is not None:
+            raise error
+        objects, attempt, not_before = work
+        retry = []
+        if attempt < self.num_retries:
+            errors = []
+            for e in result.errors:
+                if e.code in RETRYABLE_DELETE_ERRORS:
+                    retry.append((e.key, e.version_id))
+                else:
+                    errors.append(e)
+            result.errors = errors
+        if not retry:
+            return result, 0
+        boto.log.debug('Retrying %d failed deletes' % len(retry))
+        delay = random.random() * self.time_between_retries * (2 ** attempt)
+        worker_queue.put((retry, attempt + 1, time.time() + delay))
+        return result, 1
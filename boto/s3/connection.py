@@ -21,7 +21,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
-import xml.sax
 import urllib
 import base64
 import time
@@ -368,7 +367,7 @@ class S3Connection(AWSAuthConnection):
                 response.status, response.reason, body)
         rs = ResultSet([('Bucket', self.bucket_class)])
         h = handler.XmlHandler(rs, self)
-        xml.sax.parseString(body, h)
+        handler.parseString(body, h)
         return rs
 
     def get_canonical_user_id(self, headers=None):
@@ -47,6 +47,12 @@ class Key(object):
 
     BufferSize = 8192
 
+    # The size of the reads and writes send_file and get_file use to
+    # move object contents.  Larger reads mean fewer trips through the
+    # Python-level loop per byte.
+    TransferBufferSize = boto.config.getint('Boto', 'transfer_buffer_size',
+                                            1024 * 1024)
+
     def __init__(self, bucket=None, name=None):
         self.bucket = bucket
         self.name = name
@@ -597,6 +603,7 @@ class Key(object):
                 http_conn.set_debuglevel(0)
 
             data_len = 0
+            buffer_size = self.TransferBufferSize
             if cb:
                 if size:
                     cb_size = size
@@ -607,9 +614,9 @@ class Key(object):
                 if chunked_transfer and cb_size == 0:
                     # For chunked Transfer, we call the cb for every 1MB
                     # of data transferred, except when we know size.
-                    cb_count = (1024 * 1024) / self.BufferSize
+                    cb_count = max((1024 * 1024) / buffer_size, 1)
                 elif num_cb > 1:
-                    cb_count = int(math.ceil(cb_size / self.BufferSize / (num_cb - 1.0)))
+                    cb_count = int(math.ceil(cb_size / buffer_size / (num_cb - 1.0)))
                 elif num_cb < 0:
                     cb_count = -1
                 else:
@@ -617,11 +624,14 @@ class Key(object):
                 i = 0
                 cb(data_len, cb_size)
 
+            # Read into one reusable buffer where the file allows it,
+            # rather than allocating a new string for every chunk.
+            read_chunk = boto.utils.chunk_reader(fp, buffer_size)
             bytes_togo = size
-            if bytes_togo and bytes_togo < self.BufferSize:
-                chunk = fp.read(bytes_togo)
+            if bytes_togo and bytes_togo < buffer_size:
+                chunk = read_chunk(bytes_togo)
             else:
-                chunk = fp.read(self.BufferSize)
+                chunk = read_chunk(buffer_size)
             if spos is None:
                 # read at least something from a non-seekable fp.
                 self.read_from_stream = True
@@ -636,19 +646,19 @@ class Key(object):
                     http_conn.send(chunk)
                 if m:
                     m.update(chunk)
-                if bytes_togo:
-                    bytes_togo -= chunk_len
-                    if bytes_togo <= 0:
-                        break
                 if cb:
                     i += 1
                     if i == cb_count or cb_count == -1:
                         cb(data_len, cb_size)
                         i = 0
-                if bytes_togo and bytes_togo < self.BufferSize:
-                    chunk = fp.read(bytes_togo)
+                if bytes_togo:
+                    bytes_togo -= chunk_len
+                    if bytes_togo <= 0:
+                        break
+                if bytes_togo and bytes_togo < buffer_size:
+                    chunk = read_chunk(bytes_togo)
                 else:
-                    chunk = fp.read(self.BufferSize)
+                    chunk = read_chunk(buffer_size)
 
             self.size = data_len
 
@@ -676,6 +686,8 @@ class Key(object):
             elif response.status >= 200 and response.status <= 299:
                 self.etag = response.getheader('etag')
                 if self.etag != '"%s"' % self.md5:
+                    # Note the version stored, so it can be deleted.
+                    self.handle_version_headers(response, force=True)
                     raise provider.storage_data_error(
                         'ETag from S3 did not match computed MD5')
                 return response
@@ -745,7 +757,7 @@ class Key(object):
             hash as the first element and the base64 encoded version
             of the plain digest as the second element.
         """
-        tup = compute_md5(fp, size=size)
+        tup = compute_md5(fp, buf_size=self.TransferBufferSize, size=size)
         # Returned values are MD5 hash, base64 encoded MD5 hash, and data size.
         # The internal implementation of compute_md5() needs to return the
         # data size but we don't want to return that value to the external
@@ -847,7 +859,8 @@ class Key(object):
     def set_contents_from_file(self, fp, headers=None, replace=True,
                                cb=None, num_cb=10, policy=None, md5=None,
                                reduced_redundancy=False, query_args=None,
-                               encrypt_key=False, size=None, rewind=False):
+                               encrypt_key=False, size=None, rewind=False,
+                               single_pass=False):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the contents of the file pointed to by 'fp' as the
@@ -920,6 +933,15 @@ class Key(object):
             it. The default behaviour is False which reads from the
             current position of the file pointer (fp).
 
+        :type single_pass: bool
+        :param single_pass: (optional) If True and no md5 is given,
+            the file is read only once: the MD5 is computed as the
+            data is sent rather than beforehand, and checked against
+            the ETag returned.  No Content-MD5 header can be sent, so
+            a corrupted upload is only detected once it has been
+            stored; the key is then deleted and the provider's
+            storage_data_error is raised.
+
         :rtype: int
         :return: The number of bytes written to the key.
         """
@@ -964,41 +986,58 @@ class Key(object):
                 self.size = None
             else:
                 chunked_transfer = False
-                if not md5:
+                if not md5 and not single_pass:
                     # compute_md5() and also set self.size to actual
                     # size of the bytes read computing the md5.
                     md5 = self.compute_md5(fp, size)
                     # adjust size if required
                     size = self.size
-                elif size:
+                elif size and md5:
                     self.size = size
                 else:
-                    # If md5 is provided, still need to size so
-                    # calculate based on bytes to end of content
+                    # If md5 is provided, or will be computed by
+                    # send_file, still need to size so calculate based
+                    # on bytes to end of content
                     spos = fp.tell()
                     fp.seek(0, os.SEEK_END)
                     self.size = fp.tell() - spos
                     fp.seek(spos)
+                    if size:
+                        self.size = min(size, self.size)
                     size = self.size
-                self.md5 = md5[0]
-                self.base64md5 = md5[1]
+                if md5:
+                    self.md5 = md5[0]
+                    self.base64md5 = md5[1]
+                else:
+                    self.md5 = self.base64md5 = self.etag = None
 
             if self.name == None:
+                if self.md5 is None:
+                    raise BotoClientError('Cannot determine the destination '
+                                          'object name without an MD5')
                 self.name = self.md5
             if not replace:
                 if self.bucket.lookup(self.name):
                     return
 
-            self.send_file(fp, headers=headers, cb=cb, num_cb=num_cb,
-                           query_args=query_args,
-                           chunked_transfer=chunked_transfer, size=size)
+            try:
+                self.send_file(fp, headers=headers, cb=cb, num_cb=num_cb,
+                               query_args=query_args,
+                               chunked_transfer=chunked_transfer, size=size)
+            except provider.storage_data_error:
+                if not md5 and not chunked_transfer and self.etag and \
+                        self.etag != '"%s"' % self.md5:
+                    # The corrupted data was stored, as there was no
+                    # Content-MD5 to reject it with.
+                    self.delete()
+                raise
             # return number of bytes written.
             return self.size
 
     def set_contents_from_filename(self, filename, headers=None, replace=True,
                                    cb=None, num_cb=10, policy=None, md5=None,
                                    reduced_redundancy=False,
-                                   encrypt_key=False):
+                                   encrypt_key=False, single_pass=False):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the contents of the file named by 'filename'.
@@ -1052,11 +1091,16 @@ class Key(object):
             :param encrypt_key: If True, the new copy of the object
             will be encrypted on the server-side by S3 and will be
             stored in an encrypted form while at rest in S3.
+
+        :type single_pass: bool
+        :param single_pass: If True, the file is read only once, as
+            for :meth:`set_contents_from_file`.
         """
         fp = open(filename, 'rb')
         self.set_contents_from_file(fp, headers, replace, cb, num_cb,
                                     policy, md5, reduced_redundancy,
-                                    encrypt_key=encrypt_key)
+                                    encrypt_key=encrypt_key,
+                                    single_pass=single_pass)
         fp.close()
 
     def set_contents_from_string(self, s, headers=None, replace=True,
@@ -1189,6 +1233,7 @@ class Key(object):
                   override_num_retries=override_num_retries)
 
         data_len = 0
+        buffer_size = self.TransferBufferSize
         if cb:
             if self.size is None:
                 cb_size = 0
@@ -1197,16 +1242,19 @@ class Key(object):
             if self.size is None and num_cb != -1:
                 # If size is not available due to chunked transfer for example,
                 # we'll call the cb for every 1MB of data transferred.
-                cb_count = (1024 * 1024) / self.BufferSize
+                cb_count = max((1024 * 1024) / buffer_size, 1)
             elif num_cb > 1:
-                cb_count = int(math.ceil(cb_size/self.BufferSize/(num_cb-1.0)))
+                cb_count = int(math.ceil(cb_size/buffer_size/(num_cb-1.0)))
             elif num_cb < 0:
                 cb_count = -1
             else:
                 cb_count = 0
             i = 0
             cb(data_len, cb_size)
-        for bytes in self:
+        while True:
+            bytes = self.resp.read(buffer_size)
+            if not bytes:
+                break
             fp.write(bytes)
             data_len += len(bytes)
             if m:
@@ -23,7 +23,6 @@
 import user
 import key
 from boto import handler
-import xml.sax
 
 class CompleteMultiPartUpload(object):
     """
@@ -213,7 +212,7 @@ class MultiPartUpload(object):
         body = response.read()
         if response.status == 200:
             h = handler.XmlHandler(self, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return self._parts
 
     def upload_part_from_file(self, fp, part_num, headers=None, replace=True,
@@ -230,6 +229,9 @@ class MultiPartUpload(object):
 
         The other parameters are exactly as defined for the
         :class:`boto.s3.key.Key` set_contents_from_file method.
+
+        :rtype: :class:`boto.s3.key.Key` or subclass
+        :returns: The uploaded part key object.
         """
         if part_num < 1:
             raise ValueError('Part numbers must be greater than zero')
@@ -238,9 +240,11 @@ class MultiPartUpload(object):
         key.set_contents_from_file(fp, headers, replace, cb, num_cb, policy,
                                    md5, reduced_redundancy=False,
                                    query_args=query_args, size=size)
+        return key
 
     def copy_part_from_key(self, src_bucket_name, src_key_name, part_num,
-                           start=None, end=None):
+                           start=None, end=None, src_version_id=None,
+                           headers=None):
         """
         Copy another part of this MultiPart Upload.
 
@@ -258,19 +262,28 @@ class MultiPartUpload(object):
 
         :type end: int
         :param end: Zero-based byte offset to copy to
+
+        :type src_version_id: string
+        :param src_version_id: The version of the source key to copy
+            from.  If not specified, the newest version is copied.
+
+        :type headers: dict
+        :param headers: Additional headers to send with the request,
+            such as ``x-amz-copy-source-if-match``.
         """
         if part_num < 1:
             raise ValueError('Part numbers must be greater than zero')
         query_args = 'uploadId=%s&partNumber=%d' % (self.id, part_num)
+        headers = dict(headers or {})
         if start is not None and end is not None:
             rng = 'bytes=%s-%s' % (start, end)
             provider = self.bucket.connection.provider
-            headers = {provider.copy_source_range_header: rng}
-        else:
-            headers = None
+            headers[provider.copy_source_range_header] = rng
         return self.bucket.copy_key(self.key_name, src_bucket_name,
-                                    src_key_name, storage_class=None,
-                                    headers=headers,
+                                    src_key_name,
+                                    src_version_id=src_version_id,
+                                    storage_class=None,
+                                    headers=headers or None,
                                     query_args=query_args)
 
     def complete_upload(self):
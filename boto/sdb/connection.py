@@ -19,7 +19,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
-import xml.sax
 import threading
 import boto
 from boto import handler
@@ -495,7 +494,7 @@ class SDBConnection(AWSQueryConnection):
             if item == None:
                 item = self.item_cls(domain, item_name)
             h = handler.XmlHandler(item, self)
-            xml.sax.parseString(body, h)
+            handler.parseString(body, h)
             return item
         else:
             raise SDBResponseError(response.status, response.reason, body)
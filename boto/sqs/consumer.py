@@ -0,0 +1,427 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Consumes the messages of an SQS queue on a pool of threads.
+"""
+import threading
+import time
+import Queue
+
+import boto
+
+_END_SENTINEL = object()
+
+#
+# The most entries SQS accepts in one ReceiveMessage, DeleteMessageBatch
+# or ChangeMessageVisibilityBatch request.
+#
+MAX_BATCH_SIZE = 10
+
+
+def chunks(items, size=MAX_BATCH_SIZE):
+    """Split ``items`` into lists of at most ``size`` items."""
+    return [items[i:i + size] for i in xrange(0, len(items), size)]
+
+
+class QueueConsumer(object):
+    """
+    Receives messages from ``queue`` and calls ``handler`` with each
+    one on a pool of worker threads.
+
+    ``num_receivers`` threads keep receiving batches of up to 10
+    messages into a buffer of ``buffer_size`` messages, so the workers
+    don't wait on the network.  When the buffer is full the receivers
+    wait for the workers to catch up.
+
+    A message is deleted once ``handler`` returns without raising.
+    Deletes are sent in batches of up to 10, at least every
+    ``ack_interval`` seconds.  If ``handler`` raises, the message is
+    left alone and is received again once its visibility timeout
+    expires.
+
+    While a message is waiting in the buffer or being handled, its
+    visibility timeout is extended, in batches, whenever it is due to
+    expire within the next two ``heartbeat_interval`` periods, so slow
+    handlers don't cause messages to be delivered twice.
+
+    A consumer is started with :meth:`start` and stopped with
+    :meth:`stop`, which waits for the messages already received to be
+    handled and deleted.  It can also be used as a context manager::
+
+        >>> with QueueConsumer(queue, handle_message, num_workers=8):
+        ...     wait_for_shutdown()
+
+    :type queue: :class:`boto.sqs.queue.Queue`
+    :param queue: The queue to read messages from.
+
+    :type handler: callable
+    :param handler: Called with each :class:`boto.sqs.message.Message`.
+
+    :type num_receivers: int
+    :param num_receivers: The number of threads receiving messages.
+
+    :type num_workers: int
+    :param num_workers: The number of threads calling ``handler``.
+
+    :type buffer_size: int
+    :param buffer_size: The most messages to hold that no worker has
+        started on.  Defaults to 10 per receiver.
+
+    :type visibility_timeout: int
+    :param visibility_timeout: The visibility timeout, in seconds, to
+        receive messages with.  Defaults to the queue's own, which is
+        then looked up when the consumer starts.
+
+    :type heartbeat_interval: float
+    :param heartbeat_interval: How often, in seconds, to look for
+        messages whose visibility timeout needs extending.  Defaults
+        to a quarter of the visibility timeout.
+
+    :type ack_interval: float
+    :param ack_interval: The longest time, in seconds, a delete is
+        held back waiting for a full batch.
+
+    :type idle_sleep: float
+    :param idle_sleep: How long a receiver waits after finding the
+        queue empty.
+
+    :type attributes: str
+    :param attributes: The message attributes to receive, as for
+        :meth:`boto.sqs.queue.Queue.get_messages`.
+
+    :type batch_size: int
+    :param batch_size: The most messages to receive per request.
+
+    :type delete_messages: bool
+    :param delete_messages: If False, handled messages are not
+        deleted, and are received again once their visibility timeout
+        expires.
+    """
+
+    def __init__(self, queue, handler, num_receivers=2, num_workers=4,
+                 buffer_size=None, visibility_timeout=None,
+                 heartbeat_interval=None, ack_interval=1.0, idle_sleep=1.0,
+                 attributes=None, batch_size=MAX_BATCH_SIZE,
+                 delete_messages=True):
+        if buffer_size is None:
+            buffer_size = MAX_BATCH_SIZE * num_receivers
+        self.queue = queue
+        self.handler = handler
+        self.num_receivers = num_receivers
+        self.num_workers = num_workers
+        self.visibility_timeout = visibility_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.ack_interval = ack_interval
+        self.idle_sleep = idle_sleep
+        self.attributes = attributes
+        self.batch_size = batch_size
+        self.delete_messages = delete_messages
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.deleted = 0
+        self.extended = 0
+        self.requests = 0
+        self._buffer = Queue.Queue(buffer_size)
+        self._acks = Queue.Queue()
+        self._stopping = threading.Event()
+        self._stop_when_empty = False
+        self._error = None
+        self._started = None
+        self._lock = threading.Lock()
+        # Mapping from message id to [message, visibility expiry] for
+        # every message received and not yet handled, and, while
+        # draining without deleting, every message handled so far.  A
+        # message delivered again replaces its entry, as only its
+        # latest receipt handle can change its visibility, and batch
+        # requests don't allow the same id twice.
+        self._in_flight = {}
+        self._next_heartbeat = None
+        self._receivers = []
+        self._workers = []
+        self._acker = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.stop()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def start(self):
+        if self.visibility_timeout is None:
+            self.visibility_timeout = self.queue.get_timeout()
+            self._count('requests')
+        if self.heartbeat_interval is None:
+            self.heartbeat_interval = max(self.visibility_timeout / 4.0, 1)
+        self._started = time.time()
+        self._next_heartbeat = self._started + self.heartbeat_interval
+        self._receivers = [self._thread(self._receive)
+                           for i in xrange(self.num_receivers)]
+        self._workers = [self._thread(self._work)
+                         for i in xrange(self.num_workers)]
+        self._acker = self._thread(self._acknowledge)
+
+    def _holding(self):
+        """
+        True if handled messages are kept invisible until the consumer
+        stops, which is done when draining without deleting them.
+        """
+        return self._stop_when_empty and not self.delete_messages
+
+    def _thread(self, target):
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        """
+        Stop receiving messages and wait for the ones already received
+        to be handled and deleted.
+        """
+        self._stopping.set()
+        for thread in self._receivers:
+            thread.join()
+        for thread in self._workers:
+            self._buffer.put(_END_SENTINEL)
+        for thread in self._workers:
+            thread.join()
+        if self._acker is not None:
+            self._acks.put(_END_SENTINEL)
+            self._acker.join()
+        self._receivers = []
+        self._workers = []
+        self._acker = None
+        if self._holding():
+            self._release()
+
+    def _release(self):
+        """
+        Make the messages held during a drain visible again.
+        """
+        with self._lock:
+            held = self._in_flight.values()
+            self._in_flight = {}
+        for batch in chunks(held):
+            self._count('requests')
+            try:
+                self.queue.change_message_visibility_batch(
+                    [(message, 0) for message, expires in batch])
+            except Exception, e:
+                boto.log.error('Error releasing messages on %s: %s' %
+                               (self.queue.id, e))
+
+    def drain(self, cb=None, cb_interval=5):
+        """
+        Handle messages until the queue comes back empty, then stop.
+        Returns the number of messages handled.
+
+        If ``handler`` raises, no more messages are received or handled
+        and, once the consumer has stopped, the first error is raised.
+
+        If the consumer doesn't delete messages, those it has handled
+        have their visibility timeout extended until the drain ends, so
+        none is handled twice, and are then made visible again.
+
+        :type cb: callable
+        :param cb: Called with the :meth:`stats` of the consumer every
+            ``cb_interval`` seconds, and once more at the end, to
+            report progress.
+
+        :type cb_interval: float
+        :param cb_interval: How often, in seconds, to call ``cb``.
+        """
+        self._stop_when_empty = True
+        self.start()
+        for thread in self._receivers:
+            while thread.is_alive():
+                thread.join(cb_interval)
+                if cb is not None and thread.is_alive():
+                    cb(self.stats())
+        self.stop()
+        if cb is not None:
+            cb(self.stats())
+        if self._error is not None:
+            raise self._error
+        return self.processed
+
+    def stats(self):
+        """
+        Return a dict of the number of messages received, handled,
+        failed, deleted and extended so far, of the requests made to
+        SQS, of the seconds since the consumer started and of the
+        messages handled per second.
+        """
+        with self._lock:
+            elapsed = 0
+            rate = 0.0
+            if self._started is not None:
+                elapsed = time.time() - self._started
+                if elapsed > 0:
+                    rate = self.processed / elapsed
+            return {'received': self.received, 'processed': self.processed,
+                    'failed': self.failed, 'deleted': self.deleted,
+                    'extended': self.extended, 'requests': self.requests,
+                    'elapsed': elapsed, 'rate': rate}
+
+    def _receive(self):
+        while not self._stopping.is_set():
+            self._count('requests')
+            try:
+                messages = self.queue.get_messages(self.batch_size,
+                                                   self.visibility_timeout,
+                                                   self.attributes)
+            except Exception, e:
+                boto.log.error('Error receiving from %s: %s' %
+                               (self.queue.id, e))
+                if self._stop_when_empty:
+                    self._error = e
+                    return
+                self._stopping.wait(self.idle_sleep)
+                continue
+            if not messages:
+                if self._stop_when_empty:
+                    return
+                self._stopping.wait(self.idle_sleep)
+                continue
+            expires = time.time() + self.visibility_timeout
+            holding = self._holding()
+            fresh = []
+            with self._lock:
+                self.received += len(messages)
+                for message in messages:
+                    seen = message.id in self._in_flight
+                    self._in_flight[message.id] = [message, expires]
+                    if not (holding and seen):
+                        fresh.append(message)
+            for message in fresh:
+                self._buffer.put(message)
+
+    def _work(self):
+        while True:
+            message = self._buffer.get()
+            if message is _END_SENTINEL:
+                return
+            if self._stop_when_empty and self._error is not None:
+                # The drain has failed; leave the rest on the queue.
+                pass
+            else:
+                self._handle(message)
+            if not self._holding():
+                with self._lock:
+                    entry = self._in_flight.get(message.id)
+                    if entry is not None and entry[0] is message:
+                        del self._in_flight[message.id]
+
+    def _handle(self, message):
+        try:
+            self.handler(message)
+        except Exception, e:
+            boto.log.error('Error handling message %s: %s' %
+                           (message.id, e))
+            self._count('failed')
+            if self._stop_when_empty:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+                self._stopping.set()
+        else:
+            self._count('processed')
+            if self.delete_messages:
+                self._acks.put(message)
+
+    def _acknowledge(self):
+        pending = []
+        flush_at = time.time() + self.ack_interval
+        done = False
+        while not done:
+            timeout = max(flush_at - time.time(), 0)
+            try:
+                message = self._acks.get(timeout=timeout)
+            except Queue.Empty:
+                message = None
+            if message is _END_SENTINEL:
+                done = True
+            elif message is not None:
+                pending.append(message)
+            if len(pending) >= MAX_BATCH_SIZE or done or \
+                    time.time() >= flush_at:
+                pending = self._delete(pending)
+                flush_at = time.time() + self.ack_interval
+            self._heartbeat()
+        if pending:
+            boto.log.error('Unable to delete %d messages from %s' %
+                           (len(pending), self.queue.id))
+
+    def _delete(self, messages):
+        """
+        Delete ``messages`` in batches, returning the ones that should
+        be tried again.
+        """
+        retry = []
+        for batch in chunks(messages):
+            self._count('requests')
+            try:
+                rs = self.queue.delete_message_batch(batch)
+            except Exception, e:
+                boto.log.error('Error deleting from %s: %s' %
+                               (self.queue.id, e))
+                retry.extend(batch)
+                continue
+            self._count('deleted', len(rs.results))
+            failed = set(error['id'] for error in rs.errors
+                         if error.get('sender_fault') != 'true')
+            retry.extend(m for m in batch if m.id in failed)
+        return retry
+
+    def _heartbeat(self):
+        now = time.time()
+        if now < self._next_heartbeat:
+            return
+        self._next_heartbeat = now + self.heartbeat_interval
+        horizon = now + 2 * self.heartbeat_interval
+        with self._lock:
+            due = [entry for entry in self._in_flight.values()
+                   if entry[1] <= horizon]
+        for batch in chunks(due):
+            self._count('requests')
+            try:
+                rs = self.queue.change_message_visibility_batch(
+                    [(message, self.visibility_timeout)
+                     for message, expires in batch])
+            except Exception, e:
+                boto.log.error('Error extending visibility on %s: %s' %
+                               (self.queue.id, e))
+                continue
+            extended = set(result['id'] for result in rs.results)
+            expires = time.time() + self.visibility_timeout
+            with self._lock:
+                for entry in batch:
+                    if entry[0].id in extended:
+                        entry[1] = expires
+                        self.extended += 1
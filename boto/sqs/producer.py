@@ -0,0 +1,258 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Sends messages to an SQS queue in batches from a background thread.
+"""
+import threading
+import time
+import Queue
+
+import boto
+from boto.exception import SQSBatchError
+from boto.sqs.batchresults import ResultEntry
+
+_END_SENTINEL = object()
+
+#
+# The limits of a single SendMessageBatch request.
+#
+MAX_BATCH_SIZE = 10
+MAX_BATCH_BYTES = 64 * 1024
+
+
+def body_size(body):
+    """Return the size in bytes of a message body."""
+    if isinstance(body, unicode):
+        body = body.encode('utf-8')
+    return len(body)
+
+
+class QueueProducer(object):
+    """
+    Buffers messages written to ``queue`` and sends them with
+    SendMessageBatch requests from a background thread.
+
+    A batch is sent as soon as it holds 10 messages, or as soon as the
+    next message would take its bodies over 64KB, or ``linger``
+    seconds after its first message was written, whichever comes
+    first.  Entries that SQS fails for reasons other than the sender's
+    are sent again, after a pause chosen by the connection's retry
+    policy, up to ``num_retries`` times.  Messages that still could
+    not be sent, including those of a request that failed outright,
+    are reported with :class:`boto.exception.SQSBatchError`, raised
+    by the next call to the producer.  Later batches are still sent
+    in the meantime, and the error lists every message that failed
+    since the last one was raised.
+
+    A QueueProducer is best used as a context manager, so the messages
+    still buffered are sent at the end::
+
+        >>> with queue.new_producer() as producer:
+        ...     for event in events:
+        ...         producer.write(event.to_json())
+
+    :type queue: :class:`boto.sqs.queue.Queue`
+    :param queue: The queue to send messages to.
+
+    :type linger: float
+    :param linger: The longest time, in seconds, a message is held
+        back waiting for a full batch.
+
+    :type num_retries: int
+    :param num_retries: How many times to resend failed entries.
+
+    :type max_pending: int
+    :param max_pending: The most messages to buffer.  Once there are
+        this many, :meth:`write` waits for some to be sent.
+
+    :ivar sent: The number of messages sent so far.
+    :ivar requests: The number of SendMessageBatch requests made.
+    """
+
+    def __init__(self, queue, linger=0.05, num_retries=5, max_pending=1000):
+        self.queue = queue
+        self.linger = linger
+        self.num_retries = num_retries
+        self.sent = 0
+        self.requests = 0
+        self.closed = False
+        self._pending = Queue.Queue(max_pending)
+        self._failed = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._stop_thread()
+            self.closed = True
+
+    def _check_error(self):
+        with self._lock:
+            failed, self._failed = self._failed, []
+        if failed:
+            raise SQSBatchError('%d messages could not be sent to %s' %
+                                (len(failed), self.queue.id), failed)
+
+    def write(self, message, delay_seconds=0):
+        """
+        Queue a message to be sent.
+
+        :type message: :class:`boto.sqs.message.Message` or str
+        :param message: The message, or the body of the message, to
+            send.  A message is given the id SQS assigns it once it is
+            sent.
+
+        :type delay_seconds: int
+        :param delay_seconds: How long to delay delivery of the message
+            for, from 0 to 900 seconds.
+        """
+        assert not self.closed, "Tried to write to a closed QueueProducer!"
+        self._check_error()
+        if hasattr(message, 'get_body_encoded'):
+            body = message.get_body_encoded()
+        else:
+            body = message
+        if body_size(body) > MAX_BATCH_BYTES:
+            raise ValueError('Message body is larger than %d bytes' %
+                             MAX_BATCH_BYTES)
+        self._pending.put((message, body, delay_seconds))
+
+    def flush(self):
+        """
+        Send the buffered messages now, and wait until they have been.
+        """
+        self._check_error()
+        flushed = threading.Event()
+        self._pending.put(flushed)
+        flushed.wait()
+        self._check_error()
+
+    def close(self):
+        """
+        Send the buffered messages and stop the background thread.
+        """
+        if self.closed:
+            return
+        self._stop_thread()
+        self.closed = True
+        self._check_error()
+
+    def _stop_thread(self):
+        self._pending.put(_END_SENTINEL)
+        self._thread.join()
+
+    def _run(self):
+        batch = []
+        size = 0
+        send_at = None
+        while True:
+            if batch:
+                timeout = max(send_at - time.time(), 0)
+            else:
+                timeout = None
+            try:
+                entry = self._pending.get(timeout=timeout)
+            except Queue.Empty:
+                entry = None
+            if not isinstance(entry, tuple):
+                # The linger time is up, or this is a flush or close.
+                batch = self._send_batch(batch)
+                size = 0
+                if entry is _END_SENTINEL:
+                    return
+                if entry is not None:
+                    entry.set()
+                continue
+            entry_size = body_size(entry[1])
+            if batch and size + entry_size > MAX_BATCH_BYTES:
+                batch = self._send_batch(batch)
+                size = 0
+            if not batch:
+                send_at = time.time() + self.linger
+            batch.append(entry)
+            size += entry_size
+            if len(batch) == MAX_BATCH_SIZE:
+                batch = self._send_batch(batch)
+                size = 0
+
+    def _send_batch(self, batch):
+        if batch:
+            try:
+                failed = self._send(batch)
+            except Exception, e:
+                boto.log.debug('SQS batch send failed: %s', e, exc_info=True)
+                failed = [(entry[0], ResultEntry(id=str(i),
+                                                 sender_fault='false',
+                                                 error_code=type(e).__name__,
+                                                 error_message=str(e)))
+                          for i, entry in enumerate(batch)]
+            if failed:
+                with self._lock:
+                    self._failed.extend(failed)
+        return []
+
+    def _send(self, batch):
+        """
+        Send ``batch``, resending the entries SQS fails for reasons
+        other than the sender's, and return a list of ``(message,
+        entry)`` tuples for the messages that could not be sent.
+        """
+        retry_policy = self.queue.connection.retry_policy
+        failed = []
+        delay = 0
+        for i in xrange(self.num_retries + 1):
+            rs = self.queue.write_batch([(str(j), body, delay_seconds)
+                                         for j, (message, body, delay_seconds)
+                                         in enumerate(batch)])
+            self.requests += 1
+            for result in rs.results:
+                message = batch[int(result['id'])][0]
+                if hasattr(message, 'get_body_encoded'):
+                    message.id = result.get('message_id')
+                    message.md5 = result.get('message_md5')
+                self.sent += 1
+            retry = []
+            for error in rs.errors:
+                entry = batch[int(error['id'])]
+                if error.get('sender_fault') == 'true':
+                    failed.append((entry[0], error))
+                else:
+                    retry.append((entry, error))
+            if not retry:
+                break
+            if i == self.num_retries:
+                failed.extend((entry[0], error) for entry, error in retry)
+                break
+            batch = [entry for entry, error in retry]
+            delay = retry_policy.delay(delay)
+            boto.log.debug('Resending %d failed messages in %.2fs' %
+                           (len(batch), delay))
+            time.sleep(delay)
+        return failed
@@ -23,8 +23,11 @@
 Represents an SQS Queue
 """
 
+import threading
 import urlparse
 from boto.sqs.message import Message
+from boto.sqs.consumer import QueueConsumer
+from boto.sqs.producer import QueueProducer
 
 
 class Queue:
@@ -238,6 +241,32 @@ class Queue:
         m.queue = self
         return m
 
+    def new_consumer(self, handler, **kwargs):
+        """
+        Create a consumer that calls ``handler`` with each message
+        read from the queue on a pool of threads.  The consumer is
+        returned unstarted; see :class:`boto.sqs.consumer.QueueConsumer`
+        for the keyword arguments it takes.
+
+        :type handler: callable
+        :param handler: Called with each message.  The message is
+            deleted once it returns.
+
+        :rtype: :class:`boto.sqs.consumer.QueueConsumer`
+        """
+        return QueueConsumer(self, handler, **kwargs)
+
+    def new_producer(self, **kwargs):
+        """
+        Create a producer that sends the messages written to it to the
+        queue in batches from a background thread.  See
+        :class:`boto.sqs.producer.QueueProducer` for the keyword
+        arguments it takes.
+
+        :rtype: :class:`boto.sqs.producer.QueueProducer`
+        """
+        return QueueProducer(self, **kwargs)
+
     # get a variable number of messages, returns a list of messages
     def get_messages(self, num_messages=1, visibility_timeout=None,
                      attributes=None):
@@ -304,16 +333,32 @@ class Queue:
         """
         return self.connection.delete_queue(self)
 
-    def clear(self, page_size=10, vtimeout=10):
-        """Utility function to remove all messages from a queue"""
-        n = 0
-        l = self.get_messages(page_size, vtimeout)
-        while l:
-            for m in l:
-                self.delete_message(m)
-                n += 1
-            l = self.get_messages(page_size, vtimeout)
-        return n
+    def _drain(self, handler, page_size=10, vtimeout=None, num_threads=4,
+               cb=None, delete_messages=True):
+        """
+        Call ``handler`` with every message in the queue, reading them
+        on ``num_threads`` threads, until the queue comes back empty.
+        Returns the number of messages handled.  If ``handler`` raises,
+        the drain stops and the error is raised.
+        """
+        consumer = QueueConsumer(self, handler, num_receivers=num_threads,
+                                 num_workers=num_threads,
+                                 visibility_timeout=vtimeout,
+                                 batch_size=page_size,
+                                 delete_messages=delete_messages)
+        return consumer.drain(cb)
+
+    def clear(self, page_size=10, vtimeout=10, num_threads=4, cb=None):
+        """
+        Utility function to remove all messages from a queue.
+        Messages are read and deleted in batches of ``page_size`` on
+        ``num_threads`` threads.  If given, ``cb`` is called every few
+        seconds with the progress so far, as for
+        :meth:`boto.sqs.consumer.QueueConsumer.drain`.
+        Returns the number of messages removed.
+        """
+        return self._drain(lambda m: None, page_size, vtimeout, num_threads,
+                           cb)
 
     def count(self, page_size=10, vtimeout=10):
         """
@@ -341,42 +386,47 @@ class Queue:
             l = self.get_messages(page_size, vtimeout)
         return n
 
-    def dump(self, file_name, page_size=10, vtimeout=10, sep='\n'):
-        """Utility function to dump the messages in a queue to a file
-        NOTE: Page size must be < 10 else SQS errors"""
-        fp = open(file_name, 'wb')
-        n = 0
-        l = self.get_messages(page_size, vtimeout)
-        while l:
-            for m in l:
-                fp.write(m.get_body())
+    def _writer(self, fp, sep):
+        """
+        Return a message handler that writes each message's body,
+        followed by ``sep``, to ``fp``.
+        """
+        lock = threading.Lock()
+
+        def write(m):
+            body = m.get_body()
+            with lock:
+                fp.write(body)
                 if sep:
                     fp.write(sep)
-                n += 1
-            l = self.get_messages(page_size, vtimeout)
-        fp.close()
-        return n
+        return write
 
-    def save_to_file(self, fp, sep='\n'):
+    def dump(self, file_name, page_size=10, vtimeout=10, sep='\n',
+             num_threads=4, cb=None):
+        """Utility function to dump the messages in a queue to a file
+        NOTE: Page size must be < 10 else SQS errors.
+        Messages are read on ``num_threads`` threads and written in
+        the order they arrive; they are left on the queue."""
+        fp = open(file_name, 'wb')
+        try:
+            return self._drain(self._writer(fp, sep), page_size, vtimeout,
+                               num_threads, cb, delete_messages=False)
+        finally:
+            fp.close()
+
+    def save_to_file(self, fp, sep='\n', num_threads=4, cb=None):
         """
         Read all messages from the queue and persist them to file-like object.
         Messages are written to the file and the 'sep' string is written
-        in between messages.  Messages are deleted from the queue after
-        being written to the file.
+        in between messages.  Messages are deleted from the queue, in
+        batches, after being written to the file.  Messages are read on
+        ``num_threads`` threads and written in the order they arrive.
         Returns the number of messages saved.
         """
-        n = 0
-        m = self.read()
-        while m:
-            n += 1
-            fp.write(m.get_body())
-            if sep:
-                fp.write(sep)
-            self.delete_message(m)
-            m = self.read()
-        return n
+        return self._drain(self._writer(fp, sep), num_threads=num_threads,
+                           cb=cb)
 
-    def save_to_filename(self, file_name, sep='\n'):
+    def save_to_filename(self, file_name, sep='\n', num_threads=4, cb=None):
         """
         Read all messages from the queue and persist them to local file.
         Messages are written to the file and the 'sep' string is written
@@ -385,32 +435,30 @@ class Queue:
         Returns the number of messages saved.
         """
         fp = open(file_name, 'wb')
-        n = self.save_to_file(fp, sep)
-        fp.close()
-        return n
+        try:
+            return self.save_to_file(fp, sep, num_threads, cb)
+        finally:
+            fp.close()
 
     # for backwards compatibility
     save = save_to_filename
 
-    def save_to_s3(self, bucket):
+    def save_to_s3(self, bucket, num_threads=4, cb=None):
         """
         Read all messages from the queue and persist them to S3.
         Messages are stored in the S3 bucket using a naming scheme of::
         
             <queue_id>/<message_id>
         
-        Messages are deleted from the queue after being saved to S3.
+        Messages are deleted from the queue, in batches, after being
+        saved to S3.  ``num_threads`` threads read messages and
+        ``num_threads`` more upload them.
         Returns the number of messages saved.
         """
-        n = 0
-        m = self.read()
-        while m:
-            n += 1
+        def save(m):
             key = bucket.new_key('%s/%s' % (self.id, m.id))
             key.set_contents_from_string(m.get_body())
-            self.delete_message(m)
-            m = self.read()
-        return n
+        return self._drain(save, num_threads=num_threads, cb=cb)
 
     def load_from_s3(self, bucket, prefix=None):
         """
@@ -0,0 +1,497 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Incremental synchronization of a local directory with a bucket prefix,
+in either direction, named by :func:`boto.storage_uri` strings::
+
+    >>> from boto.sync import sync
+    >>> result = sync('build/', 's3://mybucket/releases/', delete=True)
+    >>> len(result.copied), len(result.skipped), len(result.deleted)
+    (12, 40113, 3)
+
+Each side is listed once up front: the directory with ``os.walk`` and
+the bucket with a single listing of the prefix, so no request is made
+per file just to find out whether it needs copying.  The two listings
+are then compared by name, size, modification time and MD5 (the ETag
+of keys that were not uploaded in parts), and only the files that
+differ are transferred, several at a time, by a pool of worker
+threads.
+"""
+import calendar
+import fnmatch
+import os
+import Queue
+import re
+
+import boto
+from boto.exception import BotoClientError, InvalidUriError
+from boto.s3.concurrent import TransferThread, run_workers
+from boto.utils import compute_md5, get_utf8_value, parse_ts
+
+_MD5_ETAG = re.compile(r'^[0-9a-f]{32}$')
+
+#
+# The kinds of work done by the worker threads.
+#
+COPY = 'copy'
+CHECK = 'check'
+DELETE = 'delete'
+
+
+class SyncEntry(object):
+    """
+    A file or key found while listing one side of a sync.
+
+    ``name`` is relative to the directory or prefix being synced and
+    always uses ``/`` as its separator.  ``mtime`` is in seconds since
+    the epoch.
+    """
+
+    def __init__(self, name, size, mtime, path=None, etag=None):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.path = path
+        self.etag = etag
+        self._md5 = None
+
+    def __repr__(self):
+        return '<SyncEntry: %s>' % self.name
+
+    def get_md5(self):
+        """
+        Returns the hex MD5 of the contents, or None if it isn't known.
+        For a local file it is computed, once, from the file.  For a key
+        it is its ETag, unless the key was uploaded in parts and its
+        ETag isn't an MD5.
+        """
+        if self._md5 is None:
+            if self.path is not None:
+                fp = open(self.path, 'rb')
+                try:
+                    self._md5 = compute_md5(fp)[:2]
+                finally:
+                    fp.close()
+            elif self.etag:
+                etag = self.etag.strip('"')
+                if _MD5_ETAG.match(etag):
+                    self._md5 = (etag, None)
+        if self._md5 is None:
+            return None
+        return self._md5[0]
+
+    def get_md5_tuple(self):
+        """
+        Returns the ``(hex, base64)`` MD5 of a local file if it has
+        already been computed, for passing on to
+        :meth:`boto.s3.key.Key.set_contents_from_filename`.
+        """
+        if self.path is not None:
+            return self._md5
+        return None
+
+
+def _excluded(name, exclude):
+    for part in name.split('/'):
+        for pattern in exclude:
+            if fnmatch.fnmatch(part, pattern):
+                return True
+    return False
+
+
+def local_path(directory, name):
+    """
+    Returns the path in ``directory`` of the file called ``name``, or
+    None if ``name`` would lead outside ``directory``, such as a key
+    named ``../../etc/passwd`` or one below a symlink to elsewhere.
+    """
+    path = os.path.join(directory, *name.split('/'))
+    root = os.path.join(os.path.realpath(directory), '')
+    if not os.path.realpath(path).startswith(root):
+        return None
+    return path
+
+
+def list_directory(path, exclude=None):
+    """
+    Returns a dict mapping the name of each file under ``path`` to its
+    :class:`SyncEntry`.  Files or directories whose name matches one
+    of the ``exclude`` glob patterns are left out.
+    """
+    exclude = exclude or []
+    entries = {}
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if not _excluded(d, exclude)]
+        rel_root = os.path.relpath(root, path)
+        for filename in files:
+            if _excluded(filename, exclude):
+                continue
+            full_path = os.path.join(root, filename)
+            if rel_root == os.curdir:
+                name = filename
+            else:
+                name = '/'.join(rel_root.split(os.sep) + [filename])
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                # Removed since it was listed, or a dangling symlink.
+                continue
+            entries[name] = SyncEntry(name, st.st_size, st.st_mtime,
+                                      path=full_path)
+    return entries
+
+
+def list_bucket(bucket, prefix='', exclude=None, headers=None,
+                num_threads=0):
+    """
+    Returns a dict mapping the name of each key under ``prefix``, less
+    the prefix, to its :class:`SyncEntry`.  Keys are skipped as for
+    :func:`list_directory`, along with the zero byte "directory"
+    markers some tools create.  With ``num_threads`` the listing is
+    split across threads as for :meth:`boto.s3.bucket.Bucket.list`.
+    """
+    exclude = exclude or []
+    entries = {}
+    if num_threads:
+        keys = bucket.list(prefix=prefix, headers=headers,
+                           num_threads=num_threads, ordered=False)
+    else:
+        keys = bucket.list(prefix=prefix, headers=headers)
+    for key in keys:
+        name = get_utf8_value(key.name)[len(prefix):]
+        if not name or name.endswith('/') or _excluded(name, exclude):
+            continue
+        mtime = calendar.timegm(parse_ts(key.last_modified).timetuple())
+        entries[name] = SyncEntry(name, key.size, mtime, etag=key.etag)
+    return entries
+
+
+class SyncResult(object):
+    """
+    What a sync did, or with ``dry_run`` would have done: the names
+    that were ``copied``, ``skipped`` as already up to date and
+    ``deleted``, along with the number of bytes copied.
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.copied = []
+        self.skipped = []
+        self.deleted = []
+        self.bytes_copied = 0
+
+    def __repr__(self):
+        return '<SyncResult: %d copied, %d skipped, %d deleted>' % (
+            len(self.copied), len(self.skipped), len(self.deleted))
+
+
+class SyncWorkerThread(TransferThread):
+    """
+    Carries out the ``(action, name)`` work items of a sync between a
+    directory and a bucket prefix.  ``upload`` is True when the
+    directory is the source.
+    """
+
+    def __init__(self, synchronizer, directory, bucket, prefix, upload,
+                 src_entries, dst_entries, worker_queue, result_queue,
+                 **kwargs):
+        TransferThread.__init__(self, worker_queue, result_queue, **kwargs)
+        self._synchronizer = synchronizer
+        self._directory = directory
+        self._bucket = bucket
+        self._prefix = prefix
+        self._upload = upload
+        self._src_entries = src_entries
+        self._dst_entries = dst_entries
+
+    def _process(self, work):
+        action, name = work
+        if action == DELETE:
+            if not self._synchronizer.dry_run:
+                self._delete(name)
+            return True
+        src = self._src_entries[name]
+        if action == CHECK and \
+                not self._synchronizer.contents_differ(
+                    src, self._dst_entries[name]):
+            return False
+        if not self._synchronizer.dry_run:
+            self._copy(src)
+        return True
+
+    def _local_path(self, name):
+        path = local_path(self._directory, name)
+        if path is None:
+            raise BotoClientError('%s is outside of %s' %
+                                  (name, self._directory))
+        return path
+
+    def _copy(self, src):
+        key = self._bucket.new_key(self._prefix + src.name)
+        headers = dict(self._synchronizer.headers or {})
+        if self._upload:
+            key.set_contents_from_filename(
+                src.path, headers=headers, md5=src.get_md5_tuple(),
+                policy=self._synchronizer.policy,
+                reduced_redundancy=self._synchronizer.reduced_redundancy)
+        else:
+            path = self._local_path(src.name)
+            dirname = os.path.dirname(path)
+            if not os.path.isdir(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    # Another thread made it first.
+                    if not os.path.isdir(dirname):
+                        raise
+            key.get_contents_to_filename(path, headers=headers)
+
+    def _delete(self, name):
+        if self._upload:
+            self._bucket.delete_key(self._prefix + name,
+                                    headers=self._synchronizer.headers)
+        else:
+            os.remove(self._local_path(name))
+
+
+class Synchronizer(object):
+    """
+    Makes a bucket prefix match a local directory, or a local directory
+    match a bucket prefix, transferring only the files that differ.
+
+    A file is copied if the destination doesn't have it or its size
+    differs.  Otherwise, by default, it is taken to be up to date if
+    the destination was modified no earlier than the source; if the
+    source is newer the MD5s of the two are compared, by the worker
+    threads, and it is only copied if they differ.  With ``checksum``
+    the modification times are ignored and MD5s are always compared.
+    When the MD5 of a key isn't known, because it was uploaded in
+    parts, a newer source is always copied.
+    """
+
+    def __init__(self, num_threads=10, num_retries=5, time_between_retries=1,
+                 delete=False, dry_run=False, checksum=False, exclude=None,
+                 headers=None, policy=None, reduced_redundancy=False,
+                 list_threads=0):
+        """
+        :type num_threads: int
+        :param num_threads: The number of files to check and transfer
+            at once.
+
+        :type num_retries: int
+        :param num_retries: How many times the transfer of a single
+            file is retried before the sync is abandoned.
+
+        :type delete: bool
+        :param delete: If True, files in the destination that are not
+            in the source are deleted.
+
+        :type dry_run: bool
+        :param dry_run: If True, work out what would be copied and
+            deleted, but leave both sides as they are.
+
+        :type checksum: bool
+        :param checksum: If True, compare the MD5 of files of the same
+            size regardless of their modification times.
+
+        :type exclude: list
+        :param exclude: Glob patterns of file and directory names to
+            leave out of the sync on both sides, e.g. ``['.*']``.
+
+        :type headers: dict
+        :param headers: Additional headers to send with every request.
+
+        :type policy: :class:`boto.s3.acl.CannedACLStrings`
+        :param policy: A canned ACL policy applied to uploaded keys.
+
+        :type reduced_redundancy: bool
+        :param reduced_redundancy: If True, uploaded keys use the
+            REDUCED_REDUNDANCY storage class.
+
+        :type list_threads: int
+        :param list_threads: If greater than zero, the bucket is listed
+            with this many threads as for
+            :meth:`boto.s3.bucket.Bucket.list`.
+        """
+        self.num_threads = num_threads
+        self.num_retries = num_retries
+        self.time_between_retries = time_between_retries
+        self.delete = delete
+        self.dry_run = dry_run
+        self.checksum = checksum
+        self.exclude = exclude
+        self.headers = headers
+        self.policy = policy
+        self.reduced_redundancy = reduced_redundancy
+        self.list_threads = list_threads
+
+    def needs_check(self, src, dst):
+        """
+        Returns True if ``src`` must be copied over ``dst``, False if it
+        needn't be, or None if that depends on their contents.
+        """
+        if dst is None or src.size != dst.size:
+            return True
+        if not self.checksum and int(src.mtime) <= int(dst.mtime):
+            return False
+        return None
+
+    def contents_differ(self, src, dst):
+        """
+        Returns True unless ``src`` and ``dst`` are known to have the
+        same MD5.  This may read a local file to compute its MD5.
+        """
+        dst_md5 = dst.get_md5()
+        if dst_md5 is None:
+            return True
+        return src.get_md5() != dst_md5
+
+    def sync(self, src_uri, dst_uri, cb=None):
+        """
+        Make ``dst_uri`` match ``src_uri``.  One of them names a local
+        directory and the other a bucket, optionally with a prefix,
+        e.g. ``s3://mybucket/releases/``.  A prefix that doesn't end
+        with ``/`` has one added.  Either can be a string or a
+        :class:`boto.storage_uri.StorageUri`.
+
+        If a file cannot be transferred after its retries the sync is
+        stopped and the error is raised.
+
+        :type cb: function
+        :param cb: An optional callback called with the number of files
+            dealt with so far and the number to deal with, each time
+            one is checked, copied or deleted.
+
+        :rtype: :class:`SyncResult`
+        """
+        if isinstance(src_uri, basestring):
+            src_uri = boto.storage_uri(src_uri)
+        if isinstance(dst_uri, basestring):
+            dst_uri = boto.storage_uri(dst_uri)
+        if src_uri.is_file_uri() and dst_uri.is_cloud_uri():
+            directory_uri, bucket_uri, upload = src_uri, dst_uri, True
+        elif src_uri.is_cloud_uri() and dst_uri.is_file_uri():
+            directory_uri, bucket_uri, upload = dst_uri, src_uri, False
+        else:
+            raise InvalidUriError('Can only sync between a local directory '
+                                  'and a bucket, not %s and %s' %
+                                  (src_uri, dst_uri))
+        if not bucket_uri.names_bucket() and not bucket_uri.names_object():
+            raise InvalidUriError('No bucket given in %s' % bucket_uri)
+        directory = directory_uri.object_name
+        if upload and not os.path.isdir(directory):
+            raise InvalidUriError('%s is not a directory' % directory_uri)
+        prefix = bucket_uri.object_name or ''
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        bucket = bucket_uri.get_bucket(headers=self.headers)
+
+        local_entries = {}
+        if os.path.isdir(directory):
+            local_entries = list_directory(directory, self.exclude)
+        bucket_entries = list_bucket(bucket, prefix, self.exclude,
+                                     self.headers, self.list_threads)
+        if upload:
+            src_entries, dst_entries = local_entries, bucket_entries
+        else:
+            for name in bucket_entries.keys():
+                if local_path(directory, name) is None:
+                    boto.log.warning('Not downloading %s%s, as it would '
+                                     'be saved outside of %s' %
+                                     (prefix, name, directory))
+                    del bucket_entries[name]
+            src_entries, dst_entries = bucket_entries, local_entries
+
+        result = SyncResult(self.dry_run)
+        work_items = []
+        for name in sorted(src_entries):
+            copy = self.needs_check(src_entries[name], dst_entries.get(name))
+            if copy is None:
+                work_items.append((CHECK, name))
+            elif copy:
+                work_items.append((COPY, name))
+            else:
+                result.skipped.append(name)
+        deletes = []
+        if self.delete:
+            deletes = sorted(set(dst_entries) - set(src_entries))
+        # Multi-object delete is S3 only; other providers get a delete
+        # per key from the worker threads.
+        bulk_delete = upload and bucket_uri.scheme == 's3'
+        if not bulk_delete:
+            work_items.extend((DELETE, name) for name in deletes)
+        boto.log.debug('Sync of %s to %s: %d to copy, %d to check, '
+                       '%d to delete, %d up to date' % (
+                           src_uri, dst_uri,
+                           len([w for w in work_items if w[0] == COPY]),
+                           len([w for w in work_items if w[0] == CHECK]),
+                           len(deletes), len(result.skipped)))
+
+        total = len(work_items) + (bulk_delete and len(deletes) or 0)
+        done = 0
+        worker_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+        threads = []
+        for i in xrange(min(self.num_threads, len(work_items))):
+            threads.append(SyncWorkerThread(
+                self, directory, bucket, prefix, upload, src_entries,
+                dst_entries, worker_queue, result_queue,
+                num_retries=self.num_retries,
+                time_between_retries=self.time_between_retries))
+        for work, changed in run_workers(threads, work_items, worker_queue,
+                                         result_queue):
+            action, name = work
+            if action == DELETE:
+                result.deleted.append(name)
+            elif changed:
+                result.copied.append(name)
+                result.bytes_copied += src_entries[name].size
+            else:
+                result.skipped.append(name)
+            done += 1
+            if cb:
+                cb(done, total)
+
+        if bulk_delete and deletes:
+            if not self.dry_run:
+                rs = bucket.delete_keys([prefix + name for name in deletes],
+                                        headers=self.headers,
+                                        num_threads=self.num_threads)
+                if rs.errors:
+                    error = rs.errors[0]
+                    raise BotoClientError('Could not delete %d keys, e.g. '
+                                          '%s: %s %s' % (len(rs.errors),
+                                                         error.key,
+                                                         error.code,
+                                                         error.message))
+            result.deleted.extend(deletes)
+            if cb:
+                cb(total, total)
+        return result
+
+
+def sync(src_uri, dst_uri, cb=None, **kwargs):
+    """
+    Make ``dst_uri`` match ``src_uri`` with a :class:`Synchronizer`
+    made from ``kwargs``.  See :meth:`Synchronizer.sync`.
+    """
+    return Synchronizer(**kwargs).sync(src_uri, dst_uri, cb=cb)
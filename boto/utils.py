@@ -60,6 +60,7 @@ from email.Utils import formatdate
 from email import Encoders
 import gzip
 import base64
+import io
 try:
     from hashlib import md5
 except ImportError:
@@ -78,6 +79,12 @@ try:
 except:
     import json
 
+try:
+    _memoryview = memoryview
+except NameError:
+    # Python 2.6 has no memoryview.
+    _memoryview = None
+
 # List of Query String Arguments of Interest
 qsa_of_interest = ['acl', 'cors', 'defaultObjectAcl', 'location', 'logging',
                    'partNumber', 'policy', 'requestPayment', 'torrent',
@@ -601,6 +608,27 @@ class LRUCache(dict):
             self._update_item(item)
             self._manage_size()
 
+    def __delitem__(self, key):
+        item = self._dict.pop(key)
+        if item.previous is not None:
+            item.previous.next = item.next
+        else:
+            self.head = item.next
+        if item.next is not None:
+            item.next.previous = item.previous
+        else:
+            self.tail = item.previous
+        item.previous = item.next = None
+
+    def get(self, key, default=None):
+        if key in self._dict:
+            return self[key]
+        return default
+
+    def clear(self):
+        self._dict.clear()
+        self.head = self.tail = None
+
     def __repr__(self):
         return repr(self._dict)
 
@@ -824,6 +852,26 @@ def guess_mime_type(content, deftype):
             break
     return(rtype)
 
+def chunk_reader(fp, buf_size):
+    """
+    Return a function that reads up to ``size`` bytes, no more than
+    ``buf_size``, from ``fp``.
+
+    For plain files, each call reads into the same preallocated buffer
+    and returns a memoryview of the bytes read, which is only valid
+    until the next call.  Other file-like objects, and all files on
+    Pythons without memoryview, are read with their own ``read`` method.
+    """
+    if (_memoryview is None or
+            type(fp) not in (file, io.FileIO, io.BufferedReader, io.BytesIO)):
+        return fp.read
+    readinto = fp.readinto
+    view = _memoryview(bytearray(buf_size))
+
+    def read(size):
+        return view[:readinto(view[:size])]
+    return read
+
 def compute_md5(fp, buf_size=8192, size=None):
     """
     Compute MD5 hash on passed file and return results in a tuple of values.
@@ -851,10 +899,11 @@ def compute_md5(fp, buf_size=8192, size=None):
     """
     m = md5()
     spos = fp.tell()
+    read = chunk_reader(fp, buf_size)
     if size and size < buf_size:
-        s = fp.read(size)
+        s = read(size)
     else:
-        s = fp.read(buf_size)
+        s = read(buf_size)
     while s:
         m.update(s)
         if size:
@@ -862,9 +911,9 @@ def compute_md5(fp, buf_size=8192, size=None):
             if size <= 0:
                 break
         if size and size < buf_size:
-            s = fp.read(size)
+            s = read(size)
         else:
-            s = fp.read(buf_size)
+            s = read(buf_size)
     hex_md5 = m.hexdigest()
     base64md5 = base64.encodestring(m.digest())
     if base64md5[-1] == '\n':
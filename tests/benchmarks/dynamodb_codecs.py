@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Compares the time taken to encode wide DynamoDB items for a request
+and to decode a Query response of them, with boto's codecs and with
+the general type checks and JSON object hook they replace.
+
+Run it from the top of the source tree::
+
+    PYTHONPATH=. python tests/benchmarks/dynamodb_codecs.py [repetitions]
+"""
+import sys
+import time
+
+from boto.dynamodb import layer1
+from boto.dynamodb.layer2 import item_object_hook
+from boto.dynamodb.types import dynamize_value, _dynamize_value
+from boto.dynamodb.types import undynamize_item
+
+json = layer1.json
+
+NUM_ATTRIBUTES = 200
+NUM_ITEMS = 100
+
+
+def make_item(n):
+    item = {}
+    for i in xrange(NUM_ATTRIBUTES):
+        kind = i % 5
+        if kind == 0:
+            value = n * i
+        elif kind == 1:
+            value = n + i / 7.0
+        elif kind == 2:
+            value = u'value %d of item %d' % (i, n)
+        elif kind == 3:
+            value = set([u'tag%d' % j for j in xrange(5)])
+        else:
+            value = bool(i % 2)
+        item['attribute%d' % i] = value
+    return item
+
+
+def encode(items, dynamize):
+    for item in items:
+        d = {}
+        for name in item:
+            d[name] = dynamize(item[name])
+
+
+def decode_with_hook(body):
+    response = json.loads(body, object_hook=item_object_hook)
+    return response['Items']
+
+
+def decode_direct(body):
+    response = layer1.fast_json_loads(body)
+    return [undynamize_item(item) for item in response['Items']]
+
+
+def time_function(function, arg, repetitions):
+    start = time.time()
+    for i in xrange(repetitions):
+        function(*arg)
+    return (time.time() - start) / repetitions
+
+
+def report(name, timings):
+    print name
+    baseline = timings[0][1]
+    for label, elapsed in timings:
+        print '    %-22s %8.2f ms  %5.2fx' % (label, elapsed * 1000,
+                                             baseline / elapsed)
+
+
+def main(repetitions=20):
+    items = [make_item(n) for n in xrange(NUM_ITEMS)]
+    report('Encode %d items of %d attributes' % (NUM_ITEMS, NUM_ATTRIBUTES),
+           [('type checks', time_function(encode, (items, _dynamize_value),
+                                          repetitions)),
+            ('encoder table', time_function(encode, (items, dynamize_value),
+                                            repetitions))])
+    body = json.dumps({'Count': NUM_ITEMS, 'ConsumedCapacityUnits': 50.0,
+                       'Items': [dict((name, dynamize_value(value))
+                                      for name, value in item.items())
+                                 for item in items]})
+    report('Decode a %d byte Query response' % len(body),
+           [('object hook', time_function(decode_with_hook, (body,),
+                                          repetitions)),
+            ('direct (%s)' % layer1.fast_json_loads.__module__,
+             time_function(decode_direct, (body,), repetitions))])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
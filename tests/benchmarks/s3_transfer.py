@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Compares the throughput of Key.send_file and Key.get_file with the old
+8KB buffer against the default transfer buffer.  Data is sent over a
+local socket pair, so the figures measure boto's own per-chunk cost
+rather than the network.
+
+Run it from the top of the source tree::
+
+    PYTHONPATH=. python tests/benchmarks/s3_transfer.py [megabytes]
+"""
+import hashlib
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from mock import Mock
+
+from boto.provider import Provider
+from boto.s3.key import Key
+
+MEGABYTE = 1024 * 1024
+
+
+class SocketConnection(object):
+    """An HTTP connection that writes request bodies to a socket."""
+
+    def __init__(self, sock, md5):
+        self.sock = sock
+        self.md5 = md5
+
+    def putrequest(self, method, path):
+        pass
+
+    def putheader(self, name, value):
+        pass
+
+    def endheaders(self):
+        pass
+
+    def set_debuglevel(self, level):
+        pass
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def getresponse(self):
+        response = Mock()
+        response.status = 200
+        response.read.return_value = ''
+        headers = {'etag': '"%s"' % self.md5}
+        response.getheader.side_effect = \
+            lambda name, default=None: headers.get(name, default)
+        return response
+
+
+class SocketResponse(object):
+    """A response whose body is read from a socket."""
+
+    def __init__(self, sock):
+        self.fp = sock.makefile('rb')
+
+    def read(self, size=-1):
+        return self.fp.read(size)
+
+
+def drain(sock):
+    while sock.recv(MEGABYTE):
+        pass
+
+
+def fill(sock, size):
+    data = 'x' * MEGABYTE
+    for i in xrange(size / MEGABYTE):
+        sock.sendall(data)
+    sock.close()
+
+
+def make_bucket():
+    bucket = Mock()
+    bucket.connection.provider = Provider('aws', 'access_key', 'secret_key')
+    bucket.connection.debug = 0
+    return bucket
+
+
+def time_send(fp, size, md5):
+    sender_sock, receiver_sock = socket.socketpair()
+    reader = threading.Thread(target=drain, args=(receiver_sock,))
+    reader.start()
+    bucket = make_bucket()
+
+    def make_request(method, bucket_name, key_name, headers, sender,
+                     query_args=None):
+        return sender(SocketConnection(sender_sock, md5), method, '/', None,
+                      headers)
+    bucket.connection.make_request.side_effect = make_request
+    key = Key(bucket, 'key')
+    fp.seek(0)
+    start = time.time()
+    key.set_contents_from_file(fp, single_pass=True)
+    elapsed = time.time() - start
+    sender_sock.close()
+    reader.join()
+    return size / elapsed
+
+
+def time_get(size):
+    sender_sock, receiver_sock = socket.socketpair()
+    writer = threading.Thread(target=fill, args=(sender_sock, size))
+    writer.start()
+    key = Key(make_bucket(), 'key')
+    key.size = size
+    key.open = Mock()
+    key.close = Mock()
+    key.resp = SocketResponse(receiver_sock)
+    out = open('/dev/null', 'wb')
+    start = time.time()
+    key.get_file(out, cb=lambda sent, total: None)
+    elapsed = time.time() - start
+    writer.join()
+    return size / elapsed
+
+
+def main(megabytes=256):
+    size = megabytes * MEGABYTE
+    fp = tempfile.TemporaryFile()
+    block = 'x' * MEGABYTE
+    md5 = hashlib.md5()
+    for i in xrange(megabytes):
+        fp.write(block)
+        md5.update(block)
+    md5 = md5.hexdigest()
+    default = Key.TransferBufferSize
+    for name, buffer_size in (('8KB', 8192), ('default', default)):
+        Key.TransferBufferSize = buffer_size
+        print '%-8s send_file %8.1f MB/s   get_file %8.1f MB/s' % (
+            name, time_send(fp, size, md5) / MEGABYTE,
+            time_get(size) / MEGABYTE)
+    Key.TransferBufferSize = default
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Compares the time taken to sign a small request with each of the
+signature versions boto implements.  Version 4 is timed both with its
+signing keys cached, as they are in use, and derived for every request.
+
+Run it from the top of the source tree::
+
+    PYTHONPATH=. python tests/benchmarks/signing.py [repetitions]
+"""
+import sys
+import time
+
+from mock import Mock
+
+from boto.auth import QuerySignatureV2AuthHandler, HmacAuthV3HTTPHandler
+from boto.auth import HmacAuthV4Handler
+from boto.connection import HTTPRequest
+
+HOST = 'dynamodb.us-east-1.amazonaws.com'
+BODY = '{"TableName": "mytable", "Key": {"HashKeyElement": {"S": "1234"}}}'
+
+
+def make_request(handler):
+    if isinstance(handler, QuerySignatureV2AuthHandler):
+        return HTTPRequest('POST', 'https', 'sqs.us-east-1.amazonaws.com',
+                           443, '/', '/',
+                           {'Action': 'ReceiveMessage',
+                            'MaxNumberOfMessages': '10',
+                            'Version': '2012-11-05'}, {}, '')
+    return HTTPRequest('POST', 'https', HOST, 443, '/', '/', {},
+                       {'X-Amz-Target': 'DynamoDB_20111205.GetItem',
+                        'Content-Type': 'application/x-amz-json-1.0'},
+                       BODY)
+
+
+def time_handler(handler, repetitions, uncached=False):
+    start = time.time()
+    for i in xrange(repetitions):
+        if uncached:
+            handler._signing_hmacs.clear()
+        handler.add_auth(make_request(handler))
+    return (time.time() - start) / repetitions
+
+
+def main(repetitions=20000):
+    provider = Mock()
+    provider.access_key = 'AKIDEXAMPLE'
+    provider.secret_key = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+    provider.security_token = None
+    config = Mock()
+    handlers = [
+        ('V2', QuerySignatureV2AuthHandler(HOST, config, provider), False),
+        ('V3', HmacAuthV3HTTPHandler(HOST, config, provider), False),
+        ('V4', HmacAuthV4Handler(HOST, config, provider), False),
+        ('V4 uncached', HmacAuthV4Handler(HOST, config, provider), True),
+    ]
+    for name, handler, uncached in handlers:
+        elapsed = time_handler(handler, repetitions, uncached)
+        print '%-12s %8.2f us' % (name, elapsed * 1000000)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Compares the time taken to parse large responses into boto objects
+with each of the parsers in :data:`boto.handler.XML_PARSERS`.
+
+Run it from the top of the source tree::
+
+    PYTHONPATH=. python tests/benchmarks/xml_parsing.py [repetitions]
+"""
+import sys
+import time
+
+from mock import Mock, patch
+
+from boto import handler
+from boto.resultset import ResultSet
+from boto.s3.key import Key
+from boto.ec2.instance import Reservation
+from boto.ec2.cloudwatch.metric import Metric
+
+KEY = """
+  <Contents>
+    <Key>logs/2012/10/12/access-%(i)08d.log.gz</Key>
+    <LastModified>2012-10-12T17:50:30.000Z</LastModified>
+    <ETag>&quot;fba9dede5f27731c9771645a39863328&quot;</ETag>
+    <Size>%(i)d</Size>
+    <Owner>
+      <ID>75aa57f09aa0c8caeab4f8c24e99d10f8e7faeebf76c078efc7c6caea54ba06a</ID>
+      <DisplayName>mtd@amazon.com</DisplayName>
+    </Owner>
+    <StorageClass>STANDARD</StorageClass>
+  </Contents>"""
+
+LIST_BUCKET_RESULT = """<?xml version="1.0" encoding="UTF-8"?>
+<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+  <Name>mybucket</Name>
+  <Prefix>logs/</Prefix>
+  <Marker></Marker>
+  <MaxKeys>1000</MaxKeys>
+  <IsTruncated>true</IsTruncated>%s
+</ListBucketResult>"""
+
+INSTANCE = """
+        <item>
+          <instanceId>i-%(i)08x</instanceId>
+          <imageId>ami-1a2b3c4d</imageId>
+          <instanceState><code>16</code><name>running</name></instanceState>
+          <privateDnsName>ip-10-0-%(i)d.ec2.internal</privateDnsName>
+          <dnsName>ec2-203-0-113-%(i)d.compute-1.amazonaws.com</dnsName>
+          <keyName>gsg-keypair</keyName>
+          <amiLaunchIndex>0</amiLaunchIndex>
+          <instanceType>m1.large</instanceType>
+          <launchTime>2012-10-12T17:50:30.000Z</launchTime>
+          <placement><availabilityZone>us-east-1b</availabilityZone></placement>
+          <monitoring><state>disabled</state></monitoring>
+          <privateIpAddress>10.0.0.%(i)d</privateIpAddress>
+          <ipAddress>203.0.113.%(i)d</ipAddress>
+          <groupSet>
+            <item><groupId>sg-1a2b3c4d</groupId><groupName>default</groupName></item>
+          </groupSet>
+          <architecture>x86_64</architecture>
+          <rootDeviceType>ebs</rootDeviceType>
+          <rootDeviceName>/dev/sda1</rootDeviceName>
+          <blockDeviceMapping>
+            <item>
+              <deviceName>/dev/sda1</deviceName>
+              <ebs>
+                <volumeId>vol-%(i)08x</volumeId>
+                <status>attached</status>
+                <attachTime>2012-10-12T17:50:45.000Z</attachTime>
+                <deleteOnTermination>true</deleteOnTermination>
+              </ebs>
+            </item>
+          </blockDeviceMapping>
+          <tagSet>
+            <item><key>Name</key><value>web-%(i)d</value></item>
+          </tagSet>
+        </item>"""
+
+DESCRIBE_INSTANCES = """<?xml version="1.0" encoding="UTF-8"?>
+<DescribeInstancesResponse xmlns="http://ec2.amazonaws.com/doc/2012-07-20/">
+  <requestId>fdcdcab1-ae5c-489e-9c33-4637c5dda355</requestId>
+  <reservationSet>
+    <item>
+      <reservationId>r-1a2b3c4d</reservationId>
+      <ownerId>123456789012</ownerId>
+      <instancesSet>%s
+      </instancesSet>
+    </item>
+  </reservationSet>
+</DescribeInstancesResponse>"""
+
+METRIC = """
+      <member>
+        <Dimensions>
+          <member><Name>InstanceId</Name><Value>i-%(i)08x</Value></member>
+        </Dimensions>
+        <MetricName>CPUUtilization</MetricName>
+        <Namespace>AWS/EC2</Namespace>
+      </member>"""
+
+LIST_METRICS = """<ListMetricsResponse xmlns="http://monitoring.amazonaws.com/doc/2010-08-01/">
+  <ListMetricsResult>
+    <Metrics>%s
+    </Metrics>
+  </ListMetricsResult>
+  <ResponseMetadata><RequestId>d2a8d3e0</RequestId></ResponseMetadata>
+</ListMetricsResponse>"""
+
+RESPONSES = [
+    ('ListBucket, 1000 keys', [('Contents', Key)],
+     LIST_BUCKET_RESULT % ''.join(KEY % {'i': i} for i in xrange(1000))),
+    ('DescribeInstances, 500 instances', [('item', Reservation)],
+     DESCRIBE_INSTANCES % ''.join(INSTANCE % {'i': i % 256}
+                                  for i in xrange(500))),
+    ('ListMetrics, 500 metrics', [('member', Metric)],
+     LIST_METRICS % ''.join(METRIC % {'i': i} for i in xrange(500))),
+]
+
+
+def time_parser(parser, markers, body, repetitions):
+    connection = Mock()
+    with patch('boto.config.get', return_value=parser):
+        start = time.time()
+        for i in xrange(repetitions):
+            rs = ResultSet(markers)
+            handler.parseString(body, handler.XmlHandler(rs, connection))
+        return (time.time() - start) / repetitions
+
+
+def main(repetitions=20):
+    for name, markers, body in RESPONSES:
+        print '%s (%d bytes)' % (name, len(body))
+        baseline = None
+        for parser in sorted(handler.XML_PARSERS, reverse=True):
+            elapsed = time_parser(parser, markers, body, repetitions)
+            if baseline is None:
+                baseline = elapsed
+            print '    %-6s %8.2f ms  %5.2fx' % (parser, elapsed * 1000,
+                                                 baseline / elapsed)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
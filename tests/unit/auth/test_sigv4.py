@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import hashlib
+import hmac
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock
+
+from boto.auth import HmacAuthV4Handler
+from boto.connection import HTTPRequest
+
+SECRET_KEY = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+
+
+def derive_signing_key(secret_key, date, region, service):
+    key = 'AWS4' + secret_key
+    for msg in (date, region, service, 'aws4_request'):
+        key = hmac.new(key, msg, hashlib.sha256).digest()
+    return key
+
+
+class TestSigV4Handler(unittest.TestCase):
+    def setUp(self):
+        self.provider = Mock()
+        self.provider.access_key = 'AKIDEXAMPLE'
+        self.provider.secret_key = SECRET_KEY
+        self.provider.security_token = None
+        self.handler = HmacAuthV4Handler('iam.amazonaws.com', Mock(),
+                                         self.provider)
+
+    def make_request(self, host='iam.amazonaws.com', date='20120215'):
+        request = HTTPRequest('POST', 'https', host, 443, '/', None, {},
+                              {'X-Amz-Date': date + 'T000000Z'},
+                              'Action=ListUsers&Version=2010-05-08')
+        self.handler.credential_scope(request)
+        return request
+
+    def test_signing_key_matches_example(self):
+        # The example from the Signature Version 4 documentation.
+        key = derive_signing_key(SECRET_KEY, '20120215', 'us-east-1', 'iam')
+        self.assertEqual(
+            key.encode('hex'),
+            'f4780e2d9f65fa895f9c67b32ce1baf0b0d8a43505a000a1a9e090d414db404d')
+
+    def test_signature_uses_derived_key(self):
+        request = self.make_request()
+        expected = hmac.new(
+            derive_signing_key(SECRET_KEY, '20120215', 'us-east-1', 'iam'),
+            'string to sign', hashlib.sha256).hexdigest()
+        self.assertEqual(self.handler.signature(request, 'string to sign'),
+                         expected)
+        # Signing again with the cached key gives the same signature.
+        self.assertEqual(self.handler.signature(request, 'string to sign'),
+                         expected)
+        self.assertEqual(len(self.handler._signing_hmacs), 1)
+
+    def test_signing_keys_cached_per_scope(self):
+        self.handler.signature(self.make_request(), 'a')
+        self.handler.signature(self.make_request(), 'b')
+        self.handler.signature(self.make_request(date='20120216'), 'c')
+        self.handler.signature(
+            self.make_request(host='dynamodb.eu-west-1.amazonaws.com'), 'd')
+        self.assertEqual(len(self.handler._signing_hmacs), 3)
+
+    def test_signing_keys_bounded(self):
+        for day in xrange(1, self.handler.MAX_SIGNING_KEYS + 2):
+            request = self.make_request(date='201201%02d' % day)
+            self.handler.signature(request, 'a')
+        self.assertTrue(
+            len(self.handler._signing_hmacs) <= self.handler.MAX_SIGNING_KEYS)
+
+    def test_new_credentials_used(self):
+        request = self.make_request()
+        old = self.handler.signature(request, 'string to sign')
+        provider = Mock()
+        provider.access_key = 'AKIDEXAMPLE'
+        provider.secret_key = 'another secret'
+        self.handler.update_provider(provider)
+        expected = hmac.new(
+            derive_signing_key('another secret', '20120215', 'us-east-1',
+                               'iam'),
+            'string to sign', hashlib.sha256).hexdigest()
+        new = self.handler.signature(request, 'string to sign')
+        self.assertNotEqual(new, old)
+        self.assertEqual(new, expected)
+
+    def test_payload_hash_follows_body(self):
+        request = self.make_request()
+        self.assertEqual(self.handler.payload(request),
+                         hashlib.sha256(request.body).hexdigest())
+        request.body = 'Action=ListGroups&Version=2010-05-08'
+        self.assertEqual(self.handler.payload(request),
+                         hashlib.sha256(request.body).hexdigest())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import patch
+
+from boto.dynamodb.exceptions import DynamoDBUnprocessedItemsError
+from boto.dynamodb.layer2 import Layer2
+from boto.dynamodb.table import Table
+
+TABLE_DESCRIPTION = {
+    'TableName': 'mytable',
+    'TableStatus': 'ACTIVE',
+    'KeySchema': {'HashKeyElement': {'AttributeName': 'id',
+                                     'AttributeType': 'N'}},
+    'ProvisionedThroughput': {'ReadCapacityUnits': 10,
+                              'WriteCapacityUnits': 10},
+}
+
+
+class FakeBatchWrite(object):
+    """
+    Records the requests it is sent, leaving the first
+    ``unprocessed`` ops of the first ``unprocessed_times`` requests
+    unprocessed.
+    """
+
+    def __init__(self, unprocessed=0, unprocessed_times=0, error=None):
+        self.requests = []
+        self.unprocessed = unprocessed
+        self.unprocessed_times = unprocessed_times
+        self.error = error
+        self.lock = threading.Lock()
+
+    def __call__(self, request_items, object_hook=None):
+        if self.error is not None:
+            raise self.error
+        op_list = request_items['mytable']
+        assert len(op_list) <= 25
+        with self.lock:
+            self.requests.append(op_list)
+            response = {'Responses': {'mytable': {
+                'ConsumedCapacityUnits': float(len(op_list))}}}
+            if self.unprocessed_times:
+                self.unprocessed_times -= 1
+                response['UnprocessedItems'] = {
+                    'mytable': op_list[:self.unprocessed]}
+        return response
+
+    def written(self):
+        ops = {}
+        for op_list in self.requests:
+            for op in op_list:
+                if 'PutRequest' in op:
+                    item = op['PutRequest']['Item']
+                    ops[int(item['id']['N'])] = ('put', item)
+                else:
+                    key = op['DeleteRequest']['Key']['HashKeyElement']
+                    ops[int(key['N'])] = ('delete', None)
+        return ops
+
+
+class TestBatchWriter(unittest.TestCase):
+    def setUp(self):
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.table = Table(self.layer2, {'Table': TABLE_DESCRIPTION})
+        self.fake = FakeBatchWrite()
+        self.layer2.layer1.batch_write_item = self.fake
+
+    def put_items(self, writer, count):
+        for i in xrange(count):
+            writer.put_item(self.table.new_item(i, attrs={'n': i}))
+
+    def test_writes_full_batches(self):
+        with self.table.batch_writer() as writer:
+            self.put_items(writer, 60)
+            self.assertEqual([len(r) for r in self.fake.requests], [25, 25])
+        self.assertEqual([len(r) for r in self.fake.requests], [25, 25, 10])
+        self.assertEqual(sorted(self.fake.written()), range(60))
+        self.assertEqual(writer.consumed_units, 60)
+
+    def test_last_write_to_a_key_wins(self):
+        with self.table.batch_writer() as writer:
+            writer.put_item(self.table.new_item(1, attrs={'n': 1}))
+            writer.put_item(self.table.new_item(1, attrs={'n': 2}))
+            writer.put_item(self.table.new_item(2, attrs={'n': 1}))
+            writer.delete_item(2)
+        self.assertEqual(len(self.fake.requests), 1)
+        self.assertEqual(len(self.fake.requests[0]), 2)
+        written = self.fake.written()
+        self.assertEqual(written[1][1]['n'], {'N': '2'})
+        self.assertEqual(written[2], ('delete', None))
+
+    @patch('boto.dynamodb.batch.time')
+    def test_unprocessed_items_resent(self, mock_time):
+        self.fake.unprocessed = 5
+        self.fake.unprocessed_times = 2
+        with self.table.batch_writer() as writer:
+            self.put_items(writer, 25)
+        self.assertEqual([len(r) for r in self.fake.requests], [25, 5, 5])
+        self.assertEqual(self.fake.requests[1], self.fake.requests[0][:5])
+        self.assertEqual(mock_time.sleep.call_count, 2)
+
+    @patch('boto.dynamodb.batch.time')
+    def test_unprocessed_items_raised_after_retries(self, mock_time):
+        self.fake.unprocessed = 5
+        self.fake.unprocessed_times = 100
+        writer = self.table.batch_writer(num_retries=2)
+        self.put_items(writer, 20)
+        try:
+            writer.close()
+        except DynamoDBUnprocessedItemsError, e:
+            self.assertEqual(len(e.unprocessed_items['mytable']), 5)
+        else:
+            self.fail('DynamoDBUnprocessedItemsError not raised')
+        self.assertEqual(len(self.fake.requests), 3)
+
+    def test_write_with_threads(self):
+        with self.table.batch_writer(num_threads=3) as writer:
+            self.put_items(writer, 260)
+        self.assertEqual(sorted(self.fake.written()), range(260))
+        self.assertEqual(len(self.fake.requests), 11)
+        self.assertEqual(writer.consumed_units, 260)
+
+    def test_thread_error_raised(self):
+        self.fake.error = IOError('connection reset')
+        writer = self.table.batch_writer(num_threads=2)
+
+        def write_items():
+            self.put_items(writer, 30)
+            writer.close()
+        # The error is raised by whichever call follows the failure.
+        self.assertRaises(IOError, write_items)
+
+    def test_no_request_when_empty(self):
+        with self.table.batch_writer():
+            pass
+        self.assertEqual(self.fake.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
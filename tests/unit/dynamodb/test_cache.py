@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto.dynamodb.cache import ItemCache
+from boto.dynamodb.exceptions import DynamoDBKeyNotFoundError
+from boto.dynamodb.layer2 import Layer2
+from boto.dynamodb.table import Table
+
+TABLE_DESCRIPTION = {
+    'TableName': 'mytable',
+    'TableStatus': 'ACTIVE',
+    'KeySchema': {'HashKeyElement': {'AttributeName': 'id',
+                                     'AttributeType': 'N'}},
+    'ProvisionedThroughput': {'ReadCapacityUnits': 10,
+                              'WriteCapacityUnits': 10},
+}
+
+
+class TestItemCache(unittest.TestCase):
+    @patch('boto.dynamodb.cache.time')
+    def test_entries_expire(self, mock_time):
+        mock_time.time.return_value = 100
+        cache = ItemCache(ttl=10, negative_ttl=2)
+        cache.put(1, {'id': 1})
+        cache.put(2, None)
+        self.assertEqual(cache.get(1), {'id': 1})
+        self.assertEqual(cache.get(2), None)
+        mock_time.time.return_value = 105
+        self.assertEqual(cache.get(1), {'id': 1})
+        self.assertTrue(cache.get(2) is ItemCache.MISSING)
+        mock_time.time.return_value = 111
+        self.assertTrue(cache.get(1) is ItemCache.MISSING)
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_dropped(self):
+        cache = ItemCache(max_items=2)
+        cache.put(1, {})
+        cache.put(2, {})
+        cache.get(1)
+        cache.put(3, {})
+        self.assertTrue(cache.get(2) is ItemCache.MISSING)
+        self.assertEqual(cache.get(1), {})
+        self.assertEqual(cache.get(3), {})
+
+    def test_returns_copies(self):
+        cache = ItemCache()
+        attrs = {'id': 1}
+        cache.put(1, attrs)
+        attrs['id'] = 2
+        cache.get(1)['id'] = 3
+        self.assertEqual(cache.get(1), {'id': 1})
+
+    def test_stats(self):
+        cache = ItemCache()
+        cache.put(1, {})
+        cache.get(1)
+        cache.get(1)
+        cache.get(1)
+        cache.get(2)
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1,
+                                         'hit_rate': 0.75, 'size': 1})
+
+
+class TestTableCache(unittest.TestCase):
+    def setUp(self):
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.table = Table(self.layer2, {'Table': TABLE_DESCRIPTION})
+        self.layer1 = Mock()
+        self.layer2.layer1 = self.layer1
+        self.layer1.get_item.return_value = {
+            'Item': {'id': {'N': '1'}, 'name': {'S': 'foo'}},
+            'ConsumedCapacityUnits': 0.5}
+        self.layer1.put_item.return_value = {'ConsumedCapacityUnits': 1.0}
+        self.layer1.delete_item.return_value = {'ConsumedCapacityUnits': 1.0}
+        self.cache = self.table.enable_cache()
+
+    def test_repeated_reads_served_from_cache(self):
+        first = self.table.get_item(1)
+        first['name'] = 'changed'
+        second = self.table.get_item(1)
+        self.assertEqual(second['name'], 'foo')
+        self.assertEqual(second.hash_key, 1)
+        self.assertEqual(self.layer1.get_item.call_count, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_consistent_reads_and_projections_bypass_cache(self):
+        self.table.get_item(1)
+        self.table.get_item(1, consistent_read=True)
+        self.table.get_item(1, attributes_to_get=['name'])
+        self.assertEqual(self.layer1.get_item.call_count, 3)
+
+    def test_missing_keys_cached(self):
+        self.layer1.get_item.side_effect = DynamoDBKeyNotFoundError('nope')
+        self.assertRaises(DynamoDBKeyNotFoundError, self.table.get_item, 1)
+        self.assertRaises(DynamoDBKeyNotFoundError, self.table.get_item, 1)
+        self.assertEqual(self.layer1.get_item.call_count, 1)
+
+    def test_put_updates_cache(self):
+        self.table.new_item(1, attrs={'name': 'bar'}).put()
+        self.assertEqual(self.table.get_item(1)['name'], 'bar')
+        self.assertFalse(self.layer1.get_item.called)
+
+    def test_failed_put_invalidates(self):
+        self.table.get_item(1)
+        self.layer1.put_item.side_effect = IOError('connection reset')
+        item = self.table.new_item(1, attrs={'name': 'bar'})
+        self.assertRaises(IOError, item.put)
+        self.table.get_item(1)
+        self.assertEqual(self.layer1.get_item.call_count, 2)
+
+    def test_update_invalidates_unless_all_new(self):
+        self.layer1.update_item.return_value = {}
+        item = self.table.get_item(1)
+        item.put_attribute('name', 'bar')
+        item.save()
+        self.table.get_item(1)
+        self.assertEqual(self.layer1.get_item.call_count, 2)
+        self.layer1.update_item.return_value = {
+            'Attributes': {'id': {'N': '1'}, 'name': {'S': 'baz'}}}
+        item.put_attribute('name', 'baz')
+        item.save(return_values='ALL_NEW')
+        self.assertEqual(self.table.get_item(1)['name'], 'baz')
+        self.assertEqual(self.layer1.get_item.call_count, 2)
+
+    def test_delete_caches_missing_key(self):
+        self.table.get_item(1).delete()
+        self.assertRaises(DynamoDBKeyNotFoundError, self.table.get_item, 1)
+        self.assertEqual(self.layer1.get_item.call_count, 1)
+
+    def test_batch_writes_invalidate(self):
+        self.layer1.batch_write_item.return_value = {'Responses': {}}
+        self.table.get_item(1)
+        self.table.get_item(2)
+        with self.table.batch_writer() as writer:
+            writer.put_item(self.table.new_item(1, attrs={'name': 'bar'}))
+        batch_list = self.layer2.new_batch_write_list()
+        batch_list.add_batch(self.table, deletes=[2])
+        self.layer2.batch_write_item(batch_list)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_read_before_batch_write_not_kept(self):
+        self.layer1.batch_write_item.return_value = {'Responses': {}}
+        with self.table.batch_writer() as writer:
+            writer.put_item(self.table.new_item(1, attrs={'name': 'bar'}))
+            self.table.get_item(1)
+        self.table.get_item(1)
+        self.assertEqual(self.layer1.get_item.call_count, 2)
+
+    def test_unprocessed_batch_writes_stay_cached(self):
+        self.layer1.batch_write_item.return_value = {
+            'Responses': {},
+            'UnprocessedItems': {'mytable': [
+                {'DeleteRequest': {'Key': {'HashKeyElement': 2}}}]}}
+        self.table.get_item(1)
+        self.table.get_item(2)
+        batch_list = self.layer2.new_batch_write_list()
+        batch_list.add_batch(self.table, deletes=[1, 2])
+        self.layer2.batch_write_item(batch_list)
+        self.assertEqual(len(self.cache), 1)
+        self.table.get_item(2)
+        self.assertEqual(self.layer1.get_item.call_count, 2)
+
+    def test_disable_cache(self):
+        self.table.disable_cache()
+        self.assertEqual(self.table.cache, None)
+        self.table.get_item(1)
+        self.table.get_item(1)
+        self.assertEqual(self.layer1.get_item.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import json
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto.dynamodb.exceptions import DynamoDBUnprocessedKeysError
+from boto.dynamodb.layer2 import Layer2, ParallelTableGenerator
+from boto.dynamodb.table import Table
+
+TABLE_DESCRIPTION = {
+    'TableName': 'mytable',
+    'TableStatus': 'ACTIVE',
+    'KeySchema': {'HashKeyElement': {'AttributeName': 'id',
+                                     'AttributeType': 'N'}},
+    'ProvisionedThroughput': {'ReadCapacityUnits': 10,
+                              'WriteCapacityUnits': 10},
+}
+
+
+class FakeSegmentedScan(object):
+    """
+    Serves scan pages from ``num_items`` items, split into segments by
+    the remainder of their hash key and into pages of ``page_size``.
+    """
+
+    def __init__(self, num_items, page_size=3):
+        self.num_items = num_items
+        self.page_size = page_size
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, table_name, segment=None, total_segments=None,
+                 exclusive_start_key=None, **kwargs):
+        with self.lock:
+            self.calls.append((segment, total_segments, exclusive_start_key))
+        ids = [i for i in range(self.num_items)
+               if i % total_segments == segment]
+        start = 0
+        if exclusive_start_key:
+            last = int(exclusive_start_key['HashKeyElement']['N'])
+            start = ids.index(last) + 1
+        page = ids[start:start + self.page_size]
+        response = {'Items': [{'id': {'N': str(i)}} for i in page],
+                    'ConsumedCapacityUnits': 0.5 * len(page)}
+        if start + self.page_size < len(ids):
+            response['LastEvaluatedKey'] = {
+                'HashKeyElement': {'N': str(page[-1])}}
+        return response
+
+
+class TestParallelScan(unittest.TestCase):
+    def setUp(self):
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.table = Table(self.layer2, {'Table': TABLE_DESCRIPTION})
+        self.scan = FakeSegmentedScan(20)
+        self.layer2.layer1.scan = self.scan
+
+    def test_all_segments_scanned(self):
+        results = self.table.scan(total_segments=4)
+        self.assertTrue(isinstance(results, ParallelTableGenerator))
+        ids = sorted(item['id'] for item in results)
+        self.assertEqual(ids, range(20))
+        self.assertEqual(results.consumed_units, 10)
+        self.assertEqual(sorted(set(call[:2] for call in self.scan.calls)),
+                         [(0, 4), (1, 4), (2, 4), (3, 4)])
+        # Each segment of five items takes two pages.
+        self.assertEqual(len(self.scan.calls), 8)
+
+    def test_max_results(self):
+        results = list(self.table.scan(total_segments=4, max_results=7))
+        self.assertEqual(len(results), 7)
+
+    def test_segment_error_raised(self):
+        def scan(**kwargs):
+            if kwargs['segment'] == 2:
+                raise IOError('connection reset')
+            return self.scan(**kwargs)
+        self.layer2.layer1.scan = scan
+        results = self.table.scan(total_segments=4)
+        self.assertRaises(IOError, list, results)
+
+    def test_exclusive_start_key_rejected(self):
+        self.assertRaises(ValueError, self.table.scan, total_segments=4,
+                          exclusive_start_key=(1,))
+
+    def test_rate_limited(self):
+        class StoppedClock(object):
+            def __init__(self):
+                self.delays = []
+
+            def time(self):
+                return 100.0
+
+            def sleep(self, seconds):
+                self.delays.append(seconds)
+
+        clock = StoppedClock()
+        with patch('boto.dynamodb.throughput.time', clock):
+            results = self.table.scan(total_segments=2,
+                                      read_units_per_second=2)
+            self.assertEqual(len(list(results)), 20)
+        # The clock never moves, so once the first second's worth of
+        # units is spent every page waits for the balance to recover.
+        self.assertTrue(len(clock.delays) >= 4)
+        self.assertTrue(min(clock.delays) > 0)
+
+    def test_sequential_scan_unchanged(self):
+        self.layer2.layer1.scan = Mock(
+            return_value={'Items': [{'id': {'N': '1'}}],
+                          'ConsumedCapacityUnits': 1})
+        results = list(self.table.scan())
+        self.assertEqual([item['id'] for item in results], [1])
+        kwargs = self.layer2.layer1.scan.call_args[1]
+        self.assertFalse('segment' in kwargs)
+
+
+class FakeBatchGet(object):
+    """
+    Serves batch gets of the items whose keys are below ``num_items``,
+    leaving the last ``unprocessed`` keys of the first
+    ``unprocessed_times`` requests unprocessed.
+    """
+
+    def __init__(self, num_items, unprocessed=0, unprocessed_times=0):
+        self.num_items = num_items
+        self.unprocessed = unprocessed
+        self.unprocessed_times = unprocessed_times
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request_items, object_hook=None):
+        request = request_items['mytable']
+        keys = [int(k['HashKeyElement']['N']) for k in request['Keys']]
+        assert len(keys) <= 100
+        assert len(set(keys)) == len(keys)
+        with self.lock:
+            self.requests.append(keys)
+            unprocessed = []
+            if self.unprocessed_times:
+                self.unprocessed_times -= 1
+                unprocessed = keys[-self.unprocessed:]
+                keys = keys[:-self.unprocessed]
+        response = {'Responses': {'mytable': {
+            'Items': [{'id': {'N': str(k)}, 'n': {'S': 'x'}}
+                      for k in keys if k < self.num_items],
+            'ConsumedCapacityUnits': 0.5 * len(keys)}}}
+        if unprocessed:
+            response['UnprocessedKeys'] = {'mytable': {'Keys': [
+                {'HashKeyElement': {'N': str(k)}} for k in unprocessed]}}
+        # Round trip through JSON decoding as Layer1 would.
+        return json.loads(json.dumps(response), object_hook=object_hook)
+
+
+class TestBatchGetIter(unittest.TestCase):
+    def setUp(self):
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.table = Table(self.layer2, {'Table': TABLE_DESCRIPTION})
+
+    def test_keys_split_into_requests(self):
+        fake = FakeBatchGet(250)
+        self.layer2.layer1.batch_get_item = fake
+        keys = range(250) + range(10)
+        results = self.layer2.batch_get_iter(self.table, keys)
+        ids = sorted(item['id'] for item in results)
+        self.assertEqual(ids, range(250))
+        self.assertEqual(sorted(len(r) for r in fake.requests),
+                         [50, 100, 100])
+        self.assertEqual(results.consumed_units, 125)
+
+    def test_missing_items_skipped(self):
+        self.layer2.layer1.batch_get_item = FakeBatchGet(5)
+        results = self.layer2.batch_get_iter(self.table, range(10))
+        self.assertEqual(sorted(item['id'] for item in results), range(5))
+
+    @patch('boto.dynamodb.layer2.time')
+    def test_unprocessed_keys_resent(self, mock_time):
+        fake = FakeBatchGet(150, unprocessed=20, unprocessed_times=1)
+        self.layer2.layer1.batch_get_item = fake
+        results = self.layer2.batch_get_iter(self.table, range(150),
+                                             num_threads=1)
+        self.assertEqual(sorted(item['id'] for item in results), range(150))
+        self.assertEqual([len(r) for r in fake.requests], [100, 20, 50])
+        self.assertEqual(fake.requests[1], range(80, 100))
+
+    @patch('boto.dynamodb.layer2.time')
+    def test_unprocessed_keys_raised_after_retries(self, mock_time):
+        fake = FakeBatchGet(10, unprocessed=2, unprocessed_times=100)
+        self.layer2.layer1.batch_get_item = fake
+        results = self.layer2.batch_get_iter(self.table, range(10),
+                                             num_retries=2)
+        self.assertRaises(DynamoDBUnprocessedKeysError, list, results)
+        self.assertEqual(len(fake.requests), 3)
+
+    def test_no_keys(self):
+        self.layer2.layer1.batch_get_item = Mock()
+        self.assertEqual(list(self.layer2.batch_get_iter(self.table, [])), [])
+        self.assertFalse(self.layer2.layer1.batch_get_item.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
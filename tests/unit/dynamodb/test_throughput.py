@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto.dynamodb.layer2 import Layer2
+from boto.dynamodb.table import Table
+from boto.dynamodb.throughput import TokenBucket, ThroughputGovernor
+
+TABLE_DESCRIPTION = {
+    'TableName': 'mytable',
+    'TableStatus': 'ACTIVE',
+    'KeySchema': {'HashKeyElement': {'AttributeName': 'id',
+                                     'AttributeType': 'N'}},
+    'ProvisionedThroughput': {'ReadCapacityUnits': 10,
+                              'WriteCapacityUnits': 5},
+}
+
+
+class FakeClock(object):
+    """A clock that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch('boto.dynamodb.throughput.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_starts_full(self):
+        bucket = TokenBucket(10)
+        self.assertEqual(bucket.wait(), 0)
+        self.assertEqual(bucket.tokens, 10)
+
+    def test_waits_for_negative_balance_to_recover(self):
+        bucket = TokenBucket(10)
+        bucket.consume(15)
+        self.assertEqual(bucket.wait(), 0.5)
+        self.assertEqual(bucket.wait(), 0)
+
+    def test_refills_up_to_capacity(self):
+        bucket = TokenBucket(10, capacity=20)
+        bucket.consume(20)
+        self.clock.now += 60
+        bucket.consume(0)
+        self.assertEqual(bucket.tokens, 20)
+
+    def test_rate_is_held(self):
+        bucket = TokenBucket(10)
+        for i in range(100):
+            bucket.wait()
+            bucket.consume(2)
+        # 200 units, less the 10 the bucket started with, at 10/s.
+        self.assertTrue(18 <= sum(self.clock.sleeps) <= 19)
+
+
+class TestThroughputGovernor(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch('boto.dynamodb.throughput.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.layer2 = Layer2('access_key', 'secret_key')
+        self.table = Table(self.layer2, {'Table': TABLE_DESCRIPTION})
+
+    def test_buckets_follow_provisioned_throughput(self):
+        governor = ThroughputGovernor(utilization=0.5)
+        self.assertEqual(governor.bucket(self.table, 'read').rate, 5)
+        self.assertEqual(governor.bucket(self.table, 'write').rate, 2.5)
+        self.table._dict['ProvisionedThroughput']['ReadCapacityUnits'] = 40
+        bucket = governor.bucket(self.table, 'read')
+        self.assertEqual(bucket.rate, 20)
+        self.assertTrue(governor.bucket(self.table, 'read') is bucket)
+
+    def test_layer2_requests_paced(self):
+        self.layer2.governor = ThroughputGovernor(utilization=1.0)
+        self.layer2.layer1.put_item = Mock(
+            return_value={'ConsumedCapacityUnits': 1.0})
+        for i in range(25):
+            self.layer2.put_item(self.table.new_item(i, attrs={'n': i}))
+        # Five writes a second.  The first six go straight out: five
+        # spend the starting balance and the sixth takes it negative.
+        self.assertAlmostEqual(sum(self.clock.sleeps), 3.8)
+        self.assertEqual(self.layer2.layer1.put_item.call_count, 25)
+
+    def test_batch_writes_charged_per_table(self):
+        self.layer2.governor = ThroughputGovernor()
+        self.layer2.layer1.batch_write_item = Mock(return_value={
+            'Responses': {'mytable': {'ConsumedCapacityUnits': 3.0}}})
+        batch_list = self.layer2.new_batch_write_list()
+        batch_list.add_batch(self.table, deletes=[1, 2, 3])
+        batch_list.submit()
+        bucket = self.layer2.governor.bucket(self.table, 'write')
+        self.assertEqual(bucket.tokens, 4.5 - 3)
+
+    def test_no_governor(self):
+        self.layer2.layer1.get_item = Mock(return_value={
+            'Item': {'id': {'N': '1'}}, 'ConsumedCapacityUnits': 1.0})
+        for i in range(100):
+            self.layer2.get_item(self.table, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
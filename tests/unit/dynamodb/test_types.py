@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import json
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from boto.dynamodb.layer2 import item_object_hook
+from boto.dynamodb.types import dynamize_value, _dynamize_value
+from boto.dynamodb.types import get_dynamodb_type, undynamize_value
+from boto.dynamodb.types import undynamize_item
+
+VALUES = [0, 12, -7, 2 ** 70, 1.5, True, False, 'abc', u'd\xe9f', '',
+          set([1, 2]), frozenset([1.5]), set(['a', u'b']), set(),
+          set([True, 3])]
+
+
+class MyInt(int):
+    pass
+
+
+class TestDynamize(unittest.TestCase):
+    def test_fast_path_matches_general_path(self):
+        for value in VALUES:
+            self.assertEqual(dynamize_value(value), _dynamize_value(value))
+
+    def test_subclasses(self):
+        self.assertEqual(dynamize_value(MyInt(3)), {'N': '3'})
+        self.assertEqual(get_dynamodb_type(MyInt(3)), 'N')
+
+    def test_types(self):
+        self.assertEqual(get_dynamodb_type(int), 'N')
+        self.assertEqual(get_dynamodb_type(u'x'), 'S')
+        self.assertEqual(get_dynamodb_type(set(['x'])), 'SS')
+
+    def test_unsupported(self):
+        self.assertRaises(TypeError, dynamize_value, None)
+        self.assertRaises(TypeError, dynamize_value, set([1, 'a']))
+        self.assertRaises(TypeError, dynamize_value, [1])
+
+
+class TestUndynamize(unittest.TestCase):
+    def test_values(self):
+        self.assertEqual(undynamize_value({'N': '12'}), 12)
+        self.assertEqual(undynamize_value({'N': '1.5'}), 1.5)
+        self.assertEqual(undynamize_value({'S': u'x'}), u'x')
+        self.assertEqual(undynamize_value({'SS': [u'a', u'b']}),
+                         set([u'a', u'b']))
+        self.assertEqual(undynamize_value({'NS': ['1', '2.5']}),
+                         set([1, 2.5]))
+
+    def test_item_matches_object_hook(self):
+        attrs = dict(('attr%d' % i, dynamize_value(value))
+                     for i, value in enumerate(VALUES))
+        body = json.dumps({'Item': attrs})
+        hooked = json.loads(body, object_hook=item_object_hook)['Item']
+        self.assertEqual(undynamize_item(json.loads(body)['Item']), hooked)
+
+    def test_attribute_named_like_a_type(self):
+        # The object hook would collapse this item into a string.
+        self.assertEqual(undynamize_item({'S': {'S': u'x'}}), {'S': u'x'})
+
+    def test_unknown_type_left_alone(self):
+        self.assertEqual(undynamize_item({'a': {'B': 'eA=='}}),
+                         {'a': {'B': 'eA=='}})
+
+
+if __name__ == '__main__':
+    unittest.main()
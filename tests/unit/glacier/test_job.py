@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+import StringIO
+import tempfile
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto.glacier.layer1 import Layer1
+from boto.glacier.job import Job
+from boto.glacier.exceptions import HashesDoNotMatchError
+from boto.glacier.utils import chunk_hashes, tree_hash, bytes_to_hex
+
+MEGABYTE = 1024 * 1024
+
+
+class FakeOutputResponse(dict):
+    def __init__(self, data, hex_tree_hash):
+        self[u'TreeHash'] = hex_tree_hash
+        self._fp = StringIO.StringIO(data)
+
+    def read(self, amt=None):
+        return self._fp.read(amt)
+
+
+class TestJobDownload(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(5 * MEGABYTE + 100)
+        self.layer1 = Mock(spec=Layer1)
+        self.layer1.get_job_output.side_effect = self.get_job_output
+        self.vault = Mock()
+        self.vault.name = 'examplevault'
+        self.vault.layer1 = self.layer1
+        self.job = Job(self.vault)
+        self.job.id = 'JOBID'
+        self.job.action = 'ArchiveRetrieval'
+        self.job.archive_size = len(self.data)
+        self.job.sha256_treehash = bytes_to_hex(
+            tree_hash(chunk_hashes(self.data)))
+        self.requested = []
+        self.corrupt = set()
+        self.fail = set()
+        self.lock = threading.Lock()
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'archive')
+        self.state_filename = self.filename + '.state'
+
+    def tearDown(self):
+        for name in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def get_job_output(self, vault_name, job_id, byte_range):
+        with self.lock:
+            self.requested.append(byte_range)
+            if byte_range[0] in self.fail:
+                raise IOError('connection reset')
+        data = self.data[byte_range[0]:byte_range[1] + 1]
+        hex_tree_hash = bytes_to_hex(tree_hash(chunk_hashes(data)))
+        with self.lock:
+            if byte_range[0] in self.corrupt:
+                self.corrupt.discard(byte_range[0])
+                data = 'x' + data[1:]
+        return FakeOutputResponse(data, hex_tree_hash)
+
+    def assert_downloaded(self):
+        self.assertEqual(open(self.filename, 'rb').read(), self.data)
+        self.assertFalse(os.path.exists(self.state_filename))
+
+    def test_get_output_chunk_range(self):
+        self.assertEqual(self.job.get_output_chunk(2, MEGABYTE),
+                         self.data[2 * MEGABYTE:3 * MEGABYTE])
+        self.layer1.get_job_output.assert_called_with(
+            'examplevault', 'JOBID', (2 * MEGABYTE, 3 * MEGABYTE - 1))
+
+    def test_download_to_file(self):
+        self.job.download_to_file(self.filename, chunk_size=MEGABYTE,
+                                  num_threads=3)
+        self.assert_downloaded()
+        self.assertEqual(sorted(self.requested),
+                         [(i * MEGABYTE, min((i + 1) * MEGABYTE,
+                                             len(self.data)) - 1)
+                          for i in xrange(6)])
+
+    def test_corrupt_range_is_retried(self):
+        self.corrupt.add(2 * MEGABYTE)
+        self.job.download_to_file(self.filename, chunk_size=MEGABYTE,
+                                  time_between_retries=0)
+        self.assert_downloaded()
+        self.assertEqual(len(self.requested), 7)
+
+    @patch('boto.glacier.job.time')
+    def test_download_resumes_after_failure(self, mock_time):
+        self.fail.add(4 * MEGABYTE)
+        self.assertRaises(IOError, self.job.download_to_file, self.filename,
+                          chunk_size=MEGABYTE, num_threads=1, num_retries=1)
+        self.assertTrue(os.path.exists(self.state_filename))
+        self.assertEqual(self.requested[:4],
+                         [(i * MEGABYTE, (i + 1) * MEGABYTE - 1)
+                          for i in xrange(4)])
+
+        self.fail.clear()
+        self.requested = []
+        self.job.download_to_file(self.filename, chunk_size=MEGABYTE)
+        self.assert_downloaded()
+        self.assertEqual(sorted(self.requested),
+                         [(4 * MEGABYTE, 5 * MEGABYTE - 1),
+                          (5 * MEGABYTE, len(self.data) - 1)])
+
+    def test_state_for_another_job_is_ignored(self):
+        state = open(self.state_filename, 'w')
+        state.write('{"JobId": "OTHER", "ChunkSize": 1, "Size": 1}\n0 %s\n' %
+                    ('0' * 64))
+        state.close()
+        open(self.filename, 'w').close()
+        self.job.download_to_file(self.filename, chunk_size=MEGABYTE)
+        self.assert_downloaded()
+        self.assertEqual(len(self.requested), 6)
+
+    def test_whole_output_hash_is_checked(self):
+        self.job.sha256_treehash = '0' * 64
+        self.assertRaises(HashesDoNotMatchError, self.job.download_to_file,
+                          self.filename, chunk_size=MEGABYTE)
+        self.assertFalse(os.path.exists(self.state_filename))
+
+    def test_error_opening_output_raised(self):
+        real_open = open
+
+        def fake_open(name, mode='r', *args):
+            if mode == 'r+b':
+                raise IOError('Permission denied')
+            return real_open(name, mode, *args)
+        errors = []
+
+        def download():
+            try:
+                self.job.download_to_file(self.filename, chunk_size=MEGABYTE)
+            except IOError, e:
+                errors.append(e)
+        with patch('boto.glacier.job.open', fake_open, create=True):
+            thread = threading.Thread(target=download)
+            thread.daemon = True
+            thread.start()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+
+    def test_chunk_size_must_be_power_of_two_megabytes(self):
+        self.assertRaises(ValueError, self.job.download_to_file,
+                          self.filename, chunk_size=3 * MEGABYTE)
+        self.assertRaises(ValueError, self.job.download_to_file,
+                          self.filename, chunk_size=MEGABYTE + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import hashlib
+import os
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from boto.glacier.utils import chunk_hashes, tree_hash, bytes_to_hex
+from boto.glacier.utils import TreeHasher, compute_hashes_from_file
+
+MEGABYTE = 1024 * 1024
+
+
+def reference_tree_hash(hashes):
+    # The pairwise reduction from the Glacier developer guide.
+    hashes = list(hashes)
+    while len(hashes) > 1:
+        new_hashes = []
+        while hashes:
+            if len(hashes) > 1:
+                first = hashes.pop(0)
+                second = hashes.pop(0)
+                new_hashes.append(hashlib.sha256(first + second).digest())
+            else:
+                new_hashes.append(hashes.pop(0))
+        hashes = new_hashes
+    return hashes[0]
+
+
+class TestTreeHash(unittest.TestCase):
+    def test_tree_hash_matches_reference(self):
+        for count in xrange(1, 20):
+            hashes = [hashlib.sha256(str(i)).digest() for i in xrange(count)]
+            self.assertEqual(tree_hash(hashes), reference_tree_hash(hashes))
+
+    def test_empty_string(self):
+        self.assertEqual(bytes_to_hex(tree_hash(chunk_hashes(''))),
+                         hashlib.sha256('').hexdigest())
+        self.assertEqual(TreeHasher().hexdigest(),
+                         hashlib.sha256('').hexdigest())
+
+
+class TestTreeHasher(unittest.TestCase):
+    def test_matches_chunk_hashes(self):
+        data = os.urandom(7 * MEGABYTE + 5)
+        for size in (1, MEGABYTE, MEGABYTE + 1, 3 * MEGABYTE,
+                     5 * MEGABYTE - 1, len(data)):
+            expected = bytes_to_hex(tree_hash(chunk_hashes(data[:size])))
+            self.assertEqual(TreeHasher(data[:size]).hexdigest(), expected)
+
+    def test_incremental_updates(self):
+        data = os.urandom(5 * MEGABYTE + 17)
+        hasher = TreeHasher()
+        step = 300 * 1024 + 7
+        for i in xrange(0, len(data), step):
+            hasher.update(data[i:i + step])
+        self.assertEqual(hasher.digest(), tree_hash(chunk_hashes(data)))
+
+    def test_digest_does_not_end_stream(self):
+        hasher = TreeHasher('a' * MEGABYTE)
+        hasher.digest()
+        hasher.update('b' * 10)
+        self.assertEqual(hasher.digest(),
+                         tree_hash(chunk_hashes('a' * MEGABYTE + 'b' * 10)))
+
+    def test_compute_hashes_from_file(self):
+        data = os.urandom(3 * MEGABYTE + 100)
+        tmp = tempfile.NamedTemporaryFile()
+        tmp.write(data)
+        tmp.flush()
+        linear_hash, hex_tree_hash = compute_hashes_from_file(tmp.name)
+        self.assertEqual(linear_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(hex_tree_hash,
+                         bytes_to_hex(tree_hash(chunk_hashes(data))))
+
+    def test_compute_hashes_from_empty_file(self):
+        tmp = tempfile.NamedTemporaryFile()
+        empty = hashlib.sha256('').hexdigest()
+        self.assertEqual(compute_hashes_from_file(tmp.name), (empty, empty))
+
+
+if __name__ == '__main__':
+    unittest.main()
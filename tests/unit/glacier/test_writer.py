@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import hashlib
+import os
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto.glacier.layer1 import Layer1
+from boto.glacier.writer import Writer
+from boto.glacier.utils import chunk_hashes, tree_hash, bytes_to_hex
+
+MEGABYTE = 1024 * 1024
+
+
+class TestWriter(unittest.TestCase):
+    def setUp(self):
+        self.layer1 = Mock(spec=Layer1)
+        self.layer1.complete_multipart_upload.return_value = {
+            'ArchiveId': 'ARCHIVEID'}
+        self.vault = Mock()
+        self.vault.name = 'examplevault'
+        self.vault.layer1 = self.layer1
+        self.parts = {}
+        self.lock = threading.Lock()
+        self.layer1.upload_part.side_effect = self.record_part
+        self.data = os.urandom(MEGABYTE * 5 + 123)
+
+    def record_part(self, vault_name, upload_id, linear_hash, hex_tree_hash,
+                    content_range, part):
+        part = str(part)
+        self.assertEqual(linear_hash, hashlib.sha256(part).hexdigest())
+        self.assertEqual(hex_tree_hash,
+                         bytes_to_hex(tree_hash(chunk_hashes(part))))
+        self.assertEqual(content_range[1] - content_range[0] + 1, len(part))
+        with self.lock:
+            self.parts[content_range[0]] = part
+
+    def write_archive(self, **kwargs):
+        writer = Writer(self.vault, 'UPLOADID', 2 * MEGABYTE, **kwargs)
+        for i in xrange(0, len(self.data), 300 * 1024):
+            writer.write(self.data[i:i + 300 * 1024])
+        self.assertEqual(writer.get_archive_id(), 'ARCHIVEID')
+
+    def assert_archive_uploaded(self):
+        self.assertEqual(sorted(self.parts), [0, 2 * MEGABYTE, 4 * MEGABYTE])
+        uploaded = ''.join(self.parts[offset] for offset in sorted(self.parts))
+        self.assertEqual(uploaded, self.data)
+        self.layer1.complete_multipart_upload.assert_called_with(
+            'examplevault', 'UPLOADID',
+            bytes_to_hex(tree_hash(chunk_hashes(self.data))), len(self.data))
+
+    def test_write_parts_on_calling_thread(self):
+        self.write_archive()
+        self.assert_archive_uploaded()
+
+    def test_write_parts_with_threads(self):
+        self.write_archive(num_threads=2)
+        self.assert_archive_uploaded()
+
+    @patch('boto.glacier.writer.time')
+    def test_part_failure_is_raised(self, mock_time):
+        self.layer1.upload_part.side_effect = IOError('connection reset')
+        writer = Writer(self.vault, 'UPLOADID', MEGABYTE, num_threads=2)
+
+        def write_archive():
+            writer.write(self.data)
+            writer.close()
+        self.assertRaises(IOError, write_archive)
+        self.assertRaises(IOError, writer.close)
+        self.assertFalse(self.layer1.complete_multipart_upload.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
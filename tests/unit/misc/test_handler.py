@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import xml.sax
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto import handler
+from boto.mws.response import ResponseElement
+from boto.resultset import ResultSet
+from boto.s3.acl import Policy
+from boto.s3.key import Key
+
+LIST_BUCKET_RESULT = """<?xml version="1.0" encoding="UTF-8"?>
+<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+  <Name>mybucket</Name>
+  <Prefix></Prefix>
+  <Marker></Marker>
+  <MaxKeys>1000</MaxKeys>
+  <IsTruncated>true</IsTruncated>
+  <Contents>
+    <Key>caf\xc3\xa9 &amp; cr\xc3\xa8me.txt</Key>
+    <LastModified>2012-10-12T17:50:30.000Z</LastModified>
+    <ETag>&quot;fba9dede5f27731c9771645a39863328&quot;</ETag>
+    <Size>434234</Size>
+    <StorageClass>STANDARD</StorageClass>
+  </Contents>
+  <Contents>
+    <Key><![CDATA[<second>]]></Key>
+    <Size>12</Size>
+  </Contents>
+</ListBucketResult>"""
+
+ACCESS_CONTROL_POLICY = """<?xml version="1.0" encoding="UTF-8"?>
+<AccessControlPolicy>
+  <Owner><ID>owner</ID></Owner>
+  <AccessControlList>
+    <Grant>
+      <Grantee xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+               xsi:type="CanonicalUser">
+        <ID>grantee</ID>
+        <DisplayName>someone</DisplayName>
+      </Grantee>
+      <Permission>FULL_CONTROL</Permission>
+    </Grant>
+  </AccessControlList>
+</AccessControlPolicy>"""
+
+
+class TestParseString(unittest.TestCase):
+    parser = 'expat'
+
+    def setUp(self):
+        config = patch('boto.config.get', return_value=self.parser)
+        config.start()
+        self.addCleanup(config.stop)
+
+    def test_list_bucket_result(self):
+        rs = ResultSet([('Contents', Key)])
+        handler.parseString(LIST_BUCKET_RESULT,
+                            handler.XmlHandler(rs, Mock()))
+        self.assertTrue(rs.is_truncated)
+        self.assertEqual([k.name for k in rs],
+                         [u'caf\xe9 & cr\xe8me.txt', u'<second>'])
+        self.assertEqual(rs[0].etag, '"fba9dede5f27731c9771645a39863328"')
+        self.assertEqual(rs[0].size, 434234)
+
+    def test_attributes_are_passed_with_qualified_names(self):
+        policy = Policy()
+        handler.parseString(ACCESS_CONTROL_POLICY,
+                            handler.XmlHandler(policy, Mock()))
+        grant = policy.acl.grants[0]
+        self.assertEqual(grant.type, 'CanonicalUser')
+        self.assertEqual(grant.id, 'grantee')
+        self.assertEqual(grant.permission, 'FULL_CONTROL')
+
+    def test_mws_response_attributes(self):
+        root = ResponseElement(name='Root')
+        handler.parseString('<Root><Foo currency="USD">1</Foo></Root>',
+                            handler.XmlHandler(root, Mock()))
+        self.assertEqual(root.Foo['currency'], 'USD')
+        self.assertEqual(root.Foo.Value, '1')
+
+    def test_unknown_parser_uses_sax(self):
+        with patch('boto.config.get', return_value='nonesuch'):
+            rs = ResultSet([('Contents', Key)])
+            handler.parseString(LIST_BUCKET_RESULT,
+                                handler.XmlHandler(rs, Mock()))
+        self.assertEqual(len(rs), 2)
+
+    def test_malformed_document_raises_sax_error(self):
+        self.assertRaises(xml.sax.SAXParseException, handler.parseString,
+                          '<Error><Code>Oops</Error>',
+                          handler.XmlHandler(ResultSet(), Mock()))
+
+
+class TestParseStringWithSax(TestParseString):
+    parser = 'sax'
+
+
+if __name__ == '__main__':
+    unittest.main()
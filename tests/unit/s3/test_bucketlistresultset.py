@@ -0,0 +1,134 @@
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from boto.resultset import ResultSet
+from boto.s3.bucketlistresultset import BucketListResultSet
+from boto.s3.bucketlistresultset import parallel_bucket_lister
+from boto.s3.key import Key
+from boto.s3.prefix import Prefix
+
+KEY_NAMES = ['a', 'a/1', 'a/2', 'a/b/3', 'b/1', 'b/2', 'b/3', 'b/4', 'c',
+             'd/1', 'e']
+
+
+class FakeBucket(object):
+    """
+    Serves listings of KEY_NAMES, three entries to a page, with the
+    keys in each page before the common prefixes as S3 lists them.
+    """
+
+    def __init__(self, fail_prefix=None):
+        self.requests = []
+        self.fail_prefix = fail_prefix
+        self.lock = threading.Lock()
+        self.held = False
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_all_keys(self, prefix='', marker='', delimiter='', headers=None):
+        with self.lock:
+            self.requests.append((prefix, marker, delimiter))
+        if prefix == self.fail_prefix:
+            raise IOError('connection reset')
+        if delimiter and marker:
+            self.release.wait(5)
+            if not self.release.is_set():
+                self.held = True
+        entries = []
+        for name in KEY_NAMES:
+            if not name.startswith(prefix) or name <= marker:
+                continue
+            if delimiter and delimiter in name[len(prefix):]:
+                rolled = name[:name.index(delimiter, len(prefix)) + 1]
+                if entries and entries[-1].name == rolled:
+                    continue
+                if rolled <= marker:
+                    continue
+                entries.append(Prefix(self, rolled))
+            else:
+                entries.append(Key(self, name))
+        rs = ResultSet()
+        rs.extend(sorted(entries[:3], key=lambda e: isinstance(e, Prefix)))
+        rs.is_truncated = len(entries) > 3
+        rs.next_marker = None
+        if delimiter and rs.is_truncated:
+            rs.next_marker = rs[-1].name
+        return rs
+
+
+class TestParallelBucketLister(unittest.TestCase):
+    def names(self, keys):
+        return [k.name for k in keys]
+
+    def test_ordered_listing_matches_serial_listing(self):
+        bucket = FakeBucket()
+        keys = parallel_bucket_lister(bucket, num_threads=2)
+        self.assertEqual(self.names(keys), KEY_NAMES)
+        shards = sorted(set(r[0] for r in bucket.requests if r[0]))
+        self.assertEqual(shards, ['a/', 'b/', 'd/'])
+
+    def test_unordered_listing(self):
+        keys = parallel_bucket_lister(FakeBucket(), num_threads=3,
+                                      ordered=False, page_size=2)
+        self.assertEqual(sorted(self.names(keys)), KEY_NAMES)
+
+    def test_explicit_shards(self):
+        bucket = FakeBucket()
+        keys = parallel_bucket_lister(bucket, shards=['b/', 'a/b/'])
+        self.assertEqual(self.names(keys), ['a/b/3', 'b/1', 'b/2', 'b/3',
+                                            'b/4'])
+        self.assertFalse([r for r in bucket.requests if r[2]])
+
+    def test_shards_listed_while_finding_shards(self):
+        bucket = FakeBucket()
+        bucket.release.clear()
+        keys = parallel_bucket_lister(bucket, num_threads=2)
+        first = [keys.next().name for i in xrange(4)]
+        bucket.release.set()
+        self.assertEqual(first + self.names(keys), KEY_NAMES)
+        self.assertFalse(bucket.held)
+
+    def test_explicit_shards_within_prefix(self):
+        keys = parallel_bucket_lister(FakeBucket(), prefix='a/',
+                                      shards=['b/'])
+        self.assertEqual(self.names(keys), ['a/b/3'])
+
+    def test_shard_errors_raised(self):
+        keys = parallel_bucket_lister(FakeBucket(fail_prefix='b/'))
+        self.assertRaises(IOError, list, keys)
+
+    def test_result_set(self):
+        rs = BucketListResultSet(FakeBucket(), prefix='a/', num_threads=4)
+        self.assertEqual(self.names(rs), ['a/1', 'a/2', 'a/b/3'])
+        self.assertRaises(ValueError, BucketListResultSet, FakeBucket(),
+                          delimiter='/', num_threads=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+import StringIO
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto.exception import S3DataError, S3ResponseError
+from boto.provider import Provider
+
+from boto.s3.bucket import Bucket
+from boto.s3.concurrent import ConcurrentUploader, ConcurrentDownloader
+from boto.s3.concurrent import ConcurrentCopier, ConcurrentDeleter
+from boto.s3.concurrent import minimum_part_size, calculate_ranges
+from boto.s3.concurrent import MIN_PART_SIZE, MAX_COPY_SIZE
+
+
+class FakeMultiPartUpload(object):
+    """Records the data of each uploaded part."""
+
+    def __init__(self, fail_times=0):
+        self.id = 'UPLOADID'
+        self.key_name = 'mykey'
+        self.bucket = Mock()
+        self.parts = {}
+        self.cancel_upload = Mock()
+        self._fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def upload_part_from_file(self, fp, part_num, size=None):
+        with self._lock:
+            if self._fail_times:
+                self._fail_times -= 1
+                raise IOError('connection reset')
+        self.parts[part_num] = fp.read(size)
+        key = Mock()
+        key.etag = '"etag-%d"' % part_num
+        return key
+
+
+class TestPartCalculations(unittest.TestCase):
+    def test_minimum_part_size_enforces_five_megabytes(self):
+        self.assertEqual(minimum_part_size(1024, 1024), MIN_PART_SIZE)
+
+    def test_minimum_part_size_stays_within_part_count(self):
+        size = MIN_PART_SIZE * 10000 * 3
+        self.assertEqual(minimum_part_size(size), MIN_PART_SIZE * 3)
+
+    def test_calculate_ranges(self):
+        self.assertEqual(calculate_ranges(10, 4, start=2),
+                         [(1, 2, 4), (2, 6, 4), (3, 10, 2)])
+
+    def test_calculate_ranges_empty(self):
+        self.assertEqual(calculate_ranges(0, 4), [(1, 0, 0)])
+
+
+class TestConcurrentUploader(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(MIN_PART_SIZE * 2 + 10)
+        self.uploader = ConcurrentUploader(Mock(), part_size=MIN_PART_SIZE,
+                                           num_threads=3,
+                                           time_between_retries=0)
+
+    def assert_uploaded(self, mp):
+        self.assertEqual(sorted(mp.parts), [1, 2, 3])
+        self.assertEqual(''.join(mp.parts[i] for i in (1, 2, 3)), self.data)
+        args = mp.bucket.complete_multipart_upload.call_args[0]
+        self.assertEqual(args[:2], ('mykey', 'UPLOADID'))
+        self.assertIn('<PartNumber>3</PartNumber>', args[2])
+        self.assertIn('<ETag>"etag-3"</ETag>', args[2])
+
+    def test_upload_parts_from_file_obj(self):
+        mp = FakeMultiPartUpload()
+        cb = Mock()
+        self.uploader.upload_parts(mp, file_obj=StringIO.StringIO(self.data),
+                                   cb=cb)
+        self.assert_uploaded(mp)
+        cb.assert_called_with(len(self.data), len(self.data))
+
+    def test_upload_parts_from_filename(self):
+        mp = FakeMultiPartUpload()
+        tmp = tempfile.NamedTemporaryFile()
+        tmp.write(self.data)
+        tmp.flush()
+        self.uploader.upload_parts(mp, filename=tmp.name)
+        self.assert_uploaded(mp)
+
+    def test_failed_parts_are_retried(self):
+        mp = FakeMultiPartUpload(fail_times=2)
+        self.uploader.upload_parts(mp, file_obj=StringIO.StringIO(self.data))
+        self.assert_uploaded(mp)
+        self.assertFalse(mp.cancel_upload.called)
+
+    def test_upload_cancelled_when_retries_exhausted(self):
+        mp = FakeMultiPartUpload(fail_times=100)
+        self.uploader.num_retries = 1
+        self.assertRaises(IOError, self.uploader.upload_parts, mp,
+                          file_obj=StringIO.StringIO(self.data))
+        self.assertTrue(mp.cancel_upload.called)
+        self.assertFalse(mp.bucket.complete_multipart_upload.called)
+
+    def test_upload_cancelled_when_completion_fails(self):
+        mp = FakeMultiPartUpload()
+        mp.bucket.complete_multipart_upload.side_effect = \
+            S3ResponseError(400, 'Bad Request')
+        self.assertRaises(S3ResponseError, self.uploader.upload_parts, mp,
+                          file_obj=StringIO.StringIO(self.data))
+        self.assertTrue(mp.cancel_upload.called)
+
+
+class FakeRangeKey(object):
+    """
+    Serves ranged reads of ``data``, truncating the first few, or
+    answering with the whole of ``data`` if ``ignore_range`` is set.
+    """
+
+    def __init__(self, bucket, name, data, truncate_times=0,
+                 ignore_range=False):
+        self.bucket = bucket
+        self.name = name
+        self.data = data
+        self.size = len(data)
+        self.etag = '"abc"'
+        self.version_id = None
+        self.last_modified = None
+        self.requests = []
+        self._truncate_times = truncate_times
+        self._ignore_range = ignore_range
+        self._lock = threading.Lock()
+
+    def new_key(self, name):
+        fake = self
+
+        class RangeReader(object):
+            def open_read(self, headers=None, query_args=''):
+                fake.requests.append(headers)
+                start, end = headers['Range'][len('bytes='):].split('-')
+                if fake._ignore_range:
+                    self.resp = FakeResponse(200)
+                    self.fp = StringIO.StringIO(fake.data)
+                    return
+                self.resp = FakeResponse(206, headers={
+                    'content-range': 'bytes %s-%s/%d' % (start, end,
+                                                         fake.size)})
+                chunk = fake.data[int(start):int(end) + 1]
+                with fake._lock:
+                    if fake._truncate_times:
+                        fake._truncate_times -= 1
+                        chunk = chunk[:-1]
+                self.fp = StringIO.StringIO(chunk)
+
+            def read(self, size=0):
+                return self.fp.read(size)
+
+            def close(self):
+                pass
+        return RangeReader()
+
+
+class TestConcurrentDownloader(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(1024 * 10 + 7)
+        self.bucket = Mock()
+        self.bucket.connection.provider.storage_data_error = S3DataError
+        self.downloader = ConcurrentDownloader(part_size=1024, num_threads=4,
+                                               time_between_retries=0)
+
+    def make_key(self, **kwargs):
+        key = FakeRangeKey(self.bucket, 'mykey', self.data, **kwargs)
+        self.bucket.new_key.side_effect = key.new_key
+        return key
+
+    def test_download_to_filename(self):
+        key = self.make_key()
+        cb = Mock()
+        tmp = tempfile.NamedTemporaryFile()
+        self.downloader.download(key, filename=tmp.name, cb=cb, num_cb=5)
+        self.assertEqual(open(tmp.name, 'rb').read(), self.data)
+        self.assertEqual(len(key.requests), 11)
+        self.assertEqual(key.requests[0]['If-Match'], '"abc"')
+        cb.assert_called_with(len(self.data), len(self.data))
+        self.assertTrue(cb.call_count <= 7)
+
+    def test_download_to_file_obj(self):
+        key = self.make_key()
+        fp = tempfile.TemporaryFile()
+        self.downloader.download(key, file_obj=fp)
+        fp.seek(0)
+        self.assertEqual(fp.read(), self.data)
+
+    def test_ignored_range_raises(self):
+        key = self.make_key(ignore_range=True)
+        fp = tempfile.TemporaryFile()
+        self.downloader.num_retries = 0
+        self.assertRaises(S3DataError, self.downloader.download, key,
+                          file_obj=fp)
+
+    def test_missing_key_raises_not_found(self):
+        self.bucket.connection.provider.storage_response_error = \
+            S3ResponseError
+        self.bucket.get_key.return_value = None
+        key = FakeRangeKey(self.bucket, 'mykey', self.data)
+        key.size = None
+        fp = tempfile.TemporaryFile()
+        try:
+            self.downloader.download(key, file_obj=fp)
+        except S3ResponseError, e:
+            self.assertEqual(e.status, 404)
+        else:
+            self.fail('Expected S3ResponseError')
+
+    def test_truncated_ranges_are_retried(self):
+        key = self.make_key(truncate_times=3)
+        fp = tempfile.TemporaryFile()
+        self.downloader.download(key, file_obj=fp)
+        fp.seek(0)
+        self.assertEqual(fp.read(), self.data)
+        self.assertEqual(len(key.requests), 14)
+
+
+class FakeResponse(object):
+    def __init__(self, status=200, body='', headers=None):
+        self.status = status
+        self.reason = 'Reason'
+        self.msg = dict(headers or {})
+        self._body = body
+
+    def read(self):
+        return self._body
+
+    def getheader(self, name, default=None):
+        return self.msg.get(name.lower(), default)
+
+
+class FakeCopyConnection(object):
+    """
+    Answers the requests of a multipart copy of a ``size`` byte source
+    key, failing the copy of each part in ``fail_parts``.
+    """
+
+    def __init__(self, size, version_id=None, fail_parts=()):
+        self.provider = Provider('aws', 'access_key', 'secret_key')
+        self.size = size
+        self.version_id = version_id
+        self.fail_parts = fail_parts
+        self.requests = []
+        self.parts = {}
+        self.lock = threading.Lock()
+
+    def get_bucket(self, bucket_name, validate=True, headers=None):
+        return Bucket(self, bucket_name)
+
+    def make_request(self, method, bucket='', key='', headers=None, data='',
+                     query_args=None, **kwargs):
+        query_args = query_args or ''
+        if 'partNumber' in query_args:
+            part_num = int(query_args.split('partNumber=')[1])
+            with self.lock:
+                self.parts[part_num] = headers
+            if part_num in self.fail_parts:
+                return FakeResponse(500, '<Error><Code>InternalError</Code>'
+                                         '</Error>')
+            return FakeResponse(body='<CopyPartResult><ETag>"etag-%d"</ETag>'
+                                     '</CopyPartResult>' % part_num)
+        self.requests.append((method, bucket, key, query_args, headers, data))
+        if method == 'HEAD':
+            response_headers = {'content-length': str(self.size),
+                                'etag': '"srcetag"',
+                                'content-type': 'application/x-tar',
+                                'x-amz-meta-build': '42'}
+            if self.version_id:
+                response_headers['x-amz-version-id'] = self.version_id
+            return FakeResponse(headers=response_headers)
+        if query_args == 'uploads':
+            return FakeResponse(body='<InitiateMultipartUploadResult>'
+                                     '<UploadId>UPLOADID</UploadId>'
+                                     '</InitiateMultipartUploadResult>')
+        if method == 'POST':
+            return FakeResponse(body='<CompleteMultipartUploadResult>'
+                                     '<ETag>"final-etag"</ETag>'
+                                     '</CompleteMultipartUploadResult>')
+        if method == 'DELETE':
+            return FakeResponse(204)
+        if method == 'GET':
+            return FakeResponse(body='<AccessControlPolicy/>')
+        if query_args == 'acl':
+            return FakeResponse()
+        return FakeResponse(body='<CopyObjectResult><ETag>"copy-etag"</ETag>'
+                                 '</CopyObjectResult>')
+
+
+class TestConcurrentCopier(unittest.TestCase):
+    def setUp(self):
+        self.size = MIN_PART_SIZE * 3 + 10
+
+    def copy(self, connection, **kwargs):
+        bucket = Bucket(connection, 'mybucket')
+        return bucket.copy_large_key('promoted.tar', 'srcbucket', 'big.tar',
+                                     part_size=MIN_PART_SIZE, num_threads=3,
+                                     **kwargs)
+
+    def test_parts_copied_from_ranges(self):
+        connection = FakeCopyConnection(self.size)
+        cb = Mock()
+        key = self.copy(connection, preserve_acl=True, cb=cb)
+        self.assertEqual(sorted(connection.parts), [1, 2, 3, 4])
+        for part_num, headers in connection.parts.items():
+            self.assertEqual(headers['x-amz-copy-source'],
+                             'srcbucket/big.tar')
+            self.assertEqual(headers['x-amz-copy-source-if-match'],
+                             '"srcetag"')
+        self.assertEqual(connection.parts[1]['x-amz-copy-source-range'],
+                         'bytes=0-%d' % (MIN_PART_SIZE - 1))
+        self.assertEqual(connection.parts[4]['x-amz-copy-source-range'],
+                         'bytes=%d-%d' % (MIN_PART_SIZE * 3, self.size - 1))
+        initiate = [r for r in connection.requests if r[3] == 'uploads'][0]
+        self.assertEqual(initiate[4]['Content-Type'], 'application/x-tar')
+        self.assertEqual(initiate[4]['x-amz-meta-build'], '42')
+        complete = [r for r in connection.requests if r[0] == 'POST'][-1]
+        self.assertEqual(complete[3], 'uploadId=UPLOADID')
+        self.assertIn('<PartNumber>4</PartNumber>', complete[5])
+        self.assertIn('<ETag>"etag-4"</ETag>', complete[5])
+        acls = [r[:3] for r in connection.requests if r[3] == 'acl']
+        self.assertEqual(acls, [('GET', 'srcbucket', 'big.tar'),
+                                ('PUT', 'mybucket', 'promoted.tar')])
+        self.assertEqual(key.name, 'promoted.tar')
+        self.assertEqual(key.etag, '"final-etag"')
+        self.assertEqual(key.size, self.size)
+        cb.assert_called_with(self.size, self.size)
+
+    def test_parts_pinned_to_source_version(self):
+        connection = FakeCopyConnection(self.size, version_id='v1')
+        self.copy(connection, metadata={'build': '43'})
+        for headers in connection.parts.values():
+            self.assertEqual(headers['x-amz-copy-source'],
+                             'srcbucket/big.tar?versionId=v1')
+            self.assertNotIn('x-amz-copy-source-if-match', headers)
+        initiate = [r for r in connection.requests if r[3] == 'uploads'][0]
+        self.assertEqual(initiate[4]['x-amz-meta-build'], '43')
+        self.assertNotIn('Content-Type', initiate[4])
+
+    def test_small_key_copied_with_single_request(self):
+        connection = FakeCopyConnection(1024)
+        key = self.copy(connection)
+        self.assertEqual(connection.parts, {})
+        self.assertEqual([r[0] for r in connection.requests], ['HEAD', 'PUT'])
+        self.assertEqual(key.etag, '"copy-etag"')
+
+    def test_parts_limited_to_five_gigabytes(self):
+        connection = FakeCopyConnection(MAX_COPY_SIZE + 10)
+        bucket = Bucket(connection, 'mybucket')
+        bucket.copy_large_key('promoted.tar', 'srcbucket', 'big.tar',
+                              part_size=MAX_COPY_SIZE * 2)
+        self.assertEqual(sorted(connection.parts), [1, 2])
+        self.assertEqual(connection.parts[1]['x-amz-copy-source-range'],
+                         'bytes=0-%d' % (MAX_COPY_SIZE - 1))
+
+    def test_failed_part_cancels_upload(self):
+        connection = FakeCopyConnection(self.size, fail_parts=[2])
+        bucket = Bucket(connection, 'mybucket')
+        src_key = Bucket(connection, 'srcbucket').get_key('big.tar')
+        copier = ConcurrentCopier(bucket, part_size=MIN_PART_SIZE,
+                                  num_retries=1, time_between_retries=0)
+        self.assertRaises(S3ResponseError, copier.copy, 'promoted.tar',
+                          src_key)
+        methods = [r[0] for r in connection.requests]
+        self.assertEqual(methods, ['HEAD', 'POST', 'DELETE'])
+
+
+class FakeDeleteConnection(object):
+    """
+    Answers Multi-object delete requests, failing the keys in
+    ``slow_down`` with SlowDown the first time they are deleted.
+    """
+
+    def __init__(self, slow_down=()):
+        self.provider = Provider('aws', 'access_key', 'secret_key')
+        self.requests = []
+        self.slow_down = set(slow_down)
+        self.lock = threading.Lock()
+
+    def make_request(self, method, bucket, headers=None, query_args=None,
+                     data=None):
+        assert query_args == 'delete'
+        assert headers['Content-MD5'] == \
+            base64.b64encode(hashlib.md5(data).digest())
+        names = re.findall('<Key>([^<]*)</Key>', data)
+        assert len(names) <= 1000
+        body = ['<DeleteResult>']
+        with self.lock:
+            self.requests.append(names)
+            for name in names:
+                if name in self.slow_down:
+                    self.slow_down.remove(name)
+                    body.append('<Error><Key>%s</Key><Code>SlowDown</Code>'
+                                '</Error>' % name)
+                elif name.startswith('denied'):
+                    body.append('<Error><Key>%s</Key><Code>AccessDenied'
+                                '</Code></Error>' % name)
+                else:
+                    body.append('<Deleted><Key>%s</Key></Deleted>' % name)
+        body.append('</DeleteResult>')
+        response = Mock()
+        response.status = 200
+        response.read.return_value = ''.join(body)
+        return response
+
+
+class TestConcurrentDeleter(unittest.TestCase):
+    def setUp(self):
+        self.keys = ('key-%05d' % i for i in xrange(4500))
+
+    def test_keys_deleted_in_batches(self):
+        connection = FakeDeleteConnection()
+        bucket = Bucket(connection, 'mybucket')
+        deleter = ConcurrentDeleter(num_threads=3)
+        results = list(deleter.delete(bucket, self.keys))
+        self.assertEqual(len(results), 5)
+        deleted = sorted(d.key for rs in results for d in rs.deleted)
+        self.assertEqual(deleted, ['key-%05d' % i for i in xrange(4500)])
+        self.assertEqual(sorted(len(r) for r in connection.requests),
+                         [500, 1000, 1000, 1000, 1000])
+
+    def test_retryable_errors_resent(self):
+        connection = FakeDeleteConnection(slow_down=['key-00001',
+                                                     'key-03000'])
+        bucket = Bucket(connection, 'mybucket')
+        deleter = ConcurrentDeleter(num_threads=2, time_between_retries=0)
+        results = list(deleter.delete(bucket, ['key-00001', 'key-03000',
+                                               'denied-1', 'key-00002']))
+        self.assertEqual(sorted(d.key for rs in results for d in rs.deleted),
+                         ['key-00001', 'key-00002', 'key-03000'])
+        self.assertEqual([(e.key, e.code) for rs in results
+                          for e in rs.errors],
+                         [('denied-1', 'AccessDenied')])
+        self.assertEqual(connection.requests[1], ['key-00001', 'key-03000'])
+
+    @patch('boto.s3.concurrent.random')
+    def test_retry_backoff_does_not_hold_up_other_requests(self, mock_random):
+        mock_random.random.return_value = 1.0
+        connection = FakeDeleteConnection(slow_down=['key-00000'])
+        bucket = Bucket(connection, 'mybucket')
+        deleter = ConcurrentDeleter(num_threads=3, time_between_retries=1)
+        start = time.time()
+        yielded = []
+        for rs in deleter.delete(bucket, self.keys):
+            yielded.append(time.time() - start)
+        self.assertEqual(len(yielded), 6)
+        # Only the resent key waits out the one second backoff.
+        self.assertTrue(yielded[4] < 0.5, yielded)
+        self.assertTrue(yielded[5] >= 1, yielded)
+
+    def test_delete_keys_with_threads(self):
+        connection = FakeDeleteConnection()
+        bucket = Bucket(connection, 'mybucket')
+        rs = bucket.delete_keys(self.keys, num_threads=4)
+        self.assertEqual(len(rs.deleted), 4500)
+        self.assertEqual(len(connection.requests), 5)
+
+    def test_serial_delete_keys(self):
+        connection = FakeDeleteConnection()
+        bucket = Bucket(connection, 'mybucket')
+        rs = bucket.delete_keys(self.keys)
+        self.assertEqual(len(rs.deleted), 4500)
+        self.assertEqual([len(r) for r in connection.requests],
+                         [1000, 1000, 1000, 1000, 500])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import base64
+import hashlib
+import os
+import tempfile
+import StringIO
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock
+
+from boto.exception import S3DataError
+from boto.provider import Provider
+from boto.s3.key import Key
+
+
+class CountingFile(StringIO.StringIO):
+    """A file that counts the bytes read from it."""
+
+    def __init__(self, data):
+        StringIO.StringIO.__init__(self, data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = StringIO.StringIO.read(self, size)
+        self.bytes_read += len(data)
+        return data
+
+
+class FakeHTTPConnection(object):
+    def __init__(self, etag):
+        self.etag = etag
+        self.headers = {}
+        self.sent = []
+
+    def putrequest(self, method, path):
+        pass
+
+    def putheader(self, name, value):
+        self.headers[name] = value
+
+    def endheaders(self):
+        pass
+
+    def set_debuglevel(self, level):
+        pass
+
+    def send(self, data):
+        if not isinstance(data, str):
+            data = data.tobytes()
+        self.sent.append(data)
+
+    def getresponse(self):
+        response = Mock()
+        response.status = 200
+        response.read.return_value = ''
+        headers = {'etag': self.etag or
+                   '"%s"' % hashlib.md5(''.join(self.sent)).hexdigest(),
+                   'x-amz-version-id': 'VERSION'}
+        response.getheader.side_effect = \
+            lambda name, default=None: headers.get(name, default)
+        return response
+
+
+class TestSetContentsFromFile(unittest.TestCase):
+    def setUp(self):
+        self.data = 'x' * 20000 + 'y' * 5000
+        self.bucket = Mock()
+        self.bucket.connection.provider = Provider('aws', 'access_key',
+                                                   'secret_key')
+        self.bucket.connection.debug = 0
+        self.bucket.connection.make_request.side_effect = self.make_request
+        self.etag = None
+        self.conn = None
+
+    def make_request(self, method, bucket, key, headers, sender,
+                     query_args=None):
+        self.conn = FakeHTTPConnection(self.etag)
+        return sender(self.conn, method, '/bucket/key', None, headers)
+
+    def test_md5_computed_before_upload(self):
+        fp = CountingFile(self.data)
+        key = Key(self.bucket, 'key')
+        key.set_contents_from_file(fp)
+        self.assertEqual(fp.bytes_read, len(self.data) * 2)
+        self.assertTrue('Content-MD5' in self.conn.headers)
+
+    def test_single_pass_reads_file_once(self):
+        fp = CountingFile(self.data)
+        key = Key(self.bucket, 'key')
+        self.assertEqual(key.set_contents_from_file(fp, single_pass=True),
+                         len(self.data))
+        self.assertEqual(fp.bytes_read, len(self.data))
+        self.assertFalse('Content-MD5' in self.conn.headers)
+        self.assertEqual(self.conn.headers['Content-Length'],
+                         str(len(self.data)))
+        self.assertEqual(key.md5, hashlib.md5(self.data).hexdigest())
+        self.assertEqual(''.join(self.conn.sent), self.data)
+
+    def test_single_pass_with_size(self):
+        fp = CountingFile(self.data)
+        key = Key(self.bucket, 'key')
+        key.set_contents_from_file(fp, size=1000, single_pass=True)
+        self.assertEqual(self.conn.headers['Content-Length'], '1000')
+        self.assertEqual(''.join(self.conn.sent), self.data[:1000])
+
+    def test_md5_and_size_used_as_given(self):
+        key = Key(self.bucket, 'key')
+        key.compute_md5 = Mock()
+        md5 = hashlib.md5(self.data)
+        key.set_contents_from_file(
+            StringIO.StringIO(self.data), size=len(self.data),
+            md5=(md5.hexdigest(), base64.b64encode(md5.digest())))
+        self.assertFalse(key.compute_md5.called)
+        self.assertEqual(self.conn.headers['Content-Length'],
+                         str(len(self.data)))
+        self.assertEqual(''.join(self.conn.sent), self.data)
+
+    def test_file_at_eof_rejected_with_md5_and_size(self):
+        fp = StringIO.StringIO(self.data)
+        fp.seek(0, os.SEEK_END)
+        key = Key(self.bucket, 'key')
+        md5 = hashlib.md5(self.data)
+        self.assertRaises(AttributeError, key.set_contents_from_file, fp,
+                          size=len(self.data),
+                          md5=(md5.hexdigest(),
+                               base64.b64encode(md5.digest())))
+
+    def test_single_pass_mismatch_deletes_key(self):
+        self.etag = '"0123456789abcdef0123456789abcdef"'
+        key = Key(self.bucket, 'key')
+        self.assertRaises(S3DataError, key.set_contents_from_file,
+                          StringIO.StringIO(self.data), single_pass=True)
+        self.bucket.delete_key.assert_called_with('key', version_id='VERSION')
+
+    def test_upload_from_file_with_large_buffer(self):
+        fp = tempfile.TemporaryFile()
+        fp.write(self.data)
+        fp.seek(0)
+        key = Key(self.bucket, 'key')
+        key.TransferBufferSize = 4096
+        cb = Mock()
+        key.set_contents_from_file(fp, cb=cb, num_cb=3)
+        self.assertEqual(self.conn.sent[0], self.data[:4096])
+        self.assertEqual(''.join(self.conn.sent), self.data)
+        self.assertEqual(key.md5, hashlib.md5(self.data).hexdigest())
+        cb.assert_called_with(len(self.data), len(self.data))
+        self.assertTrue(cb.call_count <= 4)
+
+
+class TestGetFile(unittest.TestCase):
+    def test_reads_in_transfer_buffer_chunks(self):
+        data = 'x' * 10000
+        key = Key(Mock(), 'key')
+        key.TransferBufferSize = 4096
+        key.size = len(data)
+        key.open = Mock()
+        key.close = Mock()
+        key.resp = Mock()
+        reads = []
+
+        def read(size):
+            reads.append(size)
+            return fp.read(size)
+        fp = StringIO.StringIO(data)
+        key.resp.read.side_effect = read
+        out = StringIO.StringIO()
+        key.get_file(out)
+        self.assertEqual(out.getvalue(), data)
+        self.assertEqual(reads, [4096] * 4)
+        self.assertEqual(key.md5, hashlib.md5(data).hexdigest())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import threading
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock
+
+from boto.sqs.batchresults import BatchResults, ResultEntry
+from boto.sqs.consumer import QueueConsumer
+from boto.sqs.message import Message
+
+
+class FakeQueue(object):
+    """
+    Serves ``count`` messages and records the batch requests made to
+    it.  The first ``fail_deletes`` messages deleted come back as
+    batch errors once.
+    """
+
+    id = '/123456789012/myqueue'
+
+    def __init__(self, count, fail_deletes=0):
+        self.messages = []
+        for i in xrange(count):
+            message = Message(body='message %d' % i)
+            message.id = 'id-%d' % i
+            message.receipt_handle = 'handle-%d' % i
+            self.messages.append(message)
+        self.fail_deletes = fail_deletes
+        self.deletes = []
+        self.visibility_changes = []
+        self.extended = threading.Event()
+        self.lock = threading.Lock()
+
+    def get_timeout(self):
+        return 30
+
+    def get_messages(self, num_messages=1, visibility_timeout=None,
+                     attributes=None):
+        with self.lock:
+            messages = self.messages[:num_messages]
+            del self.messages[:num_messages]
+        return messages
+
+    def results(self, ids, errors=()):
+        rs = BatchResults(None)
+        for i in ids:
+            entry = ResultEntry(id=i)
+            if i in errors:
+                entry['sender_fault'] = 'false'
+                rs.errors.append(entry)
+            else:
+                rs.results.append(entry)
+        return rs
+
+    def delete_message_batch(self, messages):
+        assert len(messages) <= 10
+        ids = [m.id for m in messages]
+        with self.lock:
+            failed = ids[:self.fail_deletes]
+            self.fail_deletes -= len(failed)
+            self.deletes.append([i for i in ids if i not in failed])
+        return self.results(ids, failed)
+
+    def change_message_visibility_batch(self, messages):
+        assert len(messages) <= 10
+        with self.lock:
+            self.visibility_changes.append(messages)
+        self.extended.set()
+        return self.results([m.id for m, timeout in messages])
+
+    def deleted(self):
+        return sorted(i for batch in self.deletes for i in batch)
+
+
+class TestQueueConsumer(unittest.TestCase):
+    def consume(self, queue, handler, count, **kwargs):
+        kwargs.setdefault('visibility_timeout', 30)
+        consumer = QueueConsumer(queue, handler, num_receivers=2,
+                                 num_workers=4, ack_interval=0.01,
+                                 idle_sleep=0.01, **kwargs)
+        with consumer:
+            deadline = time.time() + 5
+            while consumer.processed + consumer.failed < count and \
+                    time.time() < deadline:
+                time.sleep(0.01)
+        return consumer
+
+    def test_messages_handled_and_deleted_in_batches(self):
+        queue = FakeQueue(45)
+        handled = []
+        consumer = self.consume(queue, handled.append, 45)
+        self.assertEqual(len(handled), 45)
+        expected = sorted('id-%d' % i for i in xrange(45))
+        self.assertEqual(queue.deleted(), expected)
+        stats = consumer.stats()
+        self.assertEqual(stats['received'], 45)
+        self.assertEqual(stats['processed'], 45)
+        self.assertEqual(stats['deleted'], 45)
+        self.assertEqual(stats['failed'], 0)
+
+    def test_failed_messages_not_deleted(self):
+        queue = FakeQueue(10)
+
+        def handler(message):
+            if message.id == 'id-3':
+                raise ValueError('bad message')
+        consumer = self.consume(queue, handler, 10)
+        self.assertEqual(consumer.failed, 1)
+        self.assertEqual(len(queue.deleted()), 9)
+        self.assertTrue('id-3' not in queue.deleted())
+
+    def test_failed_deletes_retried(self):
+        queue = FakeQueue(10, fail_deletes=3)
+        consumer = self.consume(queue, lambda message: None, 10)
+        self.assertEqual(len(queue.deleted()), 10)
+        self.assertEqual(consumer.deleted, 10)
+
+    def test_visibility_extended_for_slow_handlers(self):
+        queue = FakeQueue(2)
+
+        def handler(message):
+            queue.extended.wait(5)
+        consumer = self.consume(queue, handler, 2, visibility_timeout=1,
+                                heartbeat_interval=0.1)
+        self.assertTrue(queue.extended.is_set())
+        message, timeout = queue.visibility_changes[0][0]
+        self.assertEqual(timeout, 1)
+        self.assertTrue(consumer.extended >= 1)
+        self.assertEqual(len(queue.deleted()), 2)
+
+    def test_visibility_timeout_read_from_queue(self):
+        queue = FakeQueue(0)
+        consumer = QueueConsumer(queue, lambda message: None,
+                                 idle_sleep=0.01)
+        consumer.start()
+        consumer.stop()
+        self.assertEqual(consumer.visibility_timeout, 30)
+        self.assertEqual(consumer.heartbeat_interval, 7.5)
+
+    def test_drain_raises_receive_errors(self):
+        queue = FakeQueue(0)
+        queue.get_messages = Mock(side_effect=IOError('connection reset'))
+        consumer = QueueConsumer(queue, lambda message: None,
+                                 visibility_timeout=30)
+        self.assertRaises(IOError, consumer.drain)
+
+    def test_drain_raises_handler_errors(self):
+        queue = FakeQueue(50)
+
+        def handler(message):
+            if message.id == 'id-3':
+                raise IOError('No space left on device')
+        consumer = QueueConsumer(queue, handler, visibility_timeout=30,
+                                 ack_interval=0.01)
+        self.assertRaises(IOError, consumer.drain)
+        self.assertEqual(consumer.failed, 1)
+        self.assertFalse('id-3' in queue.deleted())
+        self.assertTrue(len(queue.deleted()) < 49)
+
+    def test_drain_without_deleting_holds_messages(self):
+        queue = FakeQueue(25)
+        seen = []
+        lock = threading.Lock()
+
+        def handler(message):
+            with lock:
+                seen.append(message.id)
+            if message.id == 'id-0':
+                # The message is delivered again while it is held.
+                redelivered = Message(body=message.get_body())
+                redelivered.id = message.id
+                redelivered.receipt_handle = 'handle-again'
+                with queue.lock:
+                    queue.messages.append(redelivered)
+        consumer = QueueConsumer(queue, handler, visibility_timeout=30,
+                                 delete_messages=False)
+        self.assertEqual(consumer.drain(), 25)
+        self.assertEqual(sorted(seen), sorted('id-%d' % i for i in xrange(25)))
+        released = [(m.receipt_handle, timeout)
+                    for batch in queue.visibility_changes
+                    for m, timeout in batch]
+        self.assertEqual(len(released), 25)
+        self.assertEqual(set(timeout for handle, timeout in released),
+                         set([0]))
+        # Only the latest receipt handle of a message is released.
+        self.assertIn(('handle-again', 0), released)
+        self.assertEqual(queue.deletes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import threading
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock
+
+from boto.exception import SQSBatchError
+from boto.sqs.batchresults import BatchResults, ResultEntry
+from boto.sqs.message import Message
+from boto.sqs.producer import QueueProducer
+
+
+class FakeQueue(object):
+    """
+    Records the batches sent to it.  Bodies in ``failures`` fail with
+    the given sender fault, once each.
+    """
+
+    id = '/123456789012/myqueue'
+
+    def __init__(self, failures=None, request_failures=0):
+        self.connection = Mock()
+        self.connection.retry_policy.delay.return_value = 0
+        self.batches = []
+        self.failures = failures or {}
+        self.request_failures = request_failures
+        self.lock = threading.Lock()
+
+    def write_batch(self, messages):
+        assert len(messages) <= 10
+        assert sum(len(body) for i, body, delay in messages) <= 64 * 1024
+        rs = BatchResults(None)
+        with self.lock:
+            self.batches.append([body for i, body, delay in messages])
+            if self.request_failures:
+                self.request_failures -= 1
+                raise IOError('connection reset')
+            for i, body, delay in messages:
+                if body in self.failures:
+                    rs.errors.append(ResultEntry(
+                        id=i, sender_fault=self.failures.pop(body)))
+                else:
+                    rs.results.append(ResultEntry(id=i,
+                                                  message_id='msg-' + body))
+        return rs
+
+
+class TestQueueProducer(unittest.TestCase):
+    def test_messages_sent_in_batches_of_ten(self):
+        queue = FakeQueue()
+        with QueueProducer(queue, linger=5) as producer:
+            for i in xrange(25):
+                producer.write('message %d' % i)
+        self.assertEqual([len(b) for b in queue.batches], [10, 10, 5])
+        self.assertEqual(producer.sent, 25)
+        self.assertEqual(producer.requests, 3)
+
+    def test_batches_limited_to_64k(self):
+        queue = FakeQueue()
+        with QueueProducer(queue, linger=5) as producer:
+            for i in xrange(7):
+                producer.write(str(i) * 20 * 1024)
+        self.assertEqual([len(b) for b in queue.batches], [3, 3, 1])
+
+    def test_batch_sent_after_linger(self):
+        queue = FakeQueue()
+        producer = QueueProducer(queue, linger=0.01)
+        producer.write('a')
+        producer.write('b')
+        deadline = time.time() + 5
+        while not queue.batches and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(queue.batches, [['a', 'b']])
+        producer.close()
+
+    def test_flush_waits_for_send(self):
+        queue = FakeQueue()
+        producer = QueueProducer(queue, linger=5)
+        producer.write('a')
+        producer.flush()
+        self.assertEqual(queue.batches, [['a']])
+        producer.close()
+
+    def test_only_failed_entries_resent(self):
+        queue = FakeQueue(failures={'b': 'false'})
+        with QueueProducer(queue) as producer:
+            for body in 'abc':
+                producer.write(body)
+        self.assertEqual(queue.batches, [['a', 'b', 'c'], ['b']])
+        self.assertEqual(producer.sent, 3)
+
+    def test_sender_faults_raised(self):
+        queue = FakeQueue(failures={'b': 'true'})
+        producer = QueueProducer(queue)
+        for body in 'abc':
+            producer.write(body)
+        try:
+            producer.close()
+        except SQSBatchError, e:
+            self.assertEqual([m for m, error in e.errors], ['b'])
+            self.assertEqual(e.errors[0][1]['sender_fault'], 'true')
+        else:
+            self.fail('SQSBatchError not raised')
+        self.assertEqual(queue.batches, [['a', 'b', 'c']])
+
+    def test_batches_after_a_failure_still_sent(self):
+        queue = FakeQueue(failures={'b': 'true'}, request_failures=1)
+        producer = QueueProducer(queue, linger=5)
+        for i in xrange(25):
+            producer.write('%02d' % i)
+        producer.write('b')
+        try:
+            producer.close()
+        except SQSBatchError, e:
+            failed = [m for m, error in e.errors]
+            self.assertEqual(failed, ['%02d' % i for i in xrange(10)] + ['b'])
+            self.assertEqual(e.errors[0][1]['error_code'], 'IOError')
+        else:
+            self.fail('SQSBatchError not raised')
+        self.assertEqual([len(b) for b in queue.batches], [10, 10, 6])
+        self.assertEqual(producer.sent, 15)
+
+    def test_messages_given_their_ids(self):
+        queue = FakeQueue()
+        message = Message(body='hello')
+        with QueueProducer(queue) as producer:
+            producer.write(message)
+        self.assertEqual(message.id, 'msg-' + message.get_body_encoded())
+
+    def test_oversized_message_rejected(self):
+        producer = QueueProducer(FakeQueue())
+        self.assertRaises(ValueError, producer.write, 'x' * (64 * 1024 + 1))
+        producer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+#
+import os
+import tempfile
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock
+
+from boto.exception import SQSError
+from boto.sqs.attributes import Attributes
+from boto.sqs.batchresults import BatchResults, ResultEntry
+from boto.sqs.message import RawMessage
+from boto.sqs.queue import Queue
+
+
+class FakeSQSConnection(object):
+    """Holds the messages of a single queue in memory."""
+
+    def __init__(self, count):
+        self.messages = []
+        for i in xrange(count):
+            message = RawMessage(body='message %d' % i)
+            message.id = 'id-%d' % i
+            message.receipt_handle = 'handle-%d' % i
+            self.messages.append(message)
+        self.receive_sizes = []
+        self.delete_sizes = []
+        self.lock = threading.Lock()
+
+    def get_queue_attributes(self, queue, attribute='All'):
+        attributes = Attributes(queue)
+        attributes['VisibilityTimeout'] = '30'
+        return attributes
+
+    def receive_message(self, queue, number_messages=1,
+                        visibility_timeout=None, attributes=None):
+        with self.lock:
+            self.receive_sizes.append(number_messages)
+            messages = self.messages[:number_messages]
+            del self.messages[:number_messages]
+        return messages
+
+    def delete_message_batch(self, queue, messages):
+        rs = BatchResults(None)
+        with self.lock:
+            self.delete_sizes.append(len(messages))
+        rs.results.extend(ResultEntry(id=m.id) for m in messages)
+        return rs
+
+    def change_message_visibility_batch(self, queue, messages):
+        ids = [m.id for m, timeout in messages]
+        if len(set(ids)) != len(ids):
+            raise SQSError(400, 'Bad Request',
+                           '<Code>BatchEntryIdsNotDistinct</Code>')
+        rs = BatchResults(None)
+        with self.lock:
+            for m, timeout in messages:
+                if timeout == 0:
+                    self.messages.append(m)
+        rs.results.extend(ResultEntry(id=m.id) for m, timeout in messages)
+        return rs
+
+
+class TestBulkQueueOperations(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeSQSConnection(95)
+        self.queue = Queue(self.connection,
+                           'https://queue.amazonaws.com/123456789012/myqueue',
+                           message_class=RawMessage)
+
+    def bodies(self):
+        return set('message %d' % i for i in xrange(95))
+
+    def test_clear_deletes_in_batches(self):
+        self.assertEqual(self.queue.clear(), 95)
+        self.assertEqual(set(self.connection.receive_sizes), set([10]))
+        self.assertEqual(sum(self.connection.delete_sizes), 95)
+        self.assertTrue(max(self.connection.delete_sizes) <= 10)
+        self.assertTrue(len(self.connection.delete_sizes) < 95)
+
+    def test_clear_reports_progress(self):
+        cb = Mock()
+        self.queue.clear(cb=cb)
+        stats = cb.call_args[0][0]
+        self.assertEqual(stats['processed'], 95)
+        self.assertTrue('rate' in stats)
+
+    def test_save_to_file(self):
+        fp = tempfile.TemporaryFile()
+        self.assertEqual(self.queue.save_to_file(fp), 95)
+        fp.seek(0)
+        self.assertEqual(set(fp.read().splitlines()), self.bodies())
+        self.assertEqual(sum(self.connection.delete_sizes), 95)
+
+    def test_dump_leaves_messages(self):
+        fd, file_name = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.assertEqual(self.queue.dump(file_name), 95)
+            self.assertEqual(set(open(file_name).read().splitlines()),
+                             self.bodies())
+        finally:
+            os.remove(file_name)
+        self.assertEqual(self.connection.delete_sizes, [])
+        self.assertEqual(len(self.connection.messages), 95)
+
+    def test_dump_with_message_delivered_twice(self):
+        again = RawMessage(body='message 3')
+        again.id = 'id-3'
+        again.receipt_handle = 'handle-3-again'
+        self.connection.messages.append(again)
+        fd, file_name = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.assertEqual(self.queue.dump(file_name), 95)
+            self.assertEqual(len(open(file_name).read().splitlines()), 95)
+        finally:
+            os.remove(file_name)
+        released = dict((m.id, m.receipt_handle)
+                        for m in self.connection.messages)
+        self.assertEqual(len(released), 95)
+        self.assertEqual(released['id-3'], 'handle-3-again')
+
+    def test_save_to_file_raises_write_errors(self):
+        fp = Mock()
+        fp.write.side_effect = IOError('No space left on device')
+        self.assertRaises(IOError, self.queue.save_to_file, fp)
+        self.assertEqual(self.connection.delete_sizes, [])
+
+    def test_save_to_s3(self):
+        bucket = Mock()
+        saved = {}
+        lock = threading.Lock()
+
+        def new_key(name):
+            key = Mock()
+
+            def set_contents(body):
+                with lock:
+                    saved[name] = body
+            key.set_contents_from_string.side_effect = set_contents
+            return key
+        bucket.new_key.side_effect = new_key
+        self.assertEqual(self.queue.save_to_s3(bucket), 95)
+        self.assertEqual(set(saved.values()), self.bodies())
+        self.assertTrue('/123456789012/myqueue/id-0' in saved)
+        self.assertEqual(sum(self.connection.delete_sizes), 95)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import BaseHTTPServer
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from boto.connection import AWSQueryConnection
+from boto.exception import BotoServerError
+from boto.async_connection import AsyncConnection, EventLoop
+from boto.retry import RetryPolicy
+
+
+class ScriptedHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.lock:
+            server.requests.append(path)
+            server.paths.append(self.path)
+            server.connections.add(self.client_address)
+            if server.statuses:
+                status = server.statuses.pop(0)
+            else:
+                status = 200
+        body = 'path=%s' % path
+        self.send_response(status)
+        if status == 301:
+            self.send_header('Location', 'http://%s:%d/moved' %
+                             server.server_address)
+        if self.path.startswith('/chunked'):
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for piece in (body[:3], body[3:]):
+                self.wfile.write('%x\r\n%s\r\n' % (len(piece), piece))
+            self.wfile.write('0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+class ExampleQueryConnection(AWSQueryConnection):
+    APIVersion = '2012-01-01'
+
+    def _required_auth_capability(self):
+        return ['sign-v2']
+
+
+class ThreadedServer(BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def process_request(self, request, client_address):
+        thread = threading.Thread(target=self._handle,
+                                  args=(request, client_address))
+        thread.daemon = True
+        thread.start()
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        finally:
+            self.close_request(request)
+
+
+class TestAsyncConnection(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadedServer(('127.0.0.1', 0), ScriptedHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.paths = []
+        self.server.connections = set()
+        self.server.statuses = []
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        self.host = '127.0.0.1:%d' % self.server.server_address[1]
+        connection = ExampleQueryConnection(host=self.host, is_secure=False,
+                                            aws_access_key_id='access_key',
+                                            aws_secret_access_key='secret')
+        # Keep the backoff between retries short.
+        connection.retry_policy = RetryPolicy(base_delay=0.01,
+                                              max_delay=0.01)
+        self.transport = AsyncConnection(connection, max_concurrency=5)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_many_requests_share_the_loop(self):
+        requests = [self.transport.make_request('GET', '/item/%d' % i)
+                    for i in xrange(20)]
+        self.transport.loop.run()
+        for i, request in enumerate(requests):
+            response = request.result()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.read(), 'path=/item/%d' % i)
+        # Sockets are kept alive and reused, so no more than
+        # max_concurrency of them are opened.
+        self.assertTrue(len(self.server.connections) <= 5)
+
+    def test_chunked_response(self):
+        response = self.transport.make_request('GET', '/chunked').result()
+        self.assertEqual(response.read(), 'path=/chunked')
+        self.assertEqual(response.getheader('transfer-encoding'), 'chunked')
+
+    def test_server_errors_are_retried(self):
+        self.server.statuses = [503, 500]
+        response = self.transport.make_request('GET', '/retry').result()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.server.requests, ['/retry'] * 3)
+
+    def test_retries_exhausted(self):
+        self.server.statuses = [503] * 3
+        request = self.transport.make_request('GET', '/fail',
+                                          override_num_retries=2)
+        self.assertRaises(BotoServerError, request.result)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_redirect_is_followed(self):
+        self.server.statuses = [301]
+        response = self.transport.make_request('GET', '/old').result()
+        self.assertEqual(response.read(), 'path=/moved')
+
+    def test_query_request_is_signed(self):
+        response = self.transport.make_query_request(
+            'ListThings', {'Name': 'x'}).result()
+        self.assertEqual(response.status, 200)
+        path = self.server.paths[0]
+        self.assertIn('Action=ListThings', path)
+        self.assertIn('Signature=', path)
+
+    def test_connection_errors_are_retried(self):
+        self.server.shutdown()
+        self.server.server_close()
+        request = self.transport.make_request('GET', '/', override_num_retries=1)
+        self.assertRaises(IOError, request.result)
+
+    def test_callbacks(self):
+        done = []
+        request = self.transport.make_request('GET', '/callback')
+        request.add_callback(done.append)
+        self.transport.loop.run()
+        self.assertEqual(done, [request])
+
+
+class TestEventLoop(unittest.TestCase):
+    def test_timers_run_in_order(self):
+        loop = EventLoop()
+        calls = []
+        loop.call_later(0.02, lambda: calls.append(2))
+        loop.call_later(0.01, lambda: calls.append(1))
+        cancelled = loop.call_later(0.01, lambda: calls.append(3))
+        loop.cancel(cancelled)
+        loop.run()
+        self.assertEqual(calls, [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import socket
+import threading
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock
+
+from boto.connection import ConnectionPool
+from boto.exception import ConnectionPoolExhaustedError
+from boto.s3.connection import S3Connection
+
+
+def make_connection(sock=None):
+    conn = Mock()
+    conn._HTTPConnection__response = None
+    conn.sock = sock
+    return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_hits_and_misses(self):
+        pool = ConnectionPool()
+        self.assertEqual(pool.get_http_connection('host', True), None)
+        conn = make_connection()
+        pool.put_http_connection('host', True, conn)
+        self.assertEqual(pool.get_http_connection('host', True), conn)
+        self.assertEqual(pool.get_http_connection('other', True), None)
+        stats = pool.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['connections'], 2)
+        self.assertEqual(stats['idle'], 0)
+
+    def test_idle_connections_are_capped(self):
+        pool = ConnectionPool(max_idle_per_host=2)
+        conns = [make_connection() for i in xrange(3)]
+        for conn in conns:
+            pool.get_http_connection('host', True)
+        for conn in conns:
+            pool.put_http_connection('host', True, conn)
+        self.assertEqual(pool.size(), 2)
+        self.assertTrue(conns[0].close.called)
+        stats = pool.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['connections'], 2)
+
+    def test_fails_when_host_is_full(self):
+        pool = ConnectionPool(max_per_host=2, timeout=0)
+        pool.get_http_connection('host', True)
+        pool.get_http_connection('host', True)
+        self.assertRaises(ConnectionPoolExhaustedError,
+                          pool.get_http_connection, 'host', True)
+        # Other hosts have their own limit.
+        self.assertEqual(pool.get_http_connection('other', True), None)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waits_for_a_connection_to_be_returned(self):
+        pool = ConnectionPool(max_per_host=1, timeout=5)
+        conn = make_connection()
+        pool.get_http_connection('host', True)
+        timer = threading.Timer(0.05, pool.put_http_connection,
+                                ('host', True, conn))
+        timer.start()
+        self.assertEqual(pool.get_http_connection('host', True), conn)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_discarded_connection_frees_its_place(self):
+        pool = ConnectionPool(max_per_host=1, timeout=0)
+        conn = make_connection()
+        pool.get_http_connection('host', True)
+        pool.discard_http_connection('host', True, conn)
+        self.assertTrue(conn.close.called)
+        self.assertEqual(pool.get_http_connection('host', True), None)
+        self.assertEqual(pool.stats()['reconnects'], 1)
+
+    def test_connections_closed_by_the_server_are_evicted(self):
+        pool = ConnectionPool()
+        ours, theirs = socket.socketpair()
+        self.addCleanup(ours.close)
+        conn = make_connection(ours)
+        pool.get_http_connection('host', True)
+        pool.put_http_connection('host', True, conn)
+        theirs.close()
+        self.assertEqual(pool.get_http_connection('host', True), None)
+        self.assertEqual(pool.stats()['evictions'], 1)
+
+    def test_stale_connections_are_evicted(self):
+        pool = ConnectionPool()
+        conn = make_connection()
+        pool.get_http_connection('host', True)
+        pool.put_http_connection('host', True, conn)
+        host_pool = pool.host_to_pool[('host', True)]
+        host_pool.queue[0] = (conn, time.time() - 1000)
+        self.assertEqual(pool.get_http_connection('host', True), None)
+        stats = pool.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['connections'], 1)
+
+
+class TestLegacyConnectionAttribute(unittest.TestCase):
+    def test_connection_attribute_takes_no_pool_slot(self):
+        conn = S3Connection('access_key', 'secret_key')
+        conn._pool = ConnectionPool(max_per_host=1, timeout=0)
+        for i in xrange(3):
+            conn.connection
+        self.assertEqual(conn._pool.stats()['connections'], 0)
+        self.assertEqual(conn._pool.get_http_connection(*conn._connection),
+                         None)
+
+
+if __name__ == '__main__':
+    unittest.main()
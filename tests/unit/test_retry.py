@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import httplib
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+from mock import Mock, patch
+
+from boto.connection import AWSQueryConnection
+from boto.exception import BotoServerError, CircuitOpenError
+from boto.retry import RetryPolicy, CircuitBreaker, get_error_code
+
+THROTTLED_XML = """<Response><Errors><Error><Code>RequestLimitExceeded</Code>
+<Message>Request limit exceeded.</Message></Error></Errors></Response>"""
+
+THROTTLED_JSON = ('{"__type": "com.amazonaws.dynamodb.v20111205#'
+                  'ProvisionedThroughputExceededException", "message": ""}')
+
+NOT_FOUND_XML = """<Error><Code>NoSuchKey</Code></Error>"""
+
+
+def make_response(status, body=''):
+    response = Mock(spec=httplib.HTTPResponse)
+    response.status = status
+    response.reason = ''
+    response.read.return_value = body
+    response.getheader.return_value = None
+    return response
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_get_error_code(self):
+        self.assertEqual(get_error_code(THROTTLED_XML), 'RequestLimitExceeded')
+        self.assertEqual(get_error_code(THROTTLED_JSON),
+                         'ProvisionedThroughputExceededException')
+        self.assertEqual(get_error_code(''), None)
+        self.assertEqual(get_error_code('not an error'), None)
+
+    def test_delay_is_jittered_and_capped(self):
+        policy = RetryPolicy(base_delay=1, max_delay=10)
+        previous = 0
+        for i in xrange(20):
+            delay = policy.delay(previous)
+            self.assertTrue(1 <= delay <= min(10, max(previous, 1) * 3))
+            previous = delay
+        self.assertEqual(RetryPolicy(base_delay=20, max_delay=10).delay(0),
+                         10)
+
+    def test_classify(self):
+        policy = RetryPolicy()
+        self.assertEqual(policy.classify(make_response(503)),
+                         RetryPolicy.SERVER_ERROR)
+        self.assertEqual(policy.classify(make_response(400, THROTTLED_JSON)),
+                         RetryPolicy.THROTTLED)
+        self.assertEqual(policy.classify(make_response(503, THROTTLED_XML)),
+                         RetryPolicy.THROTTLED)
+        self.assertEqual(policy.classify(make_response(404, NOT_FOUND_XML)),
+                         None)
+        ok = make_response(200)
+        self.assertEqual(policy.classify(ok), None)
+        self.assertFalse(ok.read.called)
+
+    def test_budget(self):
+        policy = RetryPolicy(budget=12)
+        self.assertTrue(policy.acquire_retry(RetryPolicy.THROTTLED))
+        self.assertFalse(policy.acquire_retry(RetryPolicy.CONNECTION_ERROR))
+        self.assertTrue(policy.acquire_retry(RetryPolicy.SERVER_ERROR))
+        self.assertFalse(policy.acquire_retry(RetryPolicy.SERVER_ERROR))
+        for i in xrange(3):
+            policy.record_success('host')
+        self.assertTrue(policy.acquire_retry(RetryPolicy.SERVER_ERROR))
+        # Successes never earn more than the budget.
+        for i in xrange(100):
+            policy.record_success('host')
+        self.assertEqual(policy.tokens, 12)
+
+    def test_unlimited_budget(self):
+        policy = RetryPolicy(budget=0)
+        for i in xrange(1000):
+            self.assertTrue(policy.acquire_retry(RetryPolicy.THROTTLED))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    @patch('boto.retry.time')
+    def test_opens_and_half_opens(self, mock_time):
+        mock_time.time.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        breaker.record_failure('host')
+        self.assertTrue(breaker.allow('host'))
+        breaker.record_failure('host')
+        self.assertFalse(breaker.allow('host'))
+        self.assertTrue(breaker.allow('other'))
+        mock_time.time.return_value = 110
+        # One trial request is let through, and others held back.
+        self.assertTrue(breaker.allow('host'))
+        self.assertFalse(breaker.allow('host'))
+        breaker.record_success('host')
+        self.assertTrue(breaker.allow('host'))
+        self.assertFalse(breaker.is_open('host'))
+
+
+class ExampleQueryConnection(AWSQueryConnection):
+    def _required_auth_capability(self):
+        return ['sign-v2']
+
+
+class TestMexeRetries(unittest.TestCase):
+    def setUp(self):
+        self.http_connection = Mock()
+        self.connection = ExampleQueryConnection(
+            aws_access_key_id='access_key', aws_secret_access_key='secret',
+            host='example.com',
+            https_connection_factory=(Mock(return_value=self.http_connection),
+                                      ()))
+        self.connection.num_retries = 5
+        sleep = patch('boto.connection.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def respond_with(self, *responses):
+        self.http_connection.getresponse.side_effect = list(responses)
+
+    def test_throttling_errors_are_retried(self):
+        self.respond_with(make_response(400, THROTTLED_JSON),
+                          make_response(200, 'ok'))
+        response = self.connection.make_request('Action')
+        self.assertEqual(response.read(), 'ok')
+        self.assertEqual(self.sleep.call_count, 1)
+
+    def test_exhausted_budget_stops_retries(self):
+        self.connection.retry_policy = RetryPolicy(budget=10)
+        self.respond_with(*[make_response(503) for i in xrange(6)])
+        self.assertRaises(BotoServerError, self.connection.make_request,
+                          'Action')
+        self.assertEqual(self.http_connection.getresponse.call_count, 3)
+
+    def test_open_circuit_fails_fast(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        self.connection.retry_policy = RetryPolicy(circuit_breaker=breaker)
+        self.respond_with(*[make_response(503) for i in xrange(6)])
+        self.assertRaises(CircuitOpenError, self.connection.make_request,
+                          'Action')
+        self.assertEqual(self.http_connection.getresponse.call_count, 2)
+        self.assertTrue(breaker.is_open('example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# Copyright (c) 2012 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+import boto
+from boto.exception import InvalidUriError
+from boto.s3.multidelete import MultiDeleteResult
+from boto.sync import Synchronizer, sync
+from boto.utils import get_ts
+
+NOW = 1350000000
+
+
+class FakeKey(object):
+    def __init__(self, bucket, name, data='', mtime=NOW, etag=None):
+        self.bucket = bucket
+        self.name = name
+        self.data = data
+        self.size = len(data)
+        self.mtime = mtime
+        self.last_modified = get_ts(time.gmtime(mtime))
+        self.etag = etag or '"%s"' % hashlib.md5(data).hexdigest()
+
+    def set_contents_from_filename(self, filename, headers=None, md5=None,
+                                   policy=None, reduced_redundancy=False):
+        with self.bucket.lock:
+            self.bucket.uploads.append((self.name, md5))
+        self.bucket.add(self.name, open(filename, 'rb').read(), NOW + 100)
+
+    def get_contents_to_filename(self, filename, headers=None):
+        key = self.bucket.keys[self.name]
+        with self.bucket.lock:
+            self.bucket.downloads.append(self.name)
+        open(filename, 'wb').write(key.data)
+        os.utime(filename, (key.mtime, key.mtime))
+
+
+class FakeBucket(object):
+    def __init__(self):
+        self.keys = {}
+        self.uploads = []
+        self.downloads = []
+        self.deleted = []
+        self.lock = threading.Lock()
+
+    def add(self, name, data, mtime=NOW, etag=None):
+        with self.lock:
+            self.keys[name] = FakeKey(self, name, data, mtime, etag)
+
+    def list(self, prefix='', headers=None):
+        return [k for n, k in sorted(self.keys.items())
+                if n.startswith(prefix)]
+
+    def new_key(self, name):
+        return FakeKey(self, name)
+
+    def delete_key(self, name, headers=None):
+        with self.lock:
+            self.deleted.append(name)
+            del self.keys[name]
+
+    def delete_keys(self, names, headers=None, num_threads=0):
+        for name in names:
+            self.delete_key(name)
+        return MultiDeleteResult(self)
+
+
+class FakeConnection(object):
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def get_bucket(self, bucket_name, validate=True, headers=None):
+        return self.bucket
+
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bucket = FakeBucket()
+        self.bucket_uri = boto.storage_uri('s3://mybucket/releases')
+        self.bucket_uri.connection = FakeConnection(self.bucket)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data, mtime=NOW):
+        path = os.path.join(self.directory, *name.split('/'))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        open(path, 'wb').write(data)
+        os.utime(path, (mtime, mtime))
+
+    def upload(self, **kwargs):
+        return sync(self.directory, self.bucket_uri, num_threads=3,
+                    time_between_retries=0, **kwargs)
+
+    def test_new_files_uploaded(self):
+        self.write('a.txt', 'aaa')
+        self.write('sub/b.txt', 'bb')
+        self.write('.hidden', 'x')
+        self.write('.git/config', 'x')
+        result = self.upload(exclude=['.*'])
+        self.assertEqual(sorted(result.copied), ['a.txt', 'sub/b.txt'])
+        self.assertEqual(result.bytes_copied, 5)
+        self.assertEqual(sorted(self.bucket.keys),
+                         ['releases/a.txt', 'releases/sub/b.txt'])
+        self.assertEqual(self.bucket.keys['releases/sub/b.txt'].data, 'bb')
+
+    def test_unchanged_files_skipped(self):
+        for name in ('same', 'touched', 'edited', 'multipart', 'resized'):
+            self.write(name, 'new!', mtime=NOW + 10)
+        self.bucket.add('releases/same', 'old!', mtime=NOW + 20)
+        self.bucket.add('releases/touched', 'new!')
+        self.bucket.add('releases/edited', 'old!')
+        self.bucket.add('releases/multipart', 'new!', etag='"abc-2"')
+        self.bucket.add('releases/resized', 'older')
+        result = self.upload()
+        self.assertEqual(sorted(result.skipped), ['same', 'touched'])
+        self.assertEqual(sorted(result.copied),
+                         ['edited', 'multipart', 'resized'])
+        # The MD5s computed to compare files are reused for the upload.
+        uploads = dict(self.bucket.uploads)
+        self.assertEqual(uploads['releases/edited'][0],
+                         hashlib.md5('new!').hexdigest())
+        self.assertEqual(uploads['releases/resized'], None)
+
+    def test_checksum_ignores_mtimes(self):
+        self.write('same', 'new!', mtime=NOW)
+        self.bucket.add('releases/same', 'old!', mtime=NOW + 20)
+        result = self.upload(checksum=True)
+        self.assertEqual(result.copied, ['same'])
+
+    def test_dry_run_changes_nothing(self):
+        self.write('a.txt', 'aaa')
+        self.bucket.add('releases/old.txt', 'gone')
+        result = self.upload(delete=True, dry_run=True)
+        self.assertEqual(result.copied, ['a.txt'])
+        self.assertEqual(result.deleted, ['old.txt'])
+        self.assertEqual(self.bucket.uploads, [])
+        self.assertEqual(self.bucket.deleted, [])
+
+    def test_extra_keys_deleted(self):
+        self.write('a.txt', 'aaa')
+        self.bucket.add('releases/old.txt', 'gone')
+        self.bucket.add('other/keep.txt', 'kept')
+        result = self.upload()
+        self.assertEqual(result.deleted, [])
+        result = self.upload(delete=True)
+        self.assertEqual(result.deleted, ['old.txt'])
+        self.assertEqual(self.bucket.deleted, ['releases/old.txt'])
+        self.assertIn('other/keep.txt', self.bucket.keys)
+
+    def test_download(self):
+        self.bucket.add('releases/a.txt', 'aaa')
+        self.bucket.add('releases/sub/dir/b.txt', 'bb')
+        self.bucket.add('releases/sub/', '')
+        self.write('stale.txt', 'x')
+        synchronizer = Synchronizer(num_threads=2, delete=True)
+        result = synchronizer.sync(self.bucket_uri, self.directory)
+        self.assertEqual(sorted(result.copied), ['a.txt', 'sub/dir/b.txt'])
+        self.assertEqual(result.deleted, ['stale.txt'])
+        path = os.path.join(self.directory, 'sub', 'dir', 'b.txt')
+        self.assertEqual(open(path, 'rb').read(), 'bb')
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, 'stale.txt')))
+        result = synchronizer.sync(self.bucket_uri, self.directory)
+        self.assertEqual(result.copied, [])
+        self.assertEqual(len(self.bucket.downloads), 2)
+
+    def test_download_stays_in_directory(self):
+        self.bucket.add('releases/../../escaped.txt', 'evil')
+        self.bucket.add('releases/sub/../../escaped.txt', 'evil')
+        self.bucket.add('releases/ok/../fine.txt', 'fine')
+        target = os.path.join(self.directory, 'a', 'b')
+        result = sync(self.bucket_uri, target)
+        self.assertEqual(result.copied, ['ok/../fine.txt'])
+        self.assertEqual(open(os.path.join(target, 'fine.txt')).read(),
+                         'fine')
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, 'escaped.txt')))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, 'a', 'escaped.txt')))
+
+    def test_sync_needs_a_directory_and_a_bucket(self):
+        self.assertRaises(InvalidUriError, sync, self.directory,
+                          self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()